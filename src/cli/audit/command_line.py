@@ -0,0 +1,91 @@
+import asyncio
+import questionary
+
+from pathlib import Path
+from audit.light_client import LightClient
+from common.console import print_info
+from config.console import console
+from project.merkle_root import MerkleRoot
+from project.project import Project
+from typing import Any
+
+
+class CommandLine:
+    light_client: LightClient
+
+    def __init__(self):
+        """
+        Initializes the CommandLine instance and loads the synced block headers.
+
+        :param self: Instance of CommandLine
+        """
+        self.light_client = LightClient()
+
+    def show(self):
+        """
+        Prompts for a project, computes its Merkle root and verifies with the light client that a deployment
+        of exactly these files is recorded on the chain.
+
+        :param self: Instance of CommandLine
+        """
+        path = self._select_project_path()
+
+        if not path:
+            return
+
+        merkle_root = MerkleRoot(Project(path)).get_merkle_root()
+
+        try:
+            record = asyncio.run(self._verify(merkle_root))
+        except ValueError as e:
+            console.print(f"Verification failed: {e}", style="bold red")
+            return
+
+        if record is None:
+            print_info(f"No deployment with the Merkle root {merkle_root} is recorded.")
+            return
+
+        metadata = record.get("metadata", {})
+
+        print_info(
+            f"""The deployment is recorded in block {record['height']} and signed by {record['address']}.
+
+{''.join(f'\t{key}: {value}\n' for key, value in metadata.items())}"""
+        )
+
+    def _select_project_path(self) -> Path | None:
+        """
+        Prompt the user to input the directory path of the deployed project.
+
+        :return: The path to the project directory
+        :rtype: Path | None
+        """
+        directory_path = questionary.path(
+            "What's the path to the deployed project?", only_directories=True
+        ).ask()
+
+        if not directory_path:
+            return None
+
+        return Path(directory_path)
+
+    async def _verify(self, merkle_root: str) -> dict[str, Any] | None:
+        """
+        Syncs the block headers and verifies the deployment with the given Merkle root.
+
+        :param self: Instance of CommandLine
+        :param merkle_root: The Merkle root of the deployment as hex string
+        :type merkle_root: str
+        :return: The verified record or None if the deployment is not recorded
+        :rtype: dict[str, Any] | None
+        """
+        try:
+            synced = await self.light_client.sync_headers()
+
+            console.print(
+                f"Synced {synced} new block headers ({len(self.light_client.headers)} in total)."
+            )
+
+            return await self.light_client.verify_deployment(merkle_root)
+        finally:
+            await self.light_client.close()
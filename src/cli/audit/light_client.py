@@ -0,0 +1,275 @@
+import base58
+import msgpack
+import struct
+import config.config as config
+
+from common.connection import Connection
+from cryptography.exceptions import InvalidSignature
+from cryptography.hazmat.primitives.asymmetric import ed25519
+from hashlib import sha256
+from pathlib import Path
+from typing import Any
+
+
+class LightClient:
+    # Packed header of a version 2 block of the service: version, timestamp, flags, payload length,
+    # previous hash and the Merkle root of the records in the block.
+    HEADER_FORMAT = "<H Q I I 32s 32s"
+    HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+    HEADER_VERSION = 2
+    HEADERS_PER_REQUEST = 2000
+    # Prefixes of the leaf and inner node hashes of the records tree, like in the merkle module of the service
+    LEAF_PREFIX = b"\x00"
+    NODE_PREFIX = b"\x01"
+
+    headers: list[bytes]
+    connection: Connection | None
+
+    def __init__(self):
+        """
+        Initializes the LightClient and loads the headers synced so far.
+        The light client keeps only block headers, so storage and bandwidth grow with the number of blocks,
+        and a single deployment record is verified with a Merkle proof of log(records per block) hashes.
+
+        :param self: Instance of LightClient
+        """
+        self.headers = self._load_headers()
+        self.connection = None
+
+    async def sync_headers(self) -> int:
+        """
+        Downloads the headers after the last synced header from the service, verifies that they link
+        to the synced header chain and stores them.
+
+        :param self: Instance of LightClient
+        :return: The number of new headers
+        :rtype: int
+        """
+        synced = len(self.headers)
+
+        while True:
+            msg = await self._request(
+                {
+                    "type": "get_headers",
+                    "start": len(self.headers),
+                    "count": self.HEADERS_PER_REQUEST,
+                }
+            )
+
+            headers = msg["headers"]
+
+            for header in headers:
+                self._verify_link(header)
+                self.headers.append(header)
+
+            self._save_headers(headers)
+
+            if len(headers) < self.HEADERS_PER_REQUEST:
+                return len(self.headers) - synced
+
+    async def verify_deployment(self, merkle_root: str) -> dict[str, Any] | None:
+        """
+        Requests the record of the deployment with the given Merkle root and its inclusion proof from the service,
+        and verifies both locally against the synced headers and the signature of the signer.
+
+        :param self: Instance of LightClient
+        :param merkle_root: The Merkle root of the deployment as hex string
+        :type merkle_root: str
+        :return: The verified record with the height of its block or None if the deployment is not recorded
+        :rtype: dict[str, Any] | None
+        """
+        msg = await self._request(
+            {"type": "get_record_proof", "merkle_root": merkle_root}
+        )
+
+        if msg["status"] != "success":
+            return None
+
+        height = msg["height"]
+
+        if height >= len(self.headers):
+            raise ValueError(
+                f"The record is in block {height}, which is not synced yet. Sync the headers first."
+            )
+
+        payload = msg["record"]
+        signature = msg["signature"]
+        records_root = struct.unpack_from(self.HEADER_FORMAT, self.headers[height])[5]
+
+        if not self._verify_proof(
+            self._record_leaf(payload, signature),
+            msg["index"],
+            msg["proof"],
+            records_root,
+        ):
+            raise ValueError("The record is not included in the block header.")
+
+        record = msgpack.unpackb(payload, raw=False)
+
+        if record.get("merkle_root") != merkle_root:
+            raise ValueError("The record belongs to another deployment.")
+
+        self._verify_signature(record["address"], payload, signature)
+        return {"height": height, **record}
+
+    def _verify_link(self, header: bytes):
+        """
+        Verifies that a header is a version 2 header and links to the last synced header.
+
+        :param self: Instance of LightClient
+        :param header: The packed header
+        :type header: bytes
+        """
+        if len(header) != self.HEADER_SIZE:
+            raise ValueError(
+                "The service sent a header of an older block version, which cannot be verified without its payload."
+            )
+
+        version, _, _, _, previous_hash, _ = struct.unpack(self.HEADER_FORMAT, header)
+
+        if version != self.HEADER_VERSION:
+            raise ValueError(f"Unsupported block version: {version}")
+
+        expected = sha256(self.headers[-1]).digest() if self.headers else bytes(32)
+
+        if previous_hash != expected:
+            raise ValueError(
+                f"Header {len(self.headers)} does not link to the synced header chain."
+            )
+
+    def _verify_proof(
+        self, leaf: bytes, index: int, proof: list[bytes], root: bytes
+    ) -> bool:
+        """
+        Verifies a Merkle inclusion proof. An odd node of a tree level is paired with itself, like in the service.
+
+        :param self: Instance of LightClient
+        :param leaf: The leaf hash of the record
+        :type leaf: bytes
+        :param index: The index of the record in the block
+        :type index: int
+        :param proof: The sibling hashes from the leaf up to the root
+        :type proof: list[bytes]
+        :param root: The records root of the block header
+        :type root: bytes
+        :return: True if the proof leads to the root
+        :rtype: bool
+        """
+        node = leaf
+
+        for sibling in proof:
+            pair = node + sibling if index % 2 == 0 else sibling + node
+            node = sha256(self.NODE_PREFIX + pair).digest()
+            index //= 2
+
+        return index == 0 and node == root
+
+    def _record_leaf(self, payload: bytes, signature: bytes) -> bytes:
+        """
+        Calculates the Merkle leaf of a record like the service, which commits to the length of the payload.
+
+        :param self: Instance of LightClient
+        :param payload: The payload of the record
+        :type payload: bytes
+        :param signature: The signature of the record
+        :type signature: bytes
+        :return: The leaf hash
+        :rtype: bytes
+        """
+        return sha256(
+            self.LEAF_PREFIX + len(payload).to_bytes(4, "big") + payload + signature
+        ).digest()
+
+    def _verify_signature(self, address: str, payload: bytes, signature: bytes):
+        """
+        Verifies the Ed25519 signature of the record, which signs the SHA-256 hash of the payload.
+
+        :param self: Instance of LightClient
+        :param address: The Base58 encoded public key of the signer
+        :type address: str
+        :param payload: The payload of the record
+        :type payload: bytes
+        :param signature: The signature of the record
+        :type signature: bytes
+        """
+        public_key = ed25519.Ed25519PublicKey.from_public_bytes(
+            base58.b58decode(address)
+        )
+
+        try:
+            public_key.verify(signature, sha256(payload).digest())
+        except InvalidSignature:
+            raise ValueError("The signature of the record is invalid.")
+
+    async def close(self):
+        """
+        Closes the connection to the service if one is open.
+
+        :param self: Instance of LightClient
+        """
+        if self.connection is not None:
+            await self.connection.close()
+            self.connection = None
+
+    async def _request(self, msg: dict) -> dict:
+        """
+        Sends a message to the service and returns its response.
+        All requests share one connection, which is opened with the first request and kept until close() is called.
+
+        :param self: Instance of LightClient
+        :param msg: The message to send
+        :type msg: dict
+        :return: The response of the service
+        :rtype: dict
+        """
+        if self.connection is None or self.connection.is_closed():
+            self.connection = await Connection.open(config.SERVICE_ADDRESS)
+
+        return await self.connection.request(msg)
+
+    def _headers_path(self) -> Path:
+        """
+        Returns the file path where the synced headers are stored.
+
+        :param self: Instance of LightClient
+        :return: The file path of the headers
+        :rtype: Path
+        """
+        return config.LOCAL_APPDATA_PATH / f".{config.APP_NAME.lower()}_headers.bin"
+
+    def _load_headers(self) -> list[bytes]:
+        """
+        Loads the synced headers. The file holds the packed headers back to back.
+
+        :param self: Instance of LightClient
+        :return: The synced headers
+        :rtype: list[bytes]
+        """
+        path = self._headers_path()
+
+        if not path.exists():
+            return []
+
+        data = path.read_bytes()
+        end = len(data) - len(data) % self.HEADER_SIZE
+
+        # A partially written last header of an interrupted sync is dropped and synced again.
+        if end != len(data):
+            with open(path, "r+b") as f:
+                f.truncate(end)
+
+        return [
+            data[offset : offset + self.HEADER_SIZE]
+            for offset in range(0, end, self.HEADER_SIZE)
+        ]
+
+    def _save_headers(self, headers: list[bytes]):
+        """
+        Appends verified headers to the headers file.
+
+        :param self: Instance of LightClient
+        :param headers: The verified headers
+        :type headers: list[bytes]
+        """
+        with open(self._headers_path(), "ab") as f:
+            f.write(b"".join(headers))
@@ -0,0 +1,244 @@
+import asyncio
+import json
+import msgpack
+import struct
+
+from asyncio import Future, StreamReader, StreamWriter, Task
+
+# Version of the binary wire protocol. Version 1 are JSON lines with hex encoded bytes.
+WIRE_VERSION = 2
+
+# A binary frame starts with the big-endian length of its msgpack body. The limit keeps the first byte zero,
+# so it never collides with the "{" of a JSON line and both framings can be told apart per message.
+FRAME_HEADER_FORMAT = ">I"
+FRAME_HEADER_SIZE = struct.calcsize(FRAME_HEADER_FORMAT)
+MAX_FRAME_SIZE = 2**24 - 1
+
+# Message fields holding bytes or lists of bytes. JSON lines carry them as hex strings, binary frames as raw bin fields.
+BYTES_FIELDS = {"record", "signature", "headers", "proof"}
+
+
+class Connection:
+    """
+    A long-lived connection to the service that carries many requests at once.
+    Every request gets an "id", and the service echoes it in "reply_to" of the response,
+    so the responses may arrive in any order.
+    """
+
+    reader: StreamReader
+    writer: StreamWriter
+    wire: int  # Wire protocol version used to send requests
+    wire_offered: bool  # Whether a request offered the binary wire protocol already
+    _next_id: int
+    _waiting: dict[int, Future]  # Requests waiting for their response by request ID
+    _serve_task: Task
+
+    def __init__(self, reader: StreamReader, writer: StreamWriter):
+        """
+        Initializes the Connection with an opened stream and starts reading the responses in the background.
+
+        :param self: Instance of Connection
+        :param reader: StreamReader object to read data from the service
+        :type reader: StreamReader
+        :param writer: StreamWriter object to send data to the service
+        :type writer: StreamWriter
+        """
+        self.reader = reader
+        self.writer = writer
+        self.wire = 1
+        self.wire_offered = False
+        self._next_id = 0
+        self._waiting = {}
+        self._serve_task = asyncio.create_task(self._serve())
+
+    @classmethod
+    async def open(cls, address: str) -> "Connection":
+        """
+        Opens a connection to the service. The binary wire protocol is offered with the first request
+        instead of a "hello" message, because services from before the wire protocol require a peer address
+        in every hello. They ignore the offer, and the connection keeps sending JSON lines to them.
+
+        :param address: The address of the service as host:port
+        :type address: str
+        :return: The opened connection
+        :rtype: Connection
+        """
+        host, port = address.split(":")
+        reader, writer = await asyncio.open_connection(host, int(port))
+        return cls(reader, writer)
+
+    async def request(self, msg: dict) -> dict:
+        """
+        Sends a request and waits for its response. The first request offers the binary wire protocol,
+        and the connection switches to binary frames once the service confirms the version in its response.
+
+        :param self: Instance of Connection
+        :param msg: The request to send
+        :type msg: dict
+        :return: The response of the service
+        :rtype: dict
+        """
+        if self.is_closed():
+            raise ConnectionError("The connection to the service is closed.")
+
+        if not self.wire_offered:
+            self.wire_offered = True
+            msg = {**msg, "wire": WIRE_VERSION}
+
+        self._next_id += 1
+        request_id = self._next_id
+        future = asyncio.get_running_loop().create_future()
+        self._waiting[request_id] = future
+
+        try:
+            self.writer.write(encode_message({**msg, "id": request_id}, self.wire))
+            await self.writer.drain()
+            response = await future
+
+            if "wire" in msg:
+                self.wire = min(response.get("wire", 1), WIRE_VERSION)
+
+            return response
+        finally:
+            self._waiting.pop(request_id, None)
+
+    def is_closed(self) -> bool:
+        """
+        Returns whether the connection is closed or closing.
+
+        :param self: Instance of Connection
+        :return: True if no more requests can be sent
+        :rtype: bool
+        """
+        return self.writer.is_closing()
+
+    async def close(self):
+        """
+        Closes the connection and waits for the background reader to stop.
+
+        :param self: Instance of Connection
+        """
+        self.writer.close()
+        await asyncio.gather(self._serve_task, return_exceptions=True)
+
+    async def _serve(self):
+        """
+        Reads the responses until the service closes the connection and completes their waiting requests.
+        A service without request IDs answers one request per connection, so its response belongs to the oldest request.
+
+        :param self: Instance of Connection
+        """
+        try:
+            while (msg := await read_message(self.reader)) is not None:
+                if "reply_to" in msg:
+                    future = self._waiting.get(msg["reply_to"])
+                else:
+                    future = next(iter(self._waiting.values()), None)
+
+                if future is not None and not future.done():
+                    future.set_result(msg)
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            self.writer.close()
+
+            for future in self._waiting.values():
+                if not future.done():
+                    future.set_exception(
+                        ConnectionError("The connection to the service was closed.")
+                    )
+
+
+def encode_message(msg: dict, wire: int) -> bytes:
+    """
+    Encodes a message with the framing of the given wire protocol version.
+
+    :param msg: The message to encode
+    :type msg: dict
+    :param wire: The wire protocol version of the connection
+    :type wire: int
+    :return: The framed message
+    :rtype: bytes
+    """
+    if wire >= WIRE_VERSION:
+        body = msgpack.packb(msg, use_bin_type=True)
+
+        if len(body) > MAX_FRAME_SIZE:
+            raise ValueError(
+                f"The message exceeds the maximum frame size of {MAX_FRAME_SIZE} bytes."
+            )
+
+        return struct.pack(FRAME_HEADER_FORMAT, len(body)) + body
+
+    msg = {
+        key: _to_hex(value) if key in BYTES_FIELDS else value
+        for key, value in msg.items()
+    }
+
+    return (
+        json.dumps(msg)
+        + "\n"  # Note: the newline is important to signal the end of the message for readline()
+    ).encode()
+
+
+async def read_message(reader: StreamReader) -> dict | None:
+    """
+    Reads the next message in either framing. JSON lines start with "{" and binary frames with a zero byte.
+
+    :param reader: StreamReader object to read data from the remote side
+    :type reader: StreamReader
+    :return: The message or None if the remote side closed the connection
+    :rtype: dict | None
+    """
+    first = await reader.read(1)
+
+    if not first:
+        return None
+
+    if first == b"{":
+        msg = json.loads((first + await reader.readline()).decode())
+
+        for key in BYTES_FIELDS & msg.keys():
+            msg[key] = _from_hex(msg[key])
+
+        return msg
+
+    (length,) = struct.unpack(
+        FRAME_HEADER_FORMAT,
+        first + await reader.readexactly(FRAME_HEADER_SIZE - 1),
+    )
+
+    if length > MAX_FRAME_SIZE:
+        raise ValueError("The message is neither a JSON line nor a binary frame.")
+
+    return msgpack.unpackb(await reader.readexactly(length), raw=False)
+
+
+def _to_hex(value: bytes | list[bytes]) -> str | list[str]:
+    """
+    Encodes bytes or a list of bytes as hex for JSON lines.
+
+    :param value: The bytes or list of bytes
+    :type value: bytes | list[bytes]
+    :return: The hex string or list of hex strings
+    :rtype: str | list[str]
+    """
+    if isinstance(value, list):
+        return [item.hex() for item in value]
+
+    return value.hex()
+
+
+def _from_hex(value: str | list[str]) -> bytes | list[bytes]:
+    """
+    Decodes a hex string or a list of hex strings of a JSON line.
+
+    :param value: The hex string or list of hex strings
+    :type value: str | list[str]
+    :return: The bytes or list of bytes
+    :rtype: bytes | list[bytes]
+    """
+    if isinstance(value, list):
+        return [bytes.fromhex(item) for item in value]
+
+    return bytes.fromhex(value)
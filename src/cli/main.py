@@ -5,6 +5,7 @@ from address.solana_address import SolanaAddress as SolanaAddress
 from main_menu import CommandLine as menu
 from address.command_line import CommandLine as address_cli
 from project.command_line import CommandLine as project_cli
+from audit.command_line import CommandLine as audit_cli
 
 
 def show_main_menu():
@@ -20,6 +21,9 @@ def show_main_menu():
         if command == main_menu.CREATE_DEPLOYMENT_RECORD_COMMAND:
             project_cli().show()
 
+        if command == main_menu.VERIFY_DEPLOYMENT_COMMAND:
+            audit_cli().show()
+
         if command == main_menu.EXIT_COMMAND or command is None:
             console.print("Goodbye! 👋")
             exit(0)
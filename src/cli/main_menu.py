@@ -5,6 +5,7 @@ class CommandLine:
     EXIT_COMMAND = "EXIT"
     KEY_MANAGEMENT_COMMAND = "KEY_MANAGEMENT"
     CREATE_DEPLOYMENT_RECORD_COMMAND = "CREATE_DEPLOYMENT_RECORD"
+    VERIFY_DEPLOYMENT_COMMAND = "VERIFY_DEPLOYMENT"
 
     def show(self) -> str | None:
         """
@@ -22,6 +23,10 @@ class CommandLine:
                 "Create a deployment record",
                 value=self.CREATE_DEPLOYMENT_RECORD_COMMAND,
             ),
+            questionary.Choice(
+                "Verify a deployment",
+                value=self.VERIFY_DEPLOYMENT_COMMAND,
+            ),
             questionary.Choice(
                 "Exit the application",
                 value=self.EXIT_COMMAND,
@@ -1,7 +1,7 @@
-import json
-import config.config as config
 import asyncio
+import config.config as config
 
+from common.connection import Connection
 from config.console import console
 
 
@@ -19,13 +19,9 @@ class Client:
         :type signature: bytes
         """
         console.print(f"Deploying to the service {config.SERVICE_ADDRESS}...")
-        host, port = config.SERVICE_ADDRESS.split(":")
-        reader, writer = await asyncio.open_connection(host, int(port))
-        await self._send_record(writer, payload, signature)
-        data = await reader.readline()
-        msg = json.loads(data.decode())
+        [succeeded] = await self.deploy_records([(payload, signature)])
 
-        if msg["status"] == "success":
+        if succeeded:
             console.print("Deployment record added successfully to the service.")
         else:
             console.print(
@@ -33,34 +29,51 @@ class Client:
                 style="bold red",
             )
 
-        writer.close()
+    async def deploy_records(self, records: list[tuple[bytes, bytes]]) -> list[bool]:
+        """
+        Deploy many deployment records to the service over a single connection.
+        All records are in flight at once, so a batch costs one connection setup instead of one per record.
+
+        :param self: Instance of Client
+        :param records: The (payload, signature) tuples of the deployment records
+        :type records: list[tuple[bytes, bytes]]
+        :return: Whether each record was added, in the order of the records
+        :rtype: list[bool]
+        """
+        connection = await Connection.open(config.SERVICE_ADDRESS)
+
+        try:
+            responses = await asyncio.gather(
+                *(
+                    self._send_record(connection, payload, signature)
+                    for payload, signature in records
+                )
+            )
+        finally:
+            await connection.close()
+
+        return [msg["status"] == "success" for msg in responses]
 
     async def _send_record(
-        self, writer: asyncio.StreamWriter, payload: bytes, signature: bytes
-    ):
+        self, connection: Connection, payload: bytes, signature: bytes
+    ) -> dict:
         """
-        Send the deployment record to the service in the expected JSON format.
-        The message is sent as a single line with a newline character at the end to signal the end of the message.
+        Send the deployment record to the service and wait for the response.
 
         :param self: Instance of Client
-        :param writer: The StreamWriter object to send data to the service
-        :type writer: asyncio.StreamWriter
+        :param connection: The connection to the service
+        :type connection: Connection
         :param payload: The deployment record payload in bytes
         :type payload: bytes
         :param signature: The signature of the deployment record in bytes
         :type signature: bytes
+        :return: The response of the service
+        :rtype: dict
         """
-        writer.write(
-            (
-                json.dumps(
-                    {
-                        "type": "add_deployment_record",
-                        "record": payload.hex(),
-                        "signature": signature.hex(),
-                    }
-                )
-                + "\n"  # Note: the newline is important to signal the end of the message for readline()
-            ).encode()
+        return await connection.request(
+            {
+                "type": "add_deployment_record",
+                "record": payload,
+                "signature": signature,
+            }
         )
-
-        await writer.drain()
@@ -0,0 +1,230 @@
+import time
+
+from typing import Iterator
+
+
+class PeerEntry:
+    """
+    A known peer address with its liveness score and the state of the peer exchange with it.
+    """
+
+    __slots__ = ("address", "sequence", "score", "last_seen", "contacted", "sent")
+
+    address: str
+    sequence: int  # Sequence number of the address book when the address was added
+    score: int  # Grows with successful exchanges and shrinks with failed ones
+    last_seen: float  # Monotonic time of the last sign of life or of the addition
+    contacted: bool  # Whether an exchange with the peer has succeeded
+    sent: (
+        int | None
+    )  # Sequence number up to which addresses were sent to the peer, or None for none
+
+    def __init__(self, address: str, sequence: int, now: float):
+        """
+        Initializes a PeerEntry for a newly added address.
+
+        :param self: Instance of PeerEntry
+        :param address: The address of the peer
+        :type address: str
+        :param sequence: The sequence number of the addition
+        :type sequence: int
+        :param now: The monotonic time of the addition
+        :type now: float
+        """
+        self.address = address
+        self.sequence = sequence
+        self.score = 0
+        self.last_seen = now
+        self.contacted = False
+        self.sent = None
+
+
+class AddressBook:
+    """
+    A bounded set of known peer addresses. Every added address gets the next sequence number of the book,
+    so the addresses added since an earlier exchange can be sent as a delta instead of the whole book.
+    Peers gain score when they answer and lose it when they do not. A full book evicts its worst entry,
+    and peers that showed no sign of life for too long are evicted as stale.
+    """
+
+    MAX_SCORE = 10
+    FAILURE_PENALTY = 2
+
+    capacity: int
+    stale_after: float
+    sequence: int  # Sequence number of the last added address
+    _entries: dict[str, PeerEntry]
+
+    def __init__(self, capacity: int = 1000, stale_after: float = 3600.0):
+        """
+        Initializes an empty AddressBook.
+
+        :param self: Instance of AddressBook
+        :param capacity: Maximum number of addresses
+        :type capacity: int
+        :param stale_after: Seconds without a sign of life after which an address is evicted
+        :type stale_after: float
+        """
+        self.capacity = capacity
+        self.stale_after = stale_after
+        self.sequence = 0
+        self._entries = {}
+
+    def add(self, address: str, now: float | None = None) -> bool:
+        """
+        Adds an address if it is not known yet. A full book first evicts its entry with the lowest score,
+        preferring the one that was seen longest ago.
+
+        :param self: Instance of AddressBook
+        :param address: The address of the peer
+        :type address: str
+        :param now: The monotonic time or None for the current time
+        :type now: float | None
+        :return: True if the address was added
+        :rtype: bool
+        """
+        if address in self._entries:
+            return False
+
+        if len(self._entries) >= self.capacity:
+            worst = min(
+                self._entries.values(), key=lambda entry: (entry.score, entry.last_seen)
+            )
+
+            del self._entries[worst.address]
+
+        self.sequence += 1
+        self._entries[address] = PeerEntry(
+            address, self.sequence, time.monotonic() if now is None else now
+        )
+
+        return True
+
+    def mark_alive(self, address: str, now: float | None = None):
+        """
+        Records a successful exchange with a peer.
+
+        :param self: Instance of AddressBook
+        :param address: The address of the peer
+        :type address: str
+        :param now: The monotonic time or None for the current time
+        :type now: float | None
+        """
+        entry = self._entries.get(address)
+
+        if entry is None:
+            return
+
+        entry.score = min(entry.score + 1, self.MAX_SCORE)
+        entry.last_seen = time.monotonic() if now is None else now
+        entry.contacted = True
+
+    def mark_failed(self, address: str):
+        """
+        Records that a peer did not answer.
+
+        :param self: Instance of AddressBook
+        :param address: The address of the peer
+        :type address: str
+        """
+        entry = self._entries.get(address)
+
+        if entry is not None:
+            entry.score -= self.FAILURE_PENALTY
+
+    def evict_stale(self, now: float | None = None) -> list[str]:
+        """
+        Evicts all addresses without a sign of life for longer than stale_after seconds.
+
+        :param self: Instance of AddressBook
+        :param now: The monotonic time or None for the current time
+        :type now: float | None
+        :return: The evicted addresses
+        :rtype: list[str]
+        """
+        deadline = (time.monotonic() if now is None else now) - self.stale_after
+        stale = [
+            address
+            for address, entry in self._entries.items()
+            if entry.last_seen < deadline
+        ]
+
+        for address in stale:
+            del self._entries[address]
+
+        return stale
+
+    def added_since(self, sequence: int, exclude: str | None = None) -> list[str]:
+        """
+        Returns the addresses added after the given sequence number.
+
+        :param self: Instance of AddressBook
+        :param sequence: The sequence number of an earlier exchange, or 0 for all addresses
+        :type sequence: int
+        :param exclude: An address to leave out, usually the one of the receiving peer
+        :type exclude: str | None
+        :return: The addresses added after the sequence number
+        :rtype: list[str]
+        """
+        return [
+            address
+            for address, entry in self._entries.items()
+            if entry.sequence > sequence and address != exclude
+        ]
+
+    def get(self, address: str) -> PeerEntry | None:
+        """
+        Returns the entry of an address.
+
+        :param self: Instance of AddressBook
+        :param address: The address of the peer
+        :type address: str
+        :return: The entry or None if the address is not known
+        :rtype: PeerEntry | None
+        """
+        return self._entries.get(address)
+
+    def is_contacted(self, address: str) -> bool:
+        """
+        Returns whether an exchange with a known peer has succeeded.
+
+        :param self: Instance of AddressBook
+        :param address: The address of the peer
+        :type address: str
+        :return: True if the peer is known and has answered
+        :rtype: bool
+        """
+        entry = self._entries.get(address)
+        return entry is not None and entry.contacted
+
+    def __contains__(self, address: str) -> bool:
+        """
+        Checks whether an address is known.
+
+        :param self: Instance of AddressBook
+        :param address: The address of the peer
+        :type address: str
+        :return: True if the address is in the book
+        :rtype: bool
+        """
+        return address in self._entries
+
+    def __len__(self) -> int:
+        """
+        Returns the number of known addresses.
+
+        :param self: Instance of AddressBook
+        :return: The number of addresses
+        :rtype: int
+        """
+        return len(self._entries)
+
+    def __iter__(self) -> Iterator[str]:
+        """
+        Iterates over a snapshot of the known addresses, so the book may change during the iteration.
+
+        :param self: Instance of AddressBook
+        :return: An iterator of the addresses
+        :rtype: Iterator[str]
+        """
+        return iter(list(self._entries))
@@ -2,6 +2,8 @@ import struct
 
 from datetime import datetime
 from hashlib import sha256
+from typing import Self
+from merkle import merkle_root, record_leaf
 
 
 class Block:
@@ -12,6 +14,17 @@ class Block:
     # I = uint32 (4 Bytes) → z.B. Flags
     # I = uint32 (4 Bytes) → z.B. Payload‑Laenge
     # 32s = 32 Bytes → z.B. Hash (SHA‑256)
+    HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+
+    # Version 2 blocks carry many records. Their header additionally commits to the Merkle root of the records,
+    # so the hash of a version 2 block is the hash of its header.
+    RECORDS_VERSION = 2
+    RECORDS_HEADER_FORMAT = "<H Q I I 32s 32s"
+    # 32s = 32 Bytes → Merkle root of the records
+    RECORDS_HEADER_SIZE = struct.calcsize(RECORDS_HEADER_FORMAT)
+    RECORD_COUNT_FORMAT = "<I"  # Number of records at the start of the body
+    RECORD_PAYLOAD_LENGTH_FORMAT = "<I"  # Length of a record payload
+    RECORD_SIGNATURE_LENGTH_FORMAT = "<H"  # Length of a record signature
 
     payload: bytes
     signature: bytes
@@ -47,15 +60,68 @@ class Block:
         return header + self.payload + self.signature
 
     @staticmethod
-    def calculate_hash(block: bytes) -> bytes:
+    def calculate_hash(block: bytes | memoryview) -> bytes:
+        """
+        Calculates the hash of a built block. Version 2 headers commit to their records, so only the header is hashed.
+
+        :param block: The built block, or only its header for version 2 blocks
+        :type block: bytes | memoryview
+        :return: The hash of the block
+        :rtype: bytes
+        """
+        if Block.header_size(block) == Block.RECORDS_HEADER_SIZE:
+            return sha256(memoryview(block)[: Block.RECORDS_HEADER_SIZE]).digest()
+
         return sha256(block).digest()
 
+    @staticmethod
+    def header_size(block: bytes | memoryview) -> int:
+        """
+        Gets the size of the header of a built block from its version.
+
+        :param block: The built block or its header
+        :type block: bytes | memoryview
+        :return: The size of the header in bytes
+        :rtype: int
+        """
+        (version,) = struct.unpack_from("<H", block)
+        return (
+            Block.RECORDS_HEADER_SIZE
+            if version >= Block.RECORDS_VERSION
+            else Block.HEADER_SIZE
+        )
+
+    @staticmethod
+    def from_bytes(block: bytes | memoryview) -> "ParsedBlock":
+        """
+        Parses a built block without copying its payload and signature.
+
+        :param block: The built block
+        :type block: bytes | memoryview
+        :return: The parsed block
+        :rtype: ParsedBlock
+        """
+        return ParsedBlock(block)
+
+    @staticmethod
+    def parse_header(block: bytes | memoryview) -> "BlockHeader":
+        """
+        Parses only the header of a built block. This is the fast path for validations that never need the payload.
+
+        :param block: The built block or its header
+        :type block: bytes | memoryview
+        :return: The parsed header
+        :rtype: BlockHeader
+        """
+        return BlockHeader.from_bytes(block)
+
     def _build_header(
         self,
         payload_length: int,
         previous_hash: bytes,
         version: int = 1,
         flags: int = 0,
+        records_root: bytes | None = None,
     ) -> bytes:
         """
         Builds the header of the block.
@@ -69,11 +135,24 @@ class Block:
         :type version: int
         :param flags: Flags the blog as a special kind of block. (Not used right now)
         :type flags: int
+        :param records_root: Merkle root of the records of a version 2 block
+        :type records_root: bytes | None
         :return: The block as bytes, consisting of the header, payload, and signature.
         :rtype: bytes
         """
         timestamp = int(datetime.now().timestamp())
 
+        if version >= self.RECORDS_VERSION:
+            return struct.pack(
+                self.RECORDS_HEADER_FORMAT,
+                version,
+                timestamp,
+                flags,
+                payload_length,
+                previous_hash,
+                records_root,
+            )
+
         return struct.pack(
             self.HEADER_FORMAT,
             version,
@@ -82,3 +161,305 @@ class Block:
             payload_length,
             previous_hash,
         )
+
+
+class MultiRecordBlock(Block):
+    records: list[tuple[bytes, bytes]]
+
+    def __init__(self, records: list[tuple[bytes, bytes]], previous_hash: bytes = None):
+        """
+        Define a version 2 block that carries many records. The payload is the encoded list of (payload, signature) records
+        and the header commits to the Merkle root of the records, which amortizes the header, the hashing and the storage keys over all records.
+
+        :param self: Instance of MultiRecordBlock
+        :param records: The (payload, signature) tuples of the deployment records
+        :type records: list[tuple[bytes, bytes]]
+        :param previous_hash: The hash of the previous block in the blockchain, used to link the blocks together
+        :type previous_hash: bytes, optional
+        """
+        super().__init__(self._encode_records(records), b"", previous_hash)
+        self.records = records
+
+    def build(self) -> bytes:
+        """
+        Builds the block.
+        """
+        records_root = merkle_root(
+            [record_leaf(payload, signature) for payload, signature in self.records]
+        )
+
+        header = self._build_header(
+            len(self.payload),
+            self.previous_hash,
+            version=self.RECORDS_VERSION,
+            records_root=records_root,
+        )
+
+        return header + self.payload
+
+    @classmethod
+    def assemble(
+        cls, header: bytes | memoryview, records: list[tuple[bytes, bytes]]
+    ) -> bytes:
+        """
+        Assembles a built block from a received header and its records, e.g. when a compact block
+        is rebuilt from the records in the mempool. The caller must check the records root of the result.
+
+        :param cls: The MultiRecordBlock class
+        :param header: The packed version 2 header
+        :type header: bytes | memoryview
+        :param records: The (payload, signature) tuples of the deployment records in block order
+        :type records: list[tuple[bytes, bytes]]
+        :return: The built block
+        :rtype: bytes
+        """
+        return bytes(header) + cls._encode_records(records)
+
+    @classmethod
+    def _encode_records(cls, records: list[tuple[bytes, bytes]]) -> bytes:
+        """
+        Encodes the records as count followed by the length-prefixed payload and signature of every record.
+
+        :param cls: The MultiRecordBlock class
+        :param records: The (payload, signature) tuples of the deployment records
+        :type records: list[tuple[bytes, bytes]]
+        :return: The encoded records
+        :rtype: bytes
+        """
+        parts = [struct.pack(cls.RECORD_COUNT_FORMAT, len(records))]
+
+        for payload, signature in records:
+            parts.append(struct.pack(cls.RECORD_PAYLOAD_LENGTH_FORMAT, len(payload)))
+            parts.append(payload)
+            parts.append(
+                struct.pack(cls.RECORD_SIGNATURE_LENGTH_FORMAT, len(signature))
+            )
+            parts.append(signature)
+
+        return b"".join(parts)
+
+
+class BlockHeader:
+    __slots__ = (
+        "version",
+        "timestamp",
+        "flags",
+        "payload_length",
+        "previous_hash",
+        "records_root",
+    )
+
+    version: int
+    timestamp: int
+    flags: int
+    payload_length: int
+    previous_hash: bytes
+    records_root: bytes | None  # Merkle root of the records of version 2 blocks
+
+    def __init__(
+        self,
+        version: int,
+        timestamp: int,
+        flags: int,
+        payload_length: int,
+        previous_hash: bytes,
+        records_root: bytes | None = None,
+    ):
+        """
+        The decoded header fields of a built block.
+
+        :param self: Instance of BlockHeader
+        :param version: Version of the block format
+        :type version: int
+        :param timestamp: UNIX timestamp of the block
+        :type timestamp: int
+        :param flags: Flags of the block
+        :type flags: int
+        :param payload_length: Length of the payload in bytes
+        :type payload_length: int
+        :param previous_hash: Hash of the previous block
+        :type previous_hash: bytes
+        :param records_root: Merkle root of the records of a version 2 block
+        :type records_root: bytes | None
+        """
+        self.version = version
+        self.timestamp = timestamp
+        self.flags = flags
+        self.payload_length = payload_length
+        self.previous_hash = previous_hash
+        self.records_root = records_root
+
+    @property
+    def size(self) -> int:
+        """
+        Gets the size of the packed header.
+
+        :param self: Instance of BlockHeader
+        :return: The size of the header in bytes
+        :rtype: int
+        """
+        return (
+            Block.RECORDS_HEADER_SIZE
+            if self.version >= Block.RECORDS_VERSION
+            else Block.HEADER_SIZE
+        )
+
+    @classmethod
+    def from_bytes(cls, block: bytes | memoryview) -> Self:
+        """
+        Decodes the header at the start of a built block.
+
+        :param cls: The BlockHeader class
+        :param block: The built block or its header
+        :type block: bytes | memoryview
+        :return: The parsed header
+        :rtype: Self
+        """
+        return cls(*_unpack_header(block))
+
+
+class ParsedBlock(BlockHeader):
+    __slots__ = ("_view",)
+
+    def __init__(self, block: bytes | memoryview):
+        """
+        A built block parsed over a memoryview. The header fields are decoded eagerly,
+        the header, payload and signature are slices of the same buffer and are never copied.
+
+        :param self: Instance of ParsedBlock
+        :param block: The built block
+        :type block: bytes | memoryview
+        """
+        self._view = memoryview(block)
+        super().__init__(*_unpack_header(self._view))
+
+        if len(self._view) < self.size + self.payload_length:
+            raise ValueError("The block is shorter than its header declares.")
+
+        # The hash of a version 2 block covers only its header, so trailing bytes would travel with the same hash.
+        if (
+            self.version >= Block.RECORDS_VERSION
+            and len(self._view) != self.size + self.payload_length
+        ):
+            raise ValueError("The block is longer than its header declares.")
+
+    @property
+    def header(self) -> memoryview:
+        """
+        Gets the packed header of the block.
+
+        :param self: Instance of ParsedBlock
+        :return: The packed header
+        :rtype: memoryview
+        """
+        return self._view[: self.size]
+
+    @property
+    def body(self) -> memoryview:
+        """
+        Gets the body of the block, which is everything after the header.
+
+        :param self: Instance of ParsedBlock
+        :return: The payload followed by the signature
+        :rtype: memoryview
+        """
+        return self._view[self.size :]
+
+    @property
+    def payload(self) -> memoryview:
+        """
+        Gets the payload of the block. The payload of a version 2 block are its encoded records.
+
+        :param self: Instance of ParsedBlock
+        :return: The payload
+        :rtype: memoryview
+        """
+        return self._view[self.size : self.size + self.payload_length]
+
+    @property
+    def signature(self) -> memoryview:
+        """
+        Gets the signature of the block, which are all bytes after the payload. Version 2 blocks have no block signature,
+        so it is always empty for them.
+
+        :param self: Instance of ParsedBlock
+        :return: The signature
+        :rtype: memoryview
+        """
+        return self._view[self.size + self.payload_length :]
+
+    def records(self) -> list[tuple[memoryview, memoryview]]:
+        """
+        Gets the records of the block as slices of the block buffer. A version 1 block holds exactly one record.
+
+        :param self: Instance of ParsedBlock
+        :return: The (payload, signature) tuples of the records
+        :rtype: list[tuple[memoryview, memoryview]]
+        """
+        if self.version < Block.RECORDS_VERSION:
+            return [(self.payload, self.signature)]
+
+        payload = self.payload
+        offset = struct.calcsize(Block.RECORD_COUNT_FORMAT)
+        payload_length_size = struct.calcsize(Block.RECORD_PAYLOAD_LENGTH_FORMAT)
+        signature_length_size = struct.calcsize(Block.RECORD_SIGNATURE_LENGTH_FORMAT)
+        records = []
+
+        try:
+            (count,) = struct.unpack_from(Block.RECORD_COUNT_FORMAT, payload)
+
+            for _ in range(count):
+                (length,) = struct.unpack_from(
+                    Block.RECORD_PAYLOAD_LENGTH_FORMAT, payload, offset
+                )
+
+                offset += payload_length_size
+                record_payload = payload[offset : offset + length]
+                offset += length
+
+                (length,) = struct.unpack_from(
+                    Block.RECORD_SIGNATURE_LENGTH_FORMAT, payload, offset
+                )
+
+                offset += signature_length_size
+                records.append((record_payload, payload[offset : offset + length]))
+                offset += length
+        except struct.error as e:
+            raise ValueError("The records are truncated.") from e
+
+        if offset != len(payload):
+            raise ValueError("The records do not match the payload length.")
+
+        return records
+
+    def has_valid_records_root(self) -> bool:
+        """
+        Checks that the Merkle root in the header commits to the records in the body.
+        Version 1 blocks have no records root and are hashed as a whole instead.
+
+        :param self: Instance of ParsedBlock
+        :return: True if the records match the header
+        :rtype: bool
+        """
+        if self.version < Block.RECORDS_VERSION:
+            return True
+
+        leaves = [
+            record_leaf(payload, signature) for payload, signature in self.records()
+        ]
+        return merkle_root(leaves) == self.records_root
+
+
+def _unpack_header(block: bytes | memoryview) -> tuple:
+    """
+    Unpacks the header fields of a built block with the header format of its version.
+
+    :param block: The built block or its header
+    :type block: bytes | memoryview
+    :return: The header fields
+    :rtype: tuple
+    """
+    if Block.header_size(block) == Block.RECORDS_HEADER_SIZE:
+        return struct.unpack_from(Block.RECORDS_HEADER_FORMAT, block)
+
+    return struct.unpack_from(Block.HEADER_FORMAT, block)
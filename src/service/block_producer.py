@@ -0,0 +1,147 @@
+import asyncio
+import time
+
+from mempool import Mempool
+
+
+class BlockProducer:
+    """
+    Decides when the waiting records are cut into a block. A block is due when enough records or bytes are waiting,
+    or when the oldest record of a client waited for the maximum latency. The number of records that is enough
+    follows the arrival rate: a slow trickle of records gets a block per record without any delay,
+    and a burst is batched into blocks of about the records that arrive within the latency budget.
+    """
+
+    SMOOTHING = 0.2
+
+    max_records: int
+    max_bytes: int
+    max_latency: float  # Seconds a record of a client waits for its block at most
+    arrival_rate: float  # Exponential moving average of the arriving records per second
+    _last_arrival: float | None  # Monotonic time of the last arrival
+    # Monotonic time since records of clients are waiting, None if none are
+    _first_waiting: float | None
+    _arrival: asyncio.Event
+
+    def __init__(
+        self,
+        max_records: int = 1000,
+        max_bytes: int = 2**20,
+        max_latency: float = 0.05,
+    ):
+        """
+        Initializes a BlockProducer without any waiting records.
+
+        :param self: Instance of BlockProducer
+        :param max_records: Maximum number of records in a block
+        :type max_records: int
+        :param max_bytes: Maximum number of bytes of the records in a block
+        :type max_bytes: int
+        :param max_latency: Seconds a record of a client waits for its block at most
+        :type max_latency: float
+        """
+        self.max_records = max_records
+        self.max_bytes = max_bytes
+        self.max_latency = max_latency
+        self.arrival_rate = 0.0
+        self._last_arrival = None
+        self._first_waiting = None
+        self._arrival = asyncio.Event()
+
+    def record_arrived(self, now: float | None = None):
+        """
+        Notes that a client added a record to the mempool.
+
+        :param self: Instance of BlockProducer
+        :param now: The monotonic time or None for the current time
+        :type now: float | None
+        """
+        now = time.monotonic() if now is None else now
+
+        if self._last_arrival is not None:
+            rate = 1 / max(now - self._last_arrival, 1e-6)
+            self.arrival_rate += self.SMOOTHING * (rate - self.arrival_rate)
+
+        self._last_arrival = now
+
+        if self._first_waiting is None:
+            self._first_waiting = now
+
+        self._arrival.set()
+
+    def target_records(self) -> int:
+        """
+        Returns the number of waiting records that makes a block due at the current arrival rate.
+
+        :param self: Instance of BlockProducer
+        :return: The number of records
+        :rtype: int
+        """
+        return max(
+            1, min(round(self.arrival_rate * self.max_latency), self.max_records)
+        )
+
+    def is_due(self, count: int, size: int, now: float) -> bool:
+        """
+        Checks whether the waiting records must be cut into a block.
+
+        :param self: Instance of BlockProducer
+        :param count: The number of waiting records
+        :type count: int
+        :param size: The number of bytes of the waiting records
+        :type size: int
+        :param now: The monotonic time
+        :type now: float
+        :return: True if a block is due
+        :rtype: bool
+        """
+        if self._first_waiting is None or count == 0:
+            return False
+
+        return (
+            count >= self.target_records()
+            or size >= self.max_bytes
+            or now - self._first_waiting >= self.max_latency
+        )
+
+    async def wait(self, mempool: Mempool):
+        """
+        Waits until a block is due for the records in the mempool.
+
+        :param self: Instance of BlockProducer
+        :param mempool: The mempool with the waiting records
+        :type mempool: Mempool
+        """
+        while True:
+            now = time.monotonic()
+
+            if self.is_due(len(mempool), mempool.size, now):
+                return
+
+            self._arrival.clear()
+
+            if self._first_waiting is None or len(mempool) == 0:
+                self._first_waiting = None
+                await self._arrival.wait()
+                continue
+
+            try:
+                await asyncio.wait_for(
+                    self._arrival.wait(), self._first_waiting + self.max_latency - now
+                )
+            except asyncio.TimeoutError:
+                pass
+
+    def produced(self, remaining: int, now: float | None = None):
+        """
+        Notes that a block was cut from the mempool.
+
+        :param self: Instance of BlockProducer
+        :param remaining: The number of records left in the mempool
+        :type remaining: int
+        :param now: The monotonic time or None for the current time
+        :type now: float | None
+        """
+        self._first_waiting = (
+            (time.monotonic() if now is None else now) if remaining else None
+        )
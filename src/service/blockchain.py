@@ -1,43 +1,957 @@
+import asyncio
+
+from asyncio import Future
 from pathlib import Path
+from typing import Iterator
 from plyvel import DB
+from block import Block
+from bloom_filter import BloomFilter
+from indexes import (
+    DEFAULT_INDEXES,
+    INDEX_PREFIX,
+    SecondaryIndex,
+    decode_record,
+    encode_key,
+    escape_key,
+)
+from merkle import merkle_proof, record_leaf
+
+# Key schema of the database. Every keyspace has its own prefix and heights are encoded big-endian,
+# so the lexicographic order of LevelDB matches the height order.
+# Keys must never be 8 bytes long, because those are the height keys of the legacy schema 1.
+SCHEMA_VERSION = 4
+SCHEMA_KEY = b"m:schema_version"  # Metadata key holding the version of the key schema
+TIP_KEY = b"m:tip"  # Metadata key holding the height and hash of the latest block
+HEADER_PREFIX = b"h"  # Keyspace of the packed block headers by height
+BODY_PREFIX = b"b"  # Keyspace of the block bodies (payload and signature) by height
+HASH_INDEX_PREFIX = b"x"  # Keyspace of the block heights by block hash
+MERKLE_ROOT_INDEX_PREFIX = b"r"  # Keyspace of the signer addresses by Merkle root
+
+# Keyspaces derived from the blocks. They can be dropped and rebuilt with reindex.py at any time.
+DERIVED_PREFIXES = [HASH_INDEX_PREFIX, MERKLE_ROOT_INDEX_PREFIX, INDEX_PREFIX]
+
+# Number of Merkle roots the Bloom filter is sized for at least
+BLOOM_FILTER_MIN_CAPACITY = 100000
 
 
 class Blockchain:
-    def __init__(self):
+    tip_height: int  # Height of the latest block, -1 for an empty chain
+    tip_hash: bytes | None  # Hash of the latest block, None for an empty chain
+    merkle_root_filter: BloomFilter  # In-memory front of the Merkle root index
+    indexes: list[SecondaryIndex]  # Secondary indexes maintained on append
+    sync: bool  # Whether writes are synced to disk before they are acknowledged
+    group_commit_window: float  # Seconds to collect blocks for one group commit
+
+    def __init__(
+        self,
+        path: Path = Path("data") / "plockchain.db",
+        sync: bool = False,
+        group_commit_window: float = 0.0,
+        indexes: list[SecondaryIndex] = DEFAULT_INDEXES,
+    ):
         """
-        Initializes the Blockchain instance and opens the LevelDB database.
+        Initializes the Blockchain instance, opens the LevelDB database and loads the chain tip.
 
         :param self: Instance of Blockchain
+        :param path: Path to the LevelDB database
+        :type path: Path
+        :param sync: Whether writes are synced to disk before they are acknowledged
+        :type sync: bool
+        :param group_commit_window: Seconds commit_block waits for further blocks to share one write and sync with
+        :type group_commit_window: float
+        :param indexes: Secondary indexes over the deployment records maintained on append
+        :type indexes: list[SecondaryIndex]
         """
-        data_dir = Path("data")
-        data_dir.mkdir(parents=True, exist_ok=True)
-        self._db = DB(str(data_dir / "plockchain.db"), create_if_missing=True)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = DB(str(path), create_if_missing=True)
+        self.sync = sync
+        self.group_commit_window = group_commit_window
+        self.indexes = indexes
+        # (block bytes, future) tuples waiting for the next group commit
+        self._pending = []
+        # Hash of the last block waiting for the next group commit
+        self._pending_hash = None
+        self._flush_handle = None
+        self._check_schema()
+        self._load_tip()
+        self.rebuild_merkle_root_filter()
 
-    def add_block(self, block_bytes: bytes):
+    def add_block(self, block_bytes: bytes) -> int:
         """
         Adds a block to the blockchain by storing it in the LevelDB database with an incrementing height as the key.
+        The block and the new tip are written in one atomic batch, so the tip never points to a missing block.
+
+        :param self: Instance of Blockchain
+        :param block_bytes: The block data in bytes to be added to the blockchain
+        :type block_bytes: bytes
+        :return: The height of the added block
+        :rtype: int
+        """
+        return self.add_blocks([block_bytes])[0]
+
+    def add_blocks(self, blocks: list[bytes]) -> list[int]:
+        """
+        Adds many blocks to the blockchain in one atomic write batch together with the new tip.
+        The blocks are stored in the given order on top of the current tip.
+
+        :param self: Instance of Blockchain
+        :param blocks: The blocks in bytes to be added to the blockchain
+        :type blocks: list[bytes]
+        :return: The heights of the added blocks in the same order
+        :rtype: list[int]
+        """
+        if not blocks:
+            return []
+
+        height = self.tip_height
+        block_hash = self.tip_hash
+        heights = []
+
+        with self._db.write_batch(transaction=True, sync=self.sync) as batch:
+            for block_bytes in blocks:
+                height += 1
+                block_hash = Block.calculate_hash(block_bytes)
+                self._put_block(batch, height, block_bytes, block_hash)
+                heights.append(height)
+
+            batch.put(TIP_KEY, self._encode_tip(height, block_hash))
+
+        self.tip_height = height
+        self.tip_hash = block_hash
+
+        if self.merkle_root_filter.is_full():
+            self.rebuild_merkle_root_filter()
+
+        return heights
+
+    @property
+    def head_hash(self) -> bytes | None:
+        """
+        Gets the hash of the newest block including the blocks waiting for a group commit.
+        New blocks must link to this hash, so blocks built while a group commit is pending still form one chain.
+
+        :param self: Instance of Blockchain
+        :return: The hash of the newest block or None for an empty chain
+        :rtype: bytes | None
+        """
+        return self._pending_hash if self._pending else self.tip_hash
+
+    @property
+    def head_height(self) -> int:
+        """
+        Gets the height of the newest block including the blocks waiting for a group commit.
+
+        :param self: Instance of Blockchain
+        :return: The height of the newest block or -1 for an empty chain
+        :rtype: int
+        """
+        return self.tip_height + len(self._pending)
+
+    async def commit_block(self, block_bytes: bytes) -> int:
+        """
+        Queues a block for the next group commit and waits until it is written.
+        All blocks queued within the group commit window are written with one batch and one sync.
+
+        :param self: Instance of Blockchain
+        :param block_bytes: The block data in bytes to be added to the blockchain
+        :type block_bytes: bytes
+        :return: The height of the added block
+        :rtype: int
+        """
+        return await self.enqueue_block(block_bytes)
+
+    def enqueue_block(self, block_bytes: bytes) -> Future:
+        """
+        Queues a block for the next group commit without waiting for it. The head hash moves to the block at once,
+        so a block built right afterwards links to it.
 
         :param self: Instance of Blockchain
         :param block_bytes: The block data in bytes to be added to the blockchain
         :type block_bytes: bytes
+        :return: The future of the height of the added block
+        :rtype: Future
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((block_bytes, future))
+        self._pending_hash = Block.calculate_hash(block_bytes)
+
+        if self._flush_handle is None:
+            self._flush_handle = loop.call_later(
+                self.group_commit_window, self._flush_pending
+            )
+
+        return future
+
+    def get_block(self, height: int) -> bytes | None:
+        """
+        Gets the block at the given height.
+
+        :param self: Instance of Blockchain
+        :param height: The height of the block
+        :type height: int
+        :return: The block as bytes or None if there is no block at this height
+        :rtype: bytes | None
+        """
+        header = self._db.get(self._height_key(HEADER_PREFIX, height))
+
+        if header is None:
+            return None
+
+        return header + self._db.get(self._height_key(BODY_PREFIX, height))
+
+    def get_header(self, height: int) -> bytes | None:
+        """
+        Gets the packed header of the block at the given height without reading its body.
+
+        :param self: Instance of Blockchain
+        :param height: The height of the block
+        :type height: int
+        :return: The packed header or None if there is no block at this height
+        :rtype: bytes | None
+        """
+        return self._db.get(self._height_key(HEADER_PREFIX, height))
+
+    def iter_headers(
+        self, start: int = 0, stop: int | None = None
+    ) -> Iterator[tuple[int, bytes]]:
         """
-        it = self._db.iterator(reverse=True)
-        last_key, _ = self._db.next(it)
-        last_height = int.from_bytes(last_key, "little")
-        last_height += 1
-        height_key = last_height.to_bytes(8, "little")  # uint64
-        self._db.put(height_key, block_bytes)
+        Streams the packed headers in height order with one sequential scan over the header keyspace.
+        Header walks never read a payload.
 
-    def get_latest_block(self):
+        :param self: Instance of Blockchain
+        :param start: The height of the first header
+        :type start: int
+        :param stop: The height after the last header or None to scan up to the tip
+        :type stop: int | None
+        :return: An iterator of (height, header) tuples
+        :rtype: Iterator[tuple[int, bytes]]
+        """
+        return _iter_keyspace(self._db, HEADER_PREFIX, start, stop)
+
+    def verify_links(self, start: int = 0, stop: int | None = None) -> int | None:
+        """
+        Verifies that every header links to the block below it. The walk reads only headers and
+        resolves the previous hash with the hash index, so no payload is read.
+
+        :param self: Instance of Blockchain
+        :param start: The height of the first header to verify
+        :type start: int
+        :param stop: The height after the last header or None to verify up to the tip
+        :type stop: int | None
+        :return: The height of the first header with a broken link or None if all links are intact
+        :rtype: int | None
+        """
+        for height, header in self.iter_headers(start, stop):
+            previous_hash = Block.parse_header(header).previous_hash
+
+            if height == 0:
+                linked = previous_hash == bytes(32)
+            else:
+                linked = self.get_height_by_hash(previous_hash) == height - 1
+
+            if not linked:
+                return height
+
+        return None
+
+    def iter_blocks(
+        self, start: int = 0, stop: int | None = None
+    ) -> Iterator[tuple[int, bytes]]:
+        """
+        Streams the blocks in height order with one sequential scan over the header and the body keyspace.
+        The scan bypasses the block cache, so a full chain scan does not evict the hot blocks.
+
+        :param self: Instance of Blockchain
+        :param start: The height of the first block
+        :type start: int
+        :param stop: The height after the last block or None to scan up to the tip
+        :type stop: int | None
+        :return: An iterator of (height, block) tuples
+        :rtype: Iterator[tuple[int, bytes]]
+        """
+        return iter_blocks(self._db, start, stop)
+
+    def get_height_by_hash(self, block_hash: bytes) -> int | None:
+        """
+        Gets the height of the block with the given hash from the hash index.
+
+        :param self: Instance of Blockchain
+        :param block_hash: The hash of the block as calculated by Block.calculate_hash
+        :type block_hash: bytes
+        :return: The height of the block or None if the block is unknown
+        :rtype: int | None
+        """
+        height = self._db.get(HASH_INDEX_PREFIX + block_hash)
+
+        if height is None:
+            return None
+
+        return int.from_bytes(height, "big")
+
+    def get_block_by_hash(self, block_hash: bytes) -> bytes | None:
+        """
+        Gets the block with the given hash with two point lookups instead of a chain scan.
+
+        :param self: Instance of Blockchain
+        :param block_hash: The hash of the block as calculated by Block.calculate_hash
+        :type block_hash: bytes
+        :return: The block as bytes or None if the block is unknown
+        :rtype: bytes | None
+        """
+        height = self.get_height_by_hash(block_hash)
+
+        if height is None:
+            return None
+
+        return self.get_block(height)
+
+    def has_merkle_root(self, merkle_root: str) -> bool:
+        """
+        Checks whether a deployment with the given Merkle root is recorded.
+        Unknown Merkle roots are answered by the Bloom filter without touching the disk.
+
+        :param self: Instance of Blockchain
+        :param merkle_root: The Merkle root of the deployment as hex string
+        :type merkle_root: str
+        :return: True if a deployment with the Merkle root is recorded
+        :rtype: bool
+        """
+        return next(self._iter_merkle_root_index(merkle_root), None) is not None
+
+    def find_deployments(self, merkle_root: str) -> list[tuple[int, str]]:
+        """
+        Finds the deployments with the given Merkle root and who signed them.
+
+        :param self: Instance of Blockchain
+        :param merkle_root: The Merkle root of the deployment as hex string
+        :type merkle_root: str
+        :return: (height, address) tuples of the blocks recording the deployment in height order
+        :rtype: list[tuple[int, str]]
+        """
+        return [
+            (self._decode_height(key), address.decode())
+            for key, address in self._iter_merkle_root_index(merkle_root)
+        ]
+
+    def has_record(self, payload: bytes, signature: bytes) -> bool:
+        """
+        Checks whether a record is in a block. The blocks are found through the Merkle root index,
+        so records without a Merkle root are never found.
+
+        :param self: Instance of Blockchain
+        :param payload: The payload of the record
+        :type payload: bytes
+        :param signature: The signature of the record
+        :type signature: bytes
+        :return: True if a block contains the record
+        :rtype: bool
+        """
+        record = decode_record(payload)
+
+        if record is None or not isinstance(record.get("merkle_root"), str):
+            return False
+
+        leaf = record_leaf(payload, signature)
+
+        return any(
+            leaf == record_leaf(*other)
+            for height, _ in self.find_deployments(record["merkle_root"])
+            for other in Block.from_bytes(self.get_block(height)).records()
+        )
+
+    def get_record_proof(
+        self, merkle_root: str
+    ) -> tuple[int, int, bytes, bytes, list[bytes]] | None:
+        """
+        Builds the inclusion proof of the first recorded deployment with the given Merkle root.
+        A light client verifies the proof against the records root in the header of the block.
+
+        :param self: Instance of Blockchain
+        :param merkle_root: The Merkle root of the deployment as hex string
+        :type merkle_root: str
+        :return: The height of the block, the index of the record in the block, the payload and signature of the record
+            and the sibling hashes of the proof, or None if the deployment is not recorded
+        :rtype: tuple[int, int, bytes, bytes, list[bytes]] | None
+        """
+        for height, _ in self.find_deployments(merkle_root):
+            records = Block.from_bytes(self.get_block(height)).records()
+
+            for index, (payload, signature) in enumerate(records):
+                record = decode_record(payload)
+
+                if record is not None and record.get("merkle_root") == merkle_root:
+                    leaves = [record_leaf(p, s) for p, s in records]
+
+                    return (
+                        height,
+                        index,
+                        bytes(payload),
+                        bytes(signature),
+                        merkle_proof(leaves, index),
+                    )
+
+        return None
+
+    def rebuild_merkle_root_filter(self):
+        """
+        Rebuilds the Bloom filter from the keys of the Merkle root index.
+        The filter is sized with headroom, so it is rebuilt only when the index outgrows it.
+
+        :param self: Instance of Blockchain
+        """
+        with self._db.iterator(
+            prefix=MERKLE_ROOT_INDEX_PREFIX, include_value=False
+        ) as it:
+            count = sum(1 for _ in it)
+
+        merkle_root_filter = BloomFilter(max(BLOOM_FILTER_MIN_CAPACITY, 2 * count))
+
+        with self._db.iterator(
+            prefix=MERKLE_ROOT_INDEX_PREFIX, include_value=False
+        ) as it:
+            for key in it:
+                merkle_root_filter.add(key[len(MERKLE_ROOT_INDEX_PREFIX) : -8])
+
+        self.merkle_root_filter = merkle_root_filter
+
+    def query_index(self, name: str, key: bytes) -> Iterator[int]:
+        """
+        Lazily yields the heights of the blocks whose index key equals the given key, ordered by height.
+
+        :param self: Instance of Blockchain
+        :param name: The name of the secondary index
+        :type name: str
+        :param key: The index key
+        :type key: bytes
+        :return: An iterator of block heights
+        :rtype: Iterator[int]
+        """
+        with self._db.iterator(
+            prefix=self._get_index(name).keyspace() + encode_key(key),
+            include_value=False,
+        ) as it:
+            for key in it:
+                yield self._decode_height(key)
+
+    def query_index_prefix(self, name: str, prefix: bytes = b"") -> Iterator[int]:
+        """
+        Lazily yields the heights of the blocks whose index key starts with the given prefix, ordered by index key.
+
+        :param self: Instance of Blockchain
+        :param name: The name of the secondary index
+        :type name: str
+        :param prefix: The prefix of the index keys
+        :type prefix: bytes
+        :return: An iterator of block heights
+        :rtype: Iterator[int]
+        """
+        with self._db.iterator(
+            prefix=self._get_index(name).keyspace() + escape_key(prefix),
+            include_value=False,
+        ) as it:
+            for key in it:
+                yield self._decode_height(key)
+
+    def query_index_range(
+        self, name: str, start: bytes, stop: bytes | None = None
+    ) -> Iterator[int]:
+        """
+        Lazily yields the heights of the blocks whose index key is in the range [start, stop), ordered by index key.
+
+        :param self: Instance of Blockchain
+        :param name: The name of the secondary index
+        :type name: str
+        :param start: The first index key of the range
+        :type start: bytes
+        :param stop: The index key after the range or None for an open range
+        :type stop: bytes | None
+        :return: An iterator of block heights
+        :rtype: Iterator[int]
+        """
+        keyspace = self._get_index(name).keyspace()
+
+        with self._db.iterator(
+            start=keyspace + escape_key(start),
+            stop=(
+                keyspace + escape_key(stop)
+                if stop is not None
+                else _prefix_upper_bound(keyspace)
+            ),
+            include_value=False,
+        ) as it:
+            for key in it:
+                yield self._decode_height(key)
+
+    def get_latest_block(self) -> bytes | None:
         """
         Gets the block with the highest blockheight.
+
+        :param self: Instance of Blockchain
+        :return: The latest block as bytes or None if the chain is empty
+        :rtype: bytes | None
         """
-        it = self._db.iterator(reverse=True)
-        _, last_value = next(it)
-        return last_value
+        if self.tip_height < 0:
+            return None
+
+        return self.get_block(self.tip_height)
 
     def close(self):
         """
-        Closes the database.
+        Writes the blocks waiting for a group commit and closes the database.
         """
+        self._flush_pending()
         self._db.close()
+
+    def _flush_pending(self):
+        """
+        Writes all blocks waiting for a group commit in one batch and resolves their futures.
+
+        :param self: Instance of Blockchain
+        """
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        pending, self._pending = self._pending, []
+
+        if not pending:
+            return
+
+        try:
+            heights = self.add_blocks([block_bytes for block_bytes, _ in pending])
+        except Exception as e:
+            for _, future in pending:
+                if not future.done():
+                    future.set_exception(e)
+
+            return
+
+        for (_, future), height in zip(pending, heights):
+            if not future.done():
+                future.set_result(height)
+
+    def _put_block(self, batch, height: int, block_bytes: bytes, block_hash: bytes):
+        """
+        Puts a block and all of its index entries into a write batch.
+
+        :param self: Instance of Blockchain
+        :param batch: The plyvel write batch of the commit
+        :param height: The height of the block
+        :type height: int
+        :param block_bytes: The block data in bytes
+        :type block_bytes: bytes
+        :param block_hash: The hash of the block
+        :type block_hash: bytes
+        """
+        parsed = Block.from_bytes(block_bytes)
+        batch.put(self._height_key(HEADER_PREFIX, height), bytes(parsed.header))
+        batch.put(self._height_key(BODY_PREFIX, height), bytes(parsed.body))
+
+        for key, value in index_entries(height, block_bytes, block_hash, self.indexes):
+            batch.put(key, value)
+
+            if key.startswith(MERKLE_ROOT_INDEX_PREFIX):
+                self.merkle_root_filter.add(key[len(MERKLE_ROOT_INDEX_PREFIX) : -8])
+
+    def _iter_merkle_root_index(
+        self, merkle_root: str
+    ) -> Iterator[tuple[bytes, bytes]]:
+        """
+        Iterates the entries of the Merkle root index for the given Merkle root behind the Bloom filter.
+
+        :param self: Instance of Blockchain
+        :param merkle_root: The Merkle root of the deployment as hex string
+        :type merkle_root: str
+        :return: An iterator of (key, address) tuples
+        :rtype: Iterator[tuple[bytes, bytes]]
+        """
+        merkle_root_bytes = merkle_root.encode()
+
+        if merkle_root_bytes not in self.merkle_root_filter:
+            return
+
+        with self._db.iterator(
+            prefix=MERKLE_ROOT_INDEX_PREFIX + merkle_root_bytes
+        ) as it:
+            for key, address in it:
+                # A longer Merkle root may share the prefix, so the height must follow directly.
+                if (
+                    len(key)
+                    == len(MERKLE_ROOT_INDEX_PREFIX) + len(merkle_root_bytes) + 8
+                ):
+                    yield key, address
+
+    def _get_index(self, name: str) -> SecondaryIndex:
+        """
+        Gets a secondary index by its name.
+
+        :param self: Instance of Blockchain
+        :param name: The name of the secondary index
+        :type name: str
+        :return: The secondary index
+        :rtype: SecondaryIndex
+        """
+        for index in self.indexes:
+            if index.name == name:
+                return index
+
+        raise ValueError(f"Unknown index: {name}")
+
+    def _check_schema(self):
+        """
+        Checks the key schema of the database. A new database is stamped with the current schema version.
+        Databases with an older schema have to be migrated with migrate.py before they can be opened.
+
+        :param self: Instance of Blockchain
+        """
+        version = read_schema_version(self._db)
+
+        if version is None:
+            self._db.put(SCHEMA_KEY, SCHEMA_VERSION.to_bytes(2, "big"))
+        elif version != SCHEMA_VERSION:
+            raise RuntimeError(
+                f"The database uses key schema version {version} but version {SCHEMA_VERSION} is required. Run migrate.py first."
+            )
+
+    def _load_tip(self):
+        """
+        Loads the chain tip from the metadata key. An empty database has no tip.
+
+        :param self: Instance of Blockchain
+        """
+        tip = self._db.get(TIP_KEY)
+
+        if tip is None:
+            self.tip_height = -1
+            self.tip_hash = None
+        else:
+            self.tip_height = int.from_bytes(tip[:8], "big")
+            self.tip_hash = tip[8:]
+
+    @staticmethod
+    def _height_key(prefix: bytes, height: int) -> bytes:
+        """
+        Encodes a block height as a database key of a keyspace.
+
+        :param prefix: The prefix of the keyspace
+        :type prefix: bytes
+        :param height: The height of the block
+        :type height: int
+        :return: The key of the block in the keyspace
+        :rtype: bytes
+        """
+        return prefix + height.to_bytes(8, "big")  # uint64
+
+    @staticmethod
+    def _decode_height(key: bytes) -> int:
+        """
+        Decodes the block height from a database key.
+
+        :param key: The key of the block
+        :type key: bytes
+        :return: The height of the block
+        :rtype: int
+        """
+        return int.from_bytes(key[-8:], "big")
+
+    @staticmethod
+    def _encode_tip(height: int, block_hash: bytes) -> bytes:
+        """
+        Encodes the chain tip as the value of the metadata key.
+
+        :param height: The height of the latest block
+        :type height: int
+        :param block_hash: The hash of the latest block
+        :type block_hash: bytes
+        :return: The encoded tip
+        :rtype: bytes
+        """
+        return height.to_bytes(8, "big") + block_hash
+
+
+def index_entries(
+    height: int,
+    block_bytes: bytes,
+    block_hash: bytes,
+    indexes: list[SecondaryIndex] = DEFAULT_INDEXES,
+) -> list[tuple[bytes, bytes]]:
+    """
+    Derives the index entries of a block from all of its records.
+    The entries depend only on the block, so they can be rebuilt from the raw blocks at any time.
+
+    :param height: The height of the block
+    :type height: int
+    :param block_bytes: The block data in bytes
+    :type block_bytes: bytes
+    :param block_hash: The hash of the block
+    :type block_hash: bytes
+    :param indexes: The secondary indexes to derive entries for
+    :type indexes: list[SecondaryIndex]
+    :return: The (key, value) tuples of the index entries
+    :rtype: list[tuple[bytes, bytes]]
+    """
+    height_bytes = height.to_bytes(8, "big")
+    entries = [(HASH_INDEX_PREFIX + block_hash, height_bytes)]
+
+    for payload, _ in Block.from_bytes(block_bytes).records():
+        record = decode_record(payload)
+
+        if record is None:
+            continue
+
+        merkle_root = record.get("merkle_root")
+        address = record.get("address")
+
+        if isinstance(merkle_root, str) and isinstance(address, str):
+            entries.append(
+                (
+                    MERKLE_ROOT_INDEX_PREFIX + merkle_root.encode() + height_bytes,
+                    address.encode(),
+                )
+            )
+
+        for index in indexes:
+            key = index.extract(record)
+
+            if key is not None:
+                entries.append((index.entry_key(key, height), b""))
+
+    return entries
+
+
+def iter_blocks(
+    db: DB, start: int = 0, stop: int | None = None
+) -> Iterator[tuple[int, bytes]]:
+    """
+    Streams the blocks of a database in height order by scanning the header and the body keyspace side by side.
+
+    :param db: The opened LevelDB database
+    :type db: DB
+    :param start: The height of the first block
+    :type start: int
+    :param stop: The height after the last block or None to scan up to the tip
+    :type stop: int | None
+    :return: An iterator of (height, block) tuples
+    :rtype: Iterator[tuple[int, bytes]]
+    """
+    headers = _iter_keyspace(db, HEADER_PREFIX, start, stop)
+    bodies = _iter_keyspace(db, BODY_PREFIX, start, stop)
+
+    for (height, header), (_, body) in zip(headers, bodies):
+        yield height, header + body
+
+
+def _iter_keyspace(
+    db: DB, prefix: bytes, start: int, stop: int | None
+) -> Iterator[tuple[int, bytes]]:
+    """
+    Streams the values of a height keyspace in height order. The scan bypasses the block cache.
+
+    :param db: The opened LevelDB database
+    :type db: DB
+    :param prefix: The prefix of the keyspace
+    :type prefix: bytes
+    :param start: The first height
+    :type start: int
+    :param stop: The height after the last one or None to scan to the end of the keyspace
+    :type stop: int | None
+    :return: An iterator of (height, value) tuples
+    :rtype: Iterator[tuple[int, bytes]]
+    """
+    with db.iterator(
+        start=Blockchain._height_key(prefix, start),
+        stop=(
+            Blockchain._height_key(prefix, stop)
+            if stop is not None
+            else _prefix_upper_bound(prefix)
+        ),
+        fill_cache=False,
+    ) as it:
+        for key, value in it:
+            yield Blockchain._decode_height(key), value
+
+
+def _prefix_upper_bound(prefix: bytes) -> bytes:
+    """
+    Gets the first key after all keys with the given prefix.
+
+    :param prefix: The prefix of a keyspace
+    :type prefix: bytes
+    :return: The exclusive upper bound of the keyspace
+    :rtype: bytes
+    """
+    return prefix[:-1] + bytes([prefix[-1] + 1])
+
+
+def read_schema_version(db: DB) -> int | None:
+    """
+    Reads the key schema version of a database.
+    Databases without a schema key are either empty or use the legacy schema 1 with little-endian height keys.
+
+    :param db: The opened LevelDB database
+    :type db: DB
+    :return: The schema version or None for an empty database
+    :rtype: int | None
+    """
+    version = db.get(SCHEMA_KEY)
+
+    if version is not None:
+        return int.from_bytes(version, "big")
+
+    with db.iterator(include_value=False) as it:
+        return 1 if next(it, None) is not None else None
+
+
+def migrate(path: Path, batch_size: int = 10000) -> int:
+    """
+    Migrates a database in place to the current key schema.
+    The migration can be run again after an interruption, because migrated keys are never mistaken for legacy keys.
+
+    :param path: Path to the LevelDB database
+    :type path: Path
+    :param batch_size: Number of blocks moved per write batch
+    :type batch_size: int
+    :return: The number of migrated blocks
+    :rtype: int
+    """
+    db = DB(str(path), create_if_missing=False)
+
+    try:
+        migrated = 0
+
+        if read_schema_version(db) == 1:
+            migrated = _migrate_v1_to_v2(db, batch_size)
+
+        if read_schema_version(db) == 2:
+            migrated = max(migrated, _migrate_v2_to_v3(db, batch_size))
+
+        # Schema 4 only changes derived keys, so no block is migrated.
+        if read_schema_version(db) == 3:
+            _migrate_v3_to_v4(db, batch_size)
+
+        return migrated
+    finally:
+        db.close()
+
+
+def _migrate_v1_to_v2(db: DB, batch_size: int) -> int:
+    """
+    Moves the little-endian height keys of schema 1 into the big-endian block keyspace of schema 2,
+    indexes the blocks and rewrites the tip from the highest block.
+
+    :param db: The opened LevelDB database
+    :type db: DB
+    :param batch_size: Number of blocks moved per write batch
+    :type batch_size: int
+    :return: The number of migrated blocks
+    :rtype: int
+    """
+    # Legacy keys are plain 8 byte heights, so every other key belongs to the metadata or the new schema.
+    with db.iterator(include_value=False) as it:
+        heights = sorted(int.from_bytes(key, "little") for key in it if len(key) == 8)
+
+    for i in range(0, len(heights), batch_size):
+        with db.write_batch(transaction=True) as batch:
+            for height in heights[i : i + batch_size]:
+                legacy_key = height.to_bytes(8, "little")
+                block_bytes = db.get(legacy_key)
+                batch.put(Blockchain._height_key(BODY_PREFIX, height), block_bytes)
+
+                for key, value in index_entries(
+                    height, block_bytes, Block.calculate_hash(block_bytes)
+                ):
+                    batch.put(key, value)
+
+                batch.delete(legacy_key)
+
+    with db.write_batch(transaction=True, sync=True) as batch:
+        with db.iterator(prefix=BODY_PREFIX, reverse=True) as it:
+            last = next(it, None)
+
+        if last is None:
+            batch.delete(TIP_KEY)
+        else:
+            key, block_bytes = last
+            batch.put(
+                TIP_KEY,
+                Blockchain._encode_tip(
+                    Blockchain._decode_height(key), Block.calculate_hash(block_bytes)
+                ),
+            )
+
+        batch.put(SCHEMA_KEY, (2).to_bytes(2, "big"))
+
+    return len(heights)
+
+
+def _migrate_v2_to_v3(db: DB, batch_size: int) -> int:
+    """
+    Splits the blocks of schema 2 into a header and a body keyspace.
+    Blocks are split in height order with one transaction per batch, so an interrupted migration continues after the last header.
+
+    :param db: The opened LevelDB database
+    :type db: DB
+    :param batch_size: Number of blocks split per write batch
+    :type batch_size: int
+    :return: The number of migrated blocks
+    :rtype: int
+    """
+    with db.iterator(prefix=HEADER_PREFIX, reverse=True, include_value=False) as it:
+        last_header = next(it, None)
+
+    start = 0 if last_header is None else Blockchain._decode_height(last_header) + 1
+    migrated = 0
+    batch = db.write_batch(transaction=True)
+
+    for height, block_bytes in _iter_keyspace(db, BODY_PREFIX, start, None):
+        parsed = Block.from_bytes(block_bytes)
+        batch.put(Blockchain._height_key(HEADER_PREFIX, height), bytes(parsed.header))
+        batch.put(Blockchain._height_key(BODY_PREFIX, height), bytes(parsed.body))
+        migrated += 1
+
+        if migrated % batch_size == 0:
+            batch.write()
+            batch = db.write_batch(transaction=True)
+
+    batch.write()
+    db.put(SCHEMA_KEY, (3).to_bytes(2, "big"), sync=True)
+    return migrated
+
+
+def _migrate_v3_to_v4(db: DB, batch_size: int) -> int:
+    """
+    Rebuilds the secondary indexes of schema 3 with escaped and terminated index keys.
+    The old entries are dropped first, so an interrupted migration simply starts over.
+
+    :param db: The opened LevelDB database
+    :type db: DB
+    :param batch_size: Number of blocks indexed per write batch
+    :type batch_size: int
+    :return: The number of indexed blocks
+    :rtype: int
+    """
+    with db.iterator(prefix=INDEX_PREFIX, include_value=False) as it:
+        with db.write_batch() as batch:
+            for key in it:
+                batch.delete(key)
+
+    indexed = 0
+    batch = db.write_batch(transaction=True)
+
+    for height, block_bytes in iter_blocks(db):
+        for key, value in index_entries(
+            height, block_bytes, Block.calculate_hash(block_bytes)
+        ):
+            if key.startswith(INDEX_PREFIX):
+                batch.put(key, value)
+
+        indexed += 1
+
+        if indexed % batch_size == 0:
+            batch.write()
+            batch = db.write_batch(transaction=True)
+
+    batch.write()
+    db.put(SCHEMA_KEY, (4).to_bytes(2, "big"), sync=True)
+    return indexed
@@ -0,0 +1,84 @@
+import math
+
+from hashlib import sha256
+
+
+class BloomFilter:
+    capacity: int  # Number of items the filter is sized for
+    error_rate: float  # False positive rate at full capacity
+    size: int  # Number of bits
+    hash_count: int  # Number of bit positions per item
+    count: int  # Number of added items
+
+    def __init__(self, capacity: int, error_rate: float = 0.01):
+        """
+        Initializes an empty Bloom filter sized for the given capacity and false positive rate.
+        A Bloom filter never reports a false negative, so a miss proves that an item was never added.
+
+        :param self: Instance of BloomFilter
+        :param capacity: Number of items the filter is sized for
+        :type capacity: int
+        :param error_rate: False positive rate at full capacity
+        :type error_rate: float
+        """
+        self.capacity = max(1, capacity)
+        self.error_rate = error_rate
+        self.size = max(
+            8, int(-self.capacity * math.log(error_rate) / math.log(2) ** 2)
+        )
+        self.hash_count = max(1, round(self.size / self.capacity * math.log(2)))
+        self.count = 0
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def add(self, item: bytes):
+        """
+        Adds an item to the filter.
+
+        :param self: Instance of BloomFilter
+        :param item: The item to add
+        :type item: bytes
+        """
+        for position in self._positions(item):
+            self._bits[position >> 3] |= 1 << (position & 7)
+
+        self.count += 1
+
+    def is_full(self) -> bool:
+        """
+        Checks whether the filter holds more items than it is sized for and should be rebuilt with a larger capacity.
+
+        :param self: Instance of BloomFilter
+        :return: True if the false positive rate exceeds the configured rate
+        :rtype: bool
+        """
+        return self.count > self.capacity
+
+    def __contains__(self, item: bytes) -> bool:
+        """
+        Checks whether the item might have been added to the filter.
+
+        :param self: Instance of BloomFilter
+        :param item: The item to check
+        :type item: bytes
+        :return: False if the item was never added, True if it probably was
+        :rtype: bool
+        """
+        return all(
+            self._bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(item)
+        )
+
+    def _positions(self, item: bytes) -> list[int]:
+        """
+        Derives the bit positions of an item by double hashing one SHA-256 digest.
+
+        :param self: Instance of BloomFilter
+        :param item: The item to hash
+        :type item: bytes
+        :return: The bit positions of the item
+        :rtype: list[int]
+        """
+        digest = sha256(item).digest()
+        h1 = int.from_bytes(digest[:8], "big")
+        h2 = int.from_bytes(digest[8:16], "big") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hash_count)]
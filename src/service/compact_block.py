@@ -0,0 +1,117 @@
+from block import MultiRecordBlock, ParsedBlock
+from merkle import record_leaf
+from typing import Iterable
+
+# Number of leading bytes of a record leaf that identify the record in a compact block.
+# A collision only makes the rebuilt block fail its records root, and the records are then requested in full.
+SHORT_ID_SIZE = 6
+
+
+def short_id(leaf: bytes) -> bytes:
+    """
+    Shortens the Merkle leaf of a record to its ID in compact blocks.
+
+    :param leaf: The leaf hash of the record
+    :type leaf: bytes
+    :return: The short ID
+    :rtype: bytes
+    """
+    return leaf[:SHORT_ID_SIZE]
+
+
+def compact(block: bytes | memoryview) -> tuple[bytes, list[bytes]]:
+    """
+    Splits a built version 2 block into its header and the short IDs of its records.
+
+    :param block: The built block
+    :type block: bytes | memoryview
+    :return: The packed header and the short IDs in block order
+    :rtype: tuple[bytes, list[bytes]]
+    """
+    parsed = ParsedBlock(block)
+    return bytes(parsed.header), [
+        short_id(record_leaf(payload, signature))
+        for payload, signature in parsed.records()
+    ]
+
+
+class PartialBlock:
+    """
+    A compact block that is being rebuilt. Records are usually gossiped before they land in a block,
+    so most of them are taken from the mempool and only the missing ones are requested from the sender.
+    """
+
+    header: bytes
+    short_ids: list[bytes]
+    # The records in block order, None for the missing ones
+    records: list[tuple[bytes, bytes] | None]
+
+    def __init__(self, header: bytes, short_ids: list[bytes]):
+        """
+        Initializes a PartialBlock without any records.
+
+        :param self: Instance of PartialBlock
+        :param header: The packed version 2 header
+        :type header: bytes
+        :param short_ids: The short IDs of the records in block order
+        :type short_ids: list[bytes]
+        """
+        self.header = header
+        self.short_ids = short_ids
+        self.records = [None] * len(short_ids)
+
+    def fill_from(self, records: Iterable[tuple[bytes, tuple[bytes, bytes]]]):
+        """
+        Takes the records with a matching short ID, usually the ones of the mempool.
+
+        :param self: Instance of PartialBlock
+        :param records: The available records as (leaf, (payload, signature)) tuples
+        :type records: Iterable[tuple[bytes, tuple[bytes, bytes]]]
+        """
+        available = {short_id(leaf): record for leaf, record in records}
+
+        for index, record_id in enumerate(self.short_ids):
+            if self.records[index] is None:
+                self.records[index] = available.get(record_id)
+
+    def fill(self, indexes: list[int], records: list[tuple[bytes, bytes]]):
+        """
+        Takes the records that were requested from the sender.
+
+        :param self: Instance of PartialBlock
+        :param indexes: The positions of the records in the block
+        :type indexes: list[int]
+        :param records: The (payload, signature) tuples at these positions
+        :type records: list[tuple[bytes, bytes]]
+        """
+        for index, record in zip(indexes, records):
+            if 0 <= index < len(self.records):
+                self.records[index] = record
+
+    def missing(self) -> list[int]:
+        """
+        Returns the positions of the records that are still missing.
+
+        :param self: Instance of PartialBlock
+        :return: The missing positions
+        :rtype: list[int]
+        """
+        return [index for index, record in enumerate(self.records) if record is None]
+
+    def build(self) -> bytes | None:
+        """
+        Builds the full block once all records are present and match the records root of the header.
+
+        :param self: Instance of PartialBlock
+        :return: The built block, or None if records are missing or a short ID matched a wrong record
+        :rtype: bytes | None
+        """
+        if self.missing():
+            return None
+
+        block = MultiRecordBlock.assemble(self.header, self.records)
+
+        try:
+            return block if ParsedBlock(block).has_valid_records_root() else None
+        except ValueError:
+            return None
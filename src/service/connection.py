@@ -0,0 +1,335 @@
+import asyncio
+import json
+import msgpack
+import struct
+
+from asyncio import Future, StreamReader, StreamWriter, Task
+from typing import Awaitable, Callable
+
+# Version of the binary wire protocol. Version 1 are JSON lines with hex encoded bytes.
+WIRE_VERSION = 2
+
+# A binary frame starts with the big-endian length of its msgpack body. The limit keeps the first byte zero,
+# so it never collides with the "{" of a JSON line and both framings can be told apart per message.
+FRAME_HEADER_FORMAT = ">I"
+FRAME_HEADER_SIZE = struct.calcsize(FRAME_HEADER_FORMAT)
+MAX_FRAME_SIZE = 2**24 - 1
+
+# Message fields holding bytes or lists of bytes. JSON lines carry them as hex strings, binary frames as raw bin fields.
+BYTES_FIELDS = {
+    "record",
+    "signature",
+    "headers",
+    "proof",
+    "block",
+    "blocks",
+    "block_hashes",
+    "record_ids",
+    "header",
+    "short_ids",
+    "block_hash",
+    "payloads",
+    "signatures",
+}
+
+# Types of the responses of old nodes, which carry no "reply_to". Any other message without it is a new message.
+LEGACY_RESPONSE_TYPES = {
+    "peer_list",
+    "add_deployment_record_response",
+    "headers",
+    "record_proof",
+}
+
+
+class Connection:
+    """
+    A long-lived connection to a peer or client that carries many messages in both directions.
+    Every request gets an "id", and its response echoes it in "reply_to", so many requests can be in flight
+    at once and their responses may arrive in any order.
+    """
+
+    reader: StreamReader
+    writer: StreamWriter
+    handler: Callable[[dict, "Connection"], Awaitable[None]] | None
+    wire: int  # Wire protocol version used to send messages
+    _next_id: int
+    _waiting: dict[int, Future]  # Requests waiting for their response by request ID
+    _tasks: set[Task]  # Running handlers of incoming requests
+    _serve_task: Task | None
+
+    def __init__(
+        self,
+        reader: StreamReader,
+        writer: StreamWriter,
+        handler: Callable[[dict, "Connection"], Awaitable[None]] | None = None,
+    ):
+        """
+        Initializes the Connection with an opened stream.
+
+        :param self: Instance of Connection
+        :param reader: StreamReader object to read data from the remote side
+        :type reader: StreamReader
+        :param writer: StreamWriter object to send data to the remote side
+        :type writer: StreamWriter
+        :param handler: Called with every incoming message that is not a response, or None to ignore them
+        :type handler: Callable[[dict, Connection], Awaitable[None]] | None
+        """
+        self.reader = reader
+        self.writer = writer
+        self.handler = handler
+        self.wire = 1
+        self._next_id = 0
+        self._waiting = {}
+        self._tasks = set()
+        self._serve_task = None
+
+    @classmethod
+    async def open(
+        cls,
+        address: str,
+        handler: Callable[[dict, "Connection"], Awaitable[None]] | None = None,
+    ) -> "Connection":
+        """
+        Opens a connection to the given address and starts reading its messages in the background.
+
+        :param address: The address of the remote side as host:port
+        :type address: str
+        :param handler: Called with every incoming message that is not a response, or None to ignore them
+        :type handler: Callable[[dict, Connection], Awaitable[None]] | None
+        :return: The opened connection
+        :rtype: Connection
+        """
+        host, port = address.split(":")
+        reader, writer = await asyncio.open_connection(host, int(port))
+        connection = cls(reader, writer, handler)
+        connection._serve_task = asyncio.create_task(connection.serve())
+        return connection
+
+    async def serve(self):
+        """
+        Reads messages until the remote side closes the connection. Responses complete their waiting requests,
+        and every other message is handled in its own task, so a slow request does not block the ones behind it.
+
+        :param self: Instance of Connection
+        """
+        try:
+            while (msg := await read_message(self.reader)) is not None:
+                self._dispatch(msg)
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            self.writer.close()
+
+            for future in self._waiting.values():
+                if not future.done():
+                    future.set_exception(ConnectionError("The connection was closed."))
+
+            self._waiting.clear()
+
+    async def request(self, msg: dict) -> dict:
+        """
+        Sends a request and waits for its response. A request with a "wire" field negotiates the wire protocol,
+        and the connection switches to binary frames once the remote side confirms the version.
+
+        :param self: Instance of Connection
+        :param msg: The request to send
+        :type msg: dict
+        :return: The response of the remote side
+        :rtype: dict
+        """
+        if self.is_closed():
+            raise ConnectionError("The connection is closed.")
+
+        self._next_id += 1
+        request_id = self._next_id
+        future = asyncio.get_running_loop().create_future()
+        self._waiting[request_id] = future
+
+        try:
+            await self.send({**msg, "id": request_id})
+            response = await future
+
+            if "wire" in msg:
+                self.wire = min(response.get("wire", 1), WIRE_VERSION)
+
+            return response
+        finally:
+            self._waiting.pop(request_id, None)
+
+    async def reply(self, request: dict, msg: dict):
+        """
+        Sends the response to a request. Requests of old nodes and clients carry no ID, so their response has none either.
+        If the request offers a wire protocol version, the response confirms the highest common version
+        in the current framing and the connection sends binary frames from then on.
+
+        :param self: Instance of Connection
+        :param request: The request to respond to
+        :type request: dict
+        :param msg: The response to send
+        :type msg: dict
+        """
+        if "id" in request:
+            msg = {**msg, "reply_to": request["id"]}
+
+        if "wire" in request:
+            wire = min(request["wire"], WIRE_VERSION)
+            await self.send({**msg, "wire": wire})
+            self.wire = wire
+            return
+
+        await self.send(msg)
+
+    async def send(self, msg: dict):
+        """
+        Sends a message in the framing of the negotiated wire protocol.
+
+        :param self: Instance of Connection
+        :param msg: The message to send
+        :type msg: dict
+        """
+        self.writer.write(encode_message(msg, self.wire))
+        await self.writer.drain()
+
+    def is_closed(self) -> bool:
+        """
+        Returns whether the connection is closed or closing.
+
+        :param self: Instance of Connection
+        :return: True if no more messages can be sent
+        :rtype: bool
+        """
+        return self.writer.is_closing()
+
+    async def close(self):
+        """
+        Closes the connection and waits for the background reader to stop.
+
+        :param self: Instance of Connection
+        """
+        self.writer.close()
+
+        if self._serve_task is not None:
+            await asyncio.gather(self._serve_task, return_exceptions=True)
+
+    def _dispatch(self, msg: dict):
+        """
+        Completes the waiting request of a response or starts the handler of any other message.
+        Values that are not messages and messages without a type are ignored, so they cannot end the connection.
+
+        :param self: Instance of Connection
+        :param msg: The received message
+        :type msg: dict
+        """
+        if not isinstance(msg, dict):
+            return
+
+        if "reply_to" in msg:
+            future = self._waiting.get(msg["reply_to"])
+        elif msg.get("type") in LEGACY_RESPONSE_TYPES and self._waiting:
+            # Old nodes answer one request per connection without an ID, so the message responds to the oldest request.
+            future = next(iter(self._waiting.values()))
+        else:
+            future = None
+
+            if self.handler is not None and "type" in msg:
+                task = asyncio.create_task(self.handler(msg, self))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+
+        if future is not None and not future.done():
+            future.set_result(msg)
+
+
+def encode_message(msg: dict, wire: int) -> bytes:
+    """
+    Encodes a message with the framing of the given wire protocol version.
+
+    :param msg: The message to encode
+    :type msg: dict
+    :param wire: The wire protocol version of the connection
+    :type wire: int
+    :return: The framed message
+    :rtype: bytes
+    """
+    if wire >= WIRE_VERSION:
+        body = msgpack.packb(msg, use_bin_type=True)
+
+        if len(body) > MAX_FRAME_SIZE:
+            raise ValueError(
+                f"The message exceeds the maximum frame size of {MAX_FRAME_SIZE} bytes."
+            )
+
+        return struct.pack(FRAME_HEADER_FORMAT, len(body)) + body
+
+    msg = {
+        key: _to_hex(value) if key in BYTES_FIELDS else value
+        for key, value in msg.items()
+    }
+
+    return (
+        json.dumps(msg)
+        + "\n"  # Note: the newline is important to signal the end of the message for readline()
+    ).encode()
+
+
+async def read_message(reader: StreamReader) -> dict | None:
+    """
+    Reads the next message in either framing. JSON lines start with "{" and binary frames with a zero byte.
+
+    :param reader: StreamReader object to read data from the remote side
+    :type reader: StreamReader
+    :return: The message or None if the remote side closed the connection
+    :rtype: dict | None
+    """
+    first = await reader.read(1)
+
+    if not first:
+        return None
+
+    if first == b"{":
+        msg = json.loads((first + await reader.readline()).decode())
+
+        for key in BYTES_FIELDS & msg.keys():
+            msg[key] = _from_hex(msg[key])
+
+        return msg
+
+    (length,) = struct.unpack(
+        FRAME_HEADER_FORMAT,
+        first + await reader.readexactly(FRAME_HEADER_SIZE - 1),
+    )
+
+    if length > MAX_FRAME_SIZE:
+        raise ValueError("The message is neither a JSON line nor a binary frame.")
+
+    return msgpack.unpackb(await reader.readexactly(length), raw=False)
+
+
+def _to_hex(value: bytes | list[bytes]) -> str | list[str]:
+    """
+    Encodes bytes or a list of bytes as hex for JSON lines.
+
+    :param value: The bytes or list of bytes
+    :type value: bytes | list[bytes]
+    :return: The hex string or list of hex strings
+    :rtype: str | list[str]
+    """
+    if isinstance(value, list):
+        return [item.hex() for item in value]
+
+    return value.hex()
+
+
+def _from_hex(value: str | list[str]) -> bytes | list[bytes]:
+    """
+    Decodes a hex string or a list of hex strings of a JSON line.
+
+    :param value: The hex string or list of hex strings
+    :type value: str | list[str]
+    :return: The bytes or list of bytes
+    :rtype: bytes | list[bytes]
+    """
+    if isinstance(value, list):
+        return [bytes.fromhex(item) for item in value]
+
+    return bytes.fromhex(value)
@@ -0,0 +1,125 @@
+import random
+
+from collections import OrderedDict
+
+
+class SeenCache:
+    """
+    A bounded set of recently seen item IDs. When the cache is full, the least recently seen ID is forgotten.
+    """
+
+    capacity: int
+    _ids: OrderedDict[bytes, None]
+
+    def __init__(self, capacity: int):
+        """
+        Initializes an empty SeenCache.
+
+        :param self: Instance of SeenCache
+        :param capacity: Maximum number of remembered IDs
+        :type capacity: int
+        """
+        self.capacity = capacity
+        self._ids = OrderedDict()
+
+    def add(self, item_id: bytes) -> bool:
+        """
+        Remembers an ID as the most recently seen one.
+
+        :param self: Instance of SeenCache
+        :param item_id: The ID of the item
+        :type item_id: bytes
+        :return: True if the ID was not seen before
+        :rtype: bool
+        """
+        if item_id in self._ids:
+            self._ids.move_to_end(item_id)
+            return False
+
+        self._ids[item_id] = None
+
+        if len(self._ids) > self.capacity:
+            self._ids.popitem(last=False)
+
+        return True
+
+    def __contains__(self, item_id: bytes) -> bool:
+        """
+        Checks whether an ID was seen recently.
+
+        :param self: Instance of SeenCache
+        :param item_id: The ID of the item
+        :type item_id: bytes
+        :return: True if the ID is remembered
+        :rtype: bool
+        """
+        return item_id in self._ids
+
+    def discard(self, item_id: bytes):
+        """
+        Forgets an ID if it is remembered.
+
+        :param self: Instance of SeenCache
+        :param item_id: The ID of the item
+        :type item_id: bytes
+        """
+        self._ids.pop(item_id, None)
+
+    def __len__(self) -> int:
+        """
+        Returns the number of remembered IDs.
+
+        :param self: Instance of SeenCache
+        :return: The number of IDs
+        :rtype: int
+        """
+        return len(self._ids)
+
+
+class Gossip:
+    """
+    The state of push-pull epidemic gossip. A node pushes every new item to a few random peers only,
+    and every peer that sees the item for the first time pushes it on, so an item reaches all n nodes
+    in O(log n) rounds while each node sends it at most fanout times. Nodes that missed a push
+    catch up by pulling from a random peer periodically.
+    """
+
+    fanout: int
+    seen: SeenCache  # IDs of the records and blocks that were already received
+
+    def __init__(self, fanout: int = 4, seen_capacity: int = 100000):
+        """
+        Initializes the Gossip state.
+
+        :param self: Instance of Gossip
+        :param fanout: Number of random peers an item is pushed to
+        :type fanout: int
+        :param seen_capacity: Number of remembered item IDs
+        :type seen_capacity: int
+        """
+        self.fanout = fanout
+        self.seen = SeenCache(seen_capacity)
+
+    def accept(self, item_id: bytes) -> bool:
+        """
+        Marks an item as seen.
+
+        :param self: Instance of Gossip
+        :param item_id: The ID of the item
+        :type item_id: bytes
+        :return: True if the item is new and must be processed and pushed on
+        :rtype: bool
+        """
+        return self.seen.add(item_id)
+
+    def select_peers(self, peers: list[str]) -> list[str]:
+        """
+        Selects the random peers an item is pushed to.
+
+        :param self: Instance of Gossip
+        :param peers: The candidate peers
+        :type peers: list[str]
+        :return: At most fanout distinct peers
+        :rtype: list[str]
+        """
+        return random.sample(peers, min(len(peers), self.fanout))
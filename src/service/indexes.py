@@ -0,0 +1,213 @@
+import math
+import msgpack
+
+from typing import Any, Callable
+
+INDEX_PREFIX = b"i"  # Keyspace of all secondary indexes
+SEPARATOR = b"\x00"  # Separates the index name and the parts of composite keys
+# Index keys have different lengths, so they are terminated before the height. Zero bytes inside a key are escaped,
+# so the terminator never occurs inside a key and the escaped keys keep the byte order of the keys.
+TERMINATOR = b"\x00"
+ESCAPED_ZERO = b"\x00\xff"
+
+
+class SecondaryIndex:
+    name: str
+    extract: Callable[[dict[str, Any]], bytes | None]
+
+    def __init__(self, name: str, extract: Callable[[dict[str, Any]], bytes | None]):
+        """
+        Declares a secondary index over decoded deployment records.
+        The index is stored as a sorted keyspace of escaped index key + terminator + height,
+        so exact, prefix and range queries are sequential scans.
+
+        :param self: Instance of SecondaryIndex
+        :param name: Unique name of the index
+        :type name: str
+        :param extract: Extracts the index key from a decoded record or returns None if the record is not indexed.
+            Must be a module level function, so the index can be rebuilt in a process pool.
+        :type extract: Callable[[dict[str, Any]], bytes | None]
+        """
+        self.name = name
+        self.extract = extract
+
+    def keyspace(self) -> bytes:
+        """
+        Gets the prefix of all database keys of the index.
+
+        :param self: Instance of SecondaryIndex
+        :return: The prefix of the keyspace
+        :rtype: bytes
+        """
+        return INDEX_PREFIX + self.name.encode() + SEPARATOR
+
+    def entry_key(self, key: bytes, height: int) -> bytes:
+        """
+        Builds the database key of an index entry.
+
+        :param self: Instance of SecondaryIndex
+        :param key: The index key extracted from the record
+        :type key: bytes
+        :param height: The height of the block holding the record
+        :type height: int
+        :return: The database key of the entry
+        :rtype: bytes
+        """
+        return self.keyspace() + encode_key(key) + height.to_bytes(8, "big")
+
+
+def escape_key(key: bytes) -> bytes:
+    """
+    Escapes the zero bytes of an index key or key prefix. The escaping keeps the byte order of the keys.
+
+    :param key: The index key or key prefix
+    :type key: bytes
+    :return: The escaped key
+    :rtype: bytes
+    """
+    return key.replace(b"\x00", ESCAPED_ZERO)
+
+
+def encode_key(key: bytes) -> bytes:
+    """
+    Encodes an index key as it is stored before the height. No encoded key is a prefix of another one,
+    so a scan over an encoded key matches that key exactly.
+
+    :param key: The index key
+    :type key: bytes
+    :return: The escaped and terminated key
+    :rtype: bytes
+    """
+    return escape_key(key) + TERMINATOR
+
+
+def decode_record(payload: bytes | memoryview) -> dict[str, Any] | None:
+    """
+    Decodes the msgpack payload of a deployment record as packed by DeploymentRecord.serialize of the CLI.
+
+    :param payload: The payload of a block
+    :type payload: bytes | memoryview
+    :return: The decoded record or None if the payload is not a deployment record
+    :rtype: dict[str, Any] | None
+    """
+    try:
+        record = msgpack.unpackb(payload, raw=False)
+    except ValueError:
+        return None
+
+    return record if isinstance(record, dict) else None
+
+
+def encode_timestamp(timestamp: float) -> bytes:
+    """
+    Encodes a UNIX timestamp as a sortable index key with microsecond precision.
+
+    :param timestamp: The UNIX timestamp
+    :type timestamp: float
+    :return: The index key
+    :rtype: bytes
+    """
+    return int(timestamp * 1_000_000).to_bytes(8, "big")
+
+
+def software_key(software_name: str, version: str | None = None) -> bytes:
+    """
+    Builds the key of the software index. Without a version it is the prefix of all versions of the software.
+
+    :param software_name: The name of the software
+    :type software_name: str
+    :param version: The version of the software
+    :type version: str | None
+    :return: The index key or key prefix
+    :rtype: bytes
+    """
+    key = software_name.encode() + SEPARATOR
+    return key if version is None else key + version.encode()
+
+
+def _metadata(record: dict[str, Any]) -> dict[str, Any]:
+    """
+    Gets the metadata of a record.
+
+    :param record: The decoded record
+    :type record: dict[str, Any]
+    :return: The metadata or an empty dictionary
+    :rtype: dict[str, Any]
+    """
+    metadata = record.get("metadata")
+    return metadata if isinstance(metadata, dict) else {}
+
+
+def extract_address(record: dict[str, Any]) -> bytes | None:
+    """
+    Extracts the signer address of a record.
+
+    :param record: The decoded record
+    :type record: dict[str, Any]
+    :return: The address or None
+    :rtype: bytes | None
+    """
+    address = record.get("address")
+    return address.encode() if isinstance(address, str) else None
+
+
+def extract_software(record: dict[str, Any]) -> bytes | None:
+    """
+    Extracts the software name and version of a record.
+
+    :param record: The decoded record
+    :type record: dict[str, Any]
+    :return: The software key or None
+    :rtype: bytes | None
+    """
+    metadata = _metadata(record)
+    software_name = metadata.get("software_name")
+    version = metadata.get("version")
+
+    if not isinstance(software_name, str) or not isinstance(version, str):
+        return None
+
+    return software_key(software_name, version)
+
+
+def extract_commit_hash(record: dict[str, Any]) -> bytes | None:
+    """
+    Extracts the commit hash of a record.
+
+    :param record: The decoded record
+    :type record: dict[str, Any]
+    :return: The commit hash or None
+    :rtype: bytes | None
+    """
+    commit_hash = _metadata(record).get("commit_hash")
+    return commit_hash.encode() if isinstance(commit_hash, str) else None
+
+
+def extract_timestamp(record: dict[str, Any]) -> bytes | None:
+    """
+    Extracts the deployment timestamp of a record. Signers choose the timestamp, so timestamps before the epoch,
+    infinite ones and ones beyond the range of the 8-byte key are not indexed.
+
+    :param record: The decoded record
+    :type record: dict[str, Any]
+    :return: The encoded timestamp or None
+    :rtype: bytes | None
+    """
+    timestamp = _metadata(record).get("timestamp")
+
+    if (
+        not isinstance(timestamp, (int, float))
+        or not math.isfinite(timestamp)
+        or not 0 <= timestamp * 1_000_000 < 2**64
+    ):
+        return None
+
+    return encode_timestamp(timestamp)
+
+
+DEFAULT_INDEXES = [
+    SecondaryIndex("address", extract_address),
+    SecondaryIndex("software", extract_software),
+    SecondaryIndex("commit_hash", extract_commit_hash),
+    SecondaryIndex("timestamp", extract_timestamp),
+]
@@ -5,36 +5,55 @@ import argparse
 from peer_node import PeerNode
 
 # TODO: Tests
-peer = None
-
-try:
-    parser = argparse.ArgumentParser()
-
-    parser.add_argument(
-        "--host", help="Host address of the peer node", default="127.0.0.1"
-    )
-
-    parser.add_argument(
-        "--port", type=int, help="Port number of the peer node", default=5000
-    )
-
-    parser.add_argument("--bootstrap", help="Bootstrap peer in the format host:port")
-
-    args = parser.parse_args()
-
-    if args.bootstrap:
-        peer = PeerNode(args.host, args.port, args.bootstrap)
-        # TODO: Should connect and exchange peer lists now and then, not just at startup.
-        asyncio.run(peer.connect_to_peer(args.bootstrap))
-    else:
-        peer = PeerNode(args.host, args.port)
-
-    asyncio.run(peer.start())
-except KeyboardInterrupt:
-    print("Shutting down...")
-except:
-    traceback.print_exc()
-finally:
-    if peer is not None:
-        peer.close()
-    exit(0)
+# The guard keeps the worker processes of the signature verification from starting a node
+# when they import this module, which they do on platforms that spawn instead of fork.
+if __name__ == "__main__":
+    peer = None
+
+    try:
+        parser = argparse.ArgumentParser()
+
+        parser.add_argument(
+            "--host", help="Host address of the peer node", default="127.0.0.1"
+        )
+
+        parser.add_argument(
+            "--port", type=int, help="Port number of the peer node", default=5000
+        )
+
+        parser.add_argument(
+            "--bootstrap", help="Bootstrap peer in the format host:port"
+        )
+
+        parser.add_argument(
+            "--no-sync",
+            action="store_true",
+            help="Answer clients before their blocks are synced to disk",
+        )
+
+        parser.add_argument(
+            "--group-commit-window",
+            type=float,
+            help="Seconds to collect blocks that share one write and one sync",
+            default=PeerNode.GROUP_COMMIT_WINDOW,
+        )
+
+        args = parser.parse_args()
+
+        # The node contacts the bootstrap peer when it starts, so its connection lives on the event loop of the node.
+        peer = PeerNode(
+            args.host,
+            args.port,
+            args.bootstrap,
+            sync=not args.no_sync,
+            group_commit_window=args.group_commit_window,
+        )
+        asyncio.run(peer.start())
+    except KeyboardInterrupt:
+        print("Shutting down...")
+    except:
+        traceback.print_exc()
+    finally:
+        if peer is not None:
+            peer.close()
+        exit(0)
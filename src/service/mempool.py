@@ -0,0 +1,230 @@
+from collections import OrderedDict
+from typing import Callable, Iterable, Iterator
+from merkle import record_leaf
+
+
+class Mempool:
+    """
+    The deployment records waiting for a block, keyed by their Merkle leaf. Inserting, looking up and removing
+    a record are O(1), and the records are iterated and taken in insertion order, so blocks keep the order
+    in which the records arrived. A record that is already waiting is not stored again.
+    The pool is bounded by a number of records and a number of bytes. When a new record exceeds a bound,
+    the oldest records are evicted, because they had the longest chance to be included in a block somewhere.
+    """
+
+    max_count: int
+    max_bytes: int
+    size: int  # Bytes of the payloads and signatures of all waiting records
+    added: int  # Number of records added since the start
+    duplicates: int  # Number of records that were already waiting
+    evicted: int  # Number of records evicted to stay within the bounds
+    rejected: int  # Number of records larger than the whole pool
+    on_evict: (
+        Callable[[bytes], None] | None
+    )  # Called with the leaf of every evicted record
+    _records: OrderedDict[bytes, tuple[bytes, bytes]]  # (payload, signature) by leaf
+
+    def __init__(
+        self,
+        max_count: int = 100000,
+        max_bytes: int = 64 * 2**20,
+        on_evict: Callable[[bytes], None] | None = None,
+    ):
+        """
+        Initializes an empty Mempool.
+
+        :param self: Instance of Mempool
+        :param max_count: Maximum number of waiting records
+        :type max_count: int
+        :param max_bytes: Maximum number of bytes of the payloads and signatures of the waiting records
+        :type max_bytes: int
+        :param on_evict: Called with the leaf of every evicted record, e.g. to notify the client that waits for it
+        :type on_evict: Callable[[bytes], None] | None
+        """
+        self.max_count = max_count
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.added = 0
+        self.duplicates = 0
+        self.evicted = 0
+        self.rejected = 0
+        self.on_evict = on_evict
+        self._records = OrderedDict()
+
+    def add(self, payload: bytes, signature: bytes, leaf: bytes | None = None) -> bool:
+        """
+        Adds a record after the records that are already waiting and evicts the oldest records if a bound is exceeded.
+
+        :param self: Instance of Mempool
+        :param payload: The payload of the record
+        :type payload: bytes
+        :param signature: The signature of the record
+        :type signature: bytes
+        :param leaf: The Merkle leaf of the record if it is already known
+        :type leaf: bytes | None
+        :return: True if the record was added, False if it was already waiting or is larger than the pool
+        :rtype: bool
+        """
+        leaf = record_leaf(payload, signature) if leaf is None else leaf
+
+        if leaf in self._records:
+            self.duplicates += 1
+            return False
+
+        size = len(payload) + len(signature)
+
+        if size > self.max_bytes or self.max_count < 1:
+            self.rejected += 1
+            return False
+
+        while self._records and (
+            len(self._records) >= self.max_count or self.size + size > self.max_bytes
+        ):
+            old_leaf, (old_payload, old_signature) = self._records.popitem(last=False)
+            self.size -= len(old_payload) + len(old_signature)
+            self.evicted += 1
+
+            if self.on_evict is not None:
+                self.on_evict(old_leaf)
+
+        self._records[leaf] = (payload, signature)
+        self.size += size
+        self.added += 1
+        return True
+
+    def get(self, leaf: bytes) -> tuple[bytes, bytes] | None:
+        """
+        Looks up a waiting record by its Merkle leaf.
+
+        :param self: Instance of Mempool
+        :param leaf: The Merkle leaf of the record
+        :type leaf: bytes
+        :return: The (payload, signature) tuple or None if the record is not waiting
+        :rtype: tuple[bytes, bytes] | None
+        """
+        return self._records.get(leaf)
+
+    def remove(self, leaf: bytes) -> tuple[bytes, bytes] | None:
+        """
+        Removes a record, usually because it was included in a block.
+
+        :param self: Instance of Mempool
+        :param leaf: The Merkle leaf of the record
+        :type leaf: bytes
+        :return: The removed (payload, signature) tuple or None if the record was not waiting
+        :rtype: tuple[bytes, bytes] | None
+        """
+        record = self._records.pop(leaf, None)
+
+        if record is not None:
+            self.size -= len(record[0]) + len(record[1])
+
+        return record
+
+    def remove_many(self, leaves: Iterable[bytes]):
+        """
+        Removes all records with the given Merkle leaves that are waiting.
+
+        :param self: Instance of Mempool
+        :param leaves: The Merkle leaves of the records
+        :type leaves: Iterable[bytes]
+        """
+        for leaf in leaves:
+            self.remove(leaf)
+
+    def take(
+        self, count: int | None = None, max_bytes: int | None = None
+    ) -> list[tuple[bytes, bytes]]:
+        """
+        Removes the oldest records to put them into a block. The oldest record is always taken,
+        even if it alone exceeds the byte limit.
+
+        :param self: Instance of Mempool
+        :param count: The maximum number of records or None for all of them
+        :type count: int | None
+        :param max_bytes: The maximum number of bytes of the records or None for no limit
+        :type max_bytes: int | None
+        :return: The (payload, signature) tuples in insertion order
+        :rtype: list[tuple[bytes, bytes]]
+        """
+        count = len(self._records) if count is None else min(count, len(self._records))
+        records = []
+        size = 0
+
+        for leaf, (payload, signature) in self._records.items():
+            if len(records) == count or (
+                records
+                and max_bytes is not None
+                and size + len(payload) + len(signature) > max_bytes
+            ):
+                break
+
+            records.append((leaf, (payload, signature)))
+            size += len(payload) + len(signature)
+
+        for leaf, _ in records:
+            del self._records[leaf]
+
+        self.size -= size
+        return [record for _, record in records]
+
+    def items(self) -> Iterator[tuple[bytes, tuple[bytes, bytes]]]:
+        """
+        Iterates over a snapshot of the waiting records with their Merkle leaves in insertion order.
+
+        :param self: Instance of Mempool
+        :return: An iterator of (leaf, (payload, signature)) tuples
+        :rtype: Iterator[tuple[bytes, tuple[bytes, bytes]]]
+        """
+        return iter(list(self._records.items()))
+
+    def stats(self) -> dict:
+        """
+        Returns the fill level and the counters of the pool for monitoring.
+
+        :param self: Instance of Mempool
+        :return: The statistics by name
+        :rtype: dict
+        """
+        return {
+            "count": len(self._records),
+            "bytes": self.size,
+            "max_count": self.max_count,
+            "max_bytes": self.max_bytes,
+            "added": self.added,
+            "duplicates": self.duplicates,
+            "evicted": self.evicted,
+            "rejected": self.rejected,
+        }
+
+    def __contains__(self, leaf: bytes) -> bool:
+        """
+        Checks whether a record is waiting.
+
+        :param self: Instance of Mempool
+        :param leaf: The Merkle leaf of the record
+        :type leaf: bytes
+        :return: True if the record is in the pool
+        :rtype: bool
+        """
+        return leaf in self._records
+
+    def __len__(self) -> int:
+        """
+        Returns the number of waiting records.
+
+        :param self: Instance of Mempool
+        :return: The number of records
+        :rtype: int
+        """
+        return len(self._records)
+
+    def __iter__(self) -> Iterator[tuple[bytes, bytes]]:
+        """
+        Iterates over a snapshot of the waiting records in insertion order.
+
+        :param self: Instance of Mempool
+        :return: An iterator of (payload, signature) tuples
+        :rtype: Iterator[tuple[bytes, bytes]]
+        """
+        return iter(list(self._records.values()))
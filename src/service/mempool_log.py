@@ -0,0 +1,420 @@
+import asyncio
+import os
+import struct
+import zlib
+
+from pathlib import Path
+from typing import BinaryIO, Iterable, Iterator
+
+# An entry is its CRC32, the length of its body and its type, followed by the body.
+# The CRC32 covers the type and the body, so a torn write at the end of a segment is detected on replay.
+ENTRY_FORMAT = ">IIB"
+ADD_ENTRY = 1  # Body: leaf, payload length, payload and signature of an accepted record
+REMOVE_ENTRY = 2  # Body: leaves of records that were committed to a block or evicted
+LEAF_SIZE = 32
+PAYLOAD_LENGTH_FORMAT = ">I"
+SEGMENT_SUFFIX = ".wal"
+
+
+class MempoolLog:
+    """
+    A write-ahead log of the mempool. Every accepted record is appended to the active segment file
+    before it is acknowledged, and records that leave the mempool are appended as removals.
+    Appends are plain writes that survive a crash of the process. sync() makes them survive a crash
+    of the machine and shares one fsync between all callers that wait at the same time.
+    Once all records of the oldest segment were removed, the segment is deleted, which checkpoints the log.
+    The records of the oldest segment that are still waiting are copied to the active segment
+    if the log grows beyond its maximum number of segments.
+    On startup the segments are replayed sequentially to restore the waiting records.
+    """
+
+    SEGMENT_SIZE = 16 * 2**20
+    MAX_SEGMENTS = 8
+
+    path: Path  # Directory of the segment files
+    # Number of waiting records by segment number in ascending order
+    _segments: dict[int, int]
+    _live: dict[bytes, int]  # Segment number by leaf of the waiting records
+    _file: BinaryIO | None  # Active segment, opened by the first append
+    _active: int  # Number of the active segment
+    _appended: int  # Number of entries appended since the start
+    _synced: int  # Number of appended entries that are on disk
+    _sync_task: asyncio.Future | None  # fsync in progress
+    # Segments closed while an fsync of them may be in progress
+    _retired: list[BinaryIO]
+
+    def __init__(self, path: Path = Path("data") / "mempool"):
+        """
+        Initializes the MempoolLog. The segments in the directory are only read by replay().
+
+        :param self: Instance of MempoolLog
+        :param path: Directory of the segment files
+        :type path: Path
+        """
+        path.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self._segments = {}
+        self._live = {}
+        self._file = None
+        self._active = max(self._segment_numbers(), default=0)
+        self._appended = 0
+        self._synced = 0
+        self._sync_task = None
+        self._retired = []
+
+    def replay(self) -> list[tuple[bytes, bytes, bytes]]:
+        """
+        Reads all segments in order and returns the records that were accepted and never removed.
+        A segment is read up to its first incomplete or corrupt entry. Appends go to a new segment afterwards,
+        so they never follow a torn entry. Must be called before the first append.
+
+        :param self: Instance of MempoolLog
+        :return: The (leaf, payload, signature) tuples of the waiting records in the order they were accepted
+        :rtype: list[tuple[bytes, bytes, bytes]]
+        """
+        records = {}
+
+        for number in self._segment_numbers():
+            self._segments[number] = 0
+
+            for entry_type, body in self._read_segment(number):
+                if entry_type == ADD_ENTRY:
+                    leaf, record = self._decode_add(body)
+                    records.pop(leaf, None)
+                    records[leaf] = record
+                    self._untrack(leaf)
+                    self._track(leaf, number)
+                elif entry_type == REMOVE_ENTRY:
+                    for leaf in self._decode_leaves(body):
+                        records.pop(leaf, None)
+                        self._untrack(leaf)
+
+        self._checkpoint()
+        return [
+            (leaf, payload, signature) for leaf, (payload, signature) in records.items()
+        ]
+
+    def append(self, leaf: bytes, payload: bytes, signature: bytes):
+        """
+        Appends an accepted record. The record is on disk once a following sync() returned.
+
+        :param self: Instance of MempoolLog
+        :param leaf: The Merkle leaf of the record
+        :type leaf: bytes
+        :param payload: The payload of the record
+        :type payload: bytes
+        :param signature: The signature of the record
+        :type signature: bytes
+        """
+        self._add(leaf, payload, signature)
+        self._checkpoint()
+
+    def remove(self, leaves: Iterable[bytes]):
+        """
+        Appends the removal of records that were committed to a block or evicted. Leaves that are not
+        in the log are skipped, so the records of blocks from peers cost nothing if they were never accepted here.
+
+        :param self: Instance of MempoolLog
+        :param leaves: The Merkle leaves of the records
+        :type leaves: Iterable[bytes]
+        """
+        removed = [leaf for leaf in leaves if leaf in self._live]
+
+        if not removed:
+            return
+
+        self._write(REMOVE_ENTRY, b"".join(removed))
+
+        for leaf in removed:
+            self._untrack(leaf)
+
+        self._checkpoint()
+
+    async def sync(self):
+        """
+        Waits until all entries appended so far are on disk. Callers that arrive while an fsync runs
+        wait for the next one, which covers all of their entries at once.
+
+        :param self: Instance of MempoolLog
+        """
+        target = self._appended
+
+        while self._synced < target:
+            if self._sync_task is None:
+                self._sync_task = asyncio.ensure_future(self._fsync())
+
+            await asyncio.shield(self._sync_task)
+
+    def close(self):
+        """
+        Syncs and closes the active segment.
+
+        :param self: Instance of MempoolLog
+        """
+        if self._file is not None:
+            os.fsync(self._file.fileno())
+            self._file.close()
+            self._file = None
+            self._synced = self._appended
+
+        for retired in self._retired:
+            retired.close()
+
+        self._retired = []
+
+    def __contains__(self, leaf: bytes) -> bool:
+        """
+        Checks whether a record is in the log and was not removed.
+
+        :param self: Instance of MempoolLog
+        :param leaf: The Merkle leaf of the record
+        :type leaf: bytes
+        :return: True if the record is waiting
+        :rtype: bool
+        """
+        return leaf in self._live
+
+    async def _fsync(self):
+        """
+        Syncs the active segment in a thread, so the event loop keeps serving while the disk works.
+
+        :param self: Instance of MempoolLog
+        """
+        appended = self._appended
+        file = self._file
+
+        try:
+            if file is not None:
+                await asyncio.get_running_loop().run_in_executor(
+                    None, os.fsync, file.fileno()
+                )
+
+            self._synced = max(self._synced, appended)
+        finally:
+            self._sync_task = None
+
+            for retired in self._retired:
+                retired.close()
+
+            self._retired = []
+
+    def _add(self, leaf: bytes, payload: bytes, signature: bytes):
+        """
+        Writes an accepted record to the active segment and moves it there.
+
+        :param self: Instance of MempoolLog
+        :param leaf: The Merkle leaf of the record
+        :type leaf: bytes
+        :param payload: The payload of the record
+        :type payload: bytes
+        :param signature: The signature of the record
+        :type signature: bytes
+        """
+        self._write(
+            ADD_ENTRY,
+            leaf
+            + struct.pack(PAYLOAD_LENGTH_FORMAT, len(payload))
+            + bytes(payload)
+            + bytes(signature),
+        )
+        self._untrack(leaf)
+        self._track(leaf, self._active)
+
+    def _write(self, entry_type: int, body: bytes):
+        """
+        Writes an entry to the active segment and starts a new segment once the active one is full.
+
+        :param self: Instance of MempoolLog
+        :param entry_type: ADD_ENTRY or REMOVE_ENTRY
+        :type entry_type: int
+        :param body: The body of the entry
+        :type body: bytes
+        """
+        if self._file is None:
+            self._start_segment()
+
+        checksum = zlib.crc32(bytes([entry_type]) + body)
+        self._file.write(
+            struct.pack(ENTRY_FORMAT, checksum, len(body), entry_type) + body
+        )
+        self._appended += 1
+
+        if self._file.tell() >= self.SEGMENT_SIZE:
+            self._start_segment()
+
+    def _start_segment(self):
+        """
+        Syncs and closes the active segment and opens the next one.
+
+        :param self: Instance of MempoolLog
+        """
+        if self._file is not None:
+            os.fsync(self._file.fileno())
+            self._synced = self._appended
+
+            # A running fsync of the segment still uses its file descriptor.
+            if self._sync_task is None:
+                self._file.close()
+            else:
+                self._retired.append(self._file)
+
+        self._active += 1
+        self._segments[self._active] = 0
+        # Unbuffered, so every entry reaches the operating system with its write and survives a crash of the process.
+        self._file = open(self._segment_path(self._active), "ab", buffering=0)
+
+    def _checkpoint(self):
+        """
+        Deletes the oldest segments once none of their records is waiting anymore. If there are too many segments,
+        the waiting records of the oldest one are copied to the active segment, so it can be deleted too.
+        Removals in a deleted segment only refer to records of the same or older segments, which are deleted already.
+
+        :param self: Instance of MempoolLog
+        """
+        copied = False
+
+        while self._segments:
+            oldest = next(iter(self._segments))
+
+            if oldest == self._active and self._file is not None:
+                return
+
+            if self._segments[oldest] > 0:
+                # One segment is copied at a time, so the copies cannot keep the log busy with itself.
+                if (
+                    copied
+                    or len(self._segments) <= self.MAX_SEGMENTS
+                    or self._file is None
+                ):
+                    return
+
+                self._copy_forward(oldest)
+                copied = True
+
+            del self._segments[oldest]
+            self._segment_path(oldest).unlink(missing_ok=True)
+
+    def _copy_forward(self, number: int):
+        """
+        Appends the waiting records of a segment to the active segment and syncs them before the segment is deleted.
+
+        :param self: Instance of MempoolLog
+        :param number: The number of the segment
+        :type number: int
+        """
+        for entry_type, body in self._read_segment(number):
+            if entry_type == ADD_ENTRY:
+                leaf, (payload, signature) = self._decode_add(body)
+
+                if self._live.get(leaf) == number:
+                    self._add(leaf, payload, signature)
+
+        os.fsync(self._file.fileno())
+        self._synced = self._appended
+
+    def _read_segment(self, number: int) -> Iterator[tuple[int, bytes]]:
+        """
+        Reads the entries of a segment up to its end or its first incomplete or corrupt entry.
+
+        :param self: Instance of MempoolLog
+        :param number: The number of the segment
+        :type number: int
+        :return: An iterator of (entry type, body) tuples
+        :rtype: Iterator[tuple[int, bytes]]
+        """
+        data = self._segment_path(number).read_bytes()
+        offset = 0
+        header_size = struct.calcsize(ENTRY_FORMAT)
+
+        while offset + header_size <= len(data):
+            checksum, length, entry_type = struct.unpack_from(
+                ENTRY_FORMAT, data, offset
+            )
+            body = data[offset + header_size : offset + header_size + length]
+
+            if (
+                len(body) != length
+                or zlib.crc32(bytes([entry_type]) + body) != checksum
+            ):
+                return
+
+            yield entry_type, body
+            offset += header_size + length
+
+    def _track(self, leaf: bytes, number: int):
+        """
+        Notes that a record is waiting and was last appended to a segment.
+
+        :param self: Instance of MempoolLog
+        :param leaf: The Merkle leaf of the record
+        :type leaf: bytes
+        :param number: The number of the segment
+        :type number: int
+        """
+        self._live[leaf] = number
+        self._segments[number] += 1
+
+    def _untrack(self, leaf: bytes):
+        """
+        Notes that a record is not waiting anymore.
+
+        :param self: Instance of MempoolLog
+        :param leaf: The Merkle leaf of the record
+        :type leaf: bytes
+        """
+        number = self._live.pop(leaf, None)
+
+        if number is not None:
+            self._segments[number] -= 1
+
+    def _segment_numbers(self) -> list[int]:
+        """
+        Returns the numbers of the segment files in the directory in ascending order.
+
+        :param self: Instance of MempoolLog
+        :return: The segment numbers
+        :rtype: list[int]
+        """
+        return sorted(
+            int(path.stem)
+            for path in self.path.glob(f"*{SEGMENT_SUFFIX}")
+            if path.stem.isdigit()
+        )
+
+    def _segment_path(self, number: int) -> Path:
+        """
+        Returns the path of a segment file.
+
+        :param self: Instance of MempoolLog
+        :param number: The number of the segment
+        :type number: int
+        :return: The path
+        :rtype: Path
+        """
+        return self.path / f"{number:08d}{SEGMENT_SUFFIX}"
+
+    @staticmethod
+    def _decode_add(body: bytes) -> tuple[bytes, tuple[bytes, bytes]]:
+        """
+        Decodes the body of an ADD_ENTRY.
+
+        :param body: The body of the entry
+        :type body: bytes
+        :return: The leaf and the (payload, signature) tuple of the record
+        :rtype: tuple[bytes, tuple[bytes, bytes]]
+        """
+        (length,) = struct.unpack_from(PAYLOAD_LENGTH_FORMAT, body, LEAF_SIZE)
+        start = LEAF_SIZE + struct.calcsize(PAYLOAD_LENGTH_FORMAT)
+        return body[:LEAF_SIZE], (body[start : start + length], body[start + length :])
+
+    @staticmethod
+    def _decode_leaves(body: bytes) -> list[bytes]:
+        """
+        Decodes the body of a REMOVE_ENTRY.
+
+        :param body: The body of the entry
+        :type body: bytes
+        :return: The Merkle leaves of the removed records
+        :rtype: list[bytes]
+        """
+        return [body[i : i + LEAF_SIZE] for i in range(0, len(body), LEAF_SIZE)]
@@ -0,0 +1,122 @@
+from hashlib import sha256
+
+# Leaves and inner nodes are hashed with different prefixes, so an inner node can never pass as a leaf.
+# The leaf also commits to the length of the payload, so no other split into payload and signature has the same leaf.
+LEAF_PREFIX = b"\x00"
+NODE_PREFIX = b"\x01"
+
+
+def record_leaf(payload: bytes | memoryview, signature: bytes | memoryview) -> bytes:
+    """
+    Calculates the Merkle leaf of a record. The leaf commits to the length of the payload, the payload and its signature.
+
+    :param payload: The payload of the record
+    :type payload: bytes | memoryview
+    :param signature: The signature of the record
+    :type signature: bytes | memoryview
+    :return: The leaf hash
+    :rtype: bytes
+    """
+    leaf = sha256(LEAF_PREFIX)
+    leaf.update(len(payload).to_bytes(4, "big"))
+    leaf.update(payload)
+    leaf.update(signature)
+    return leaf.digest()
+
+
+def merkle_root(leaves: list[bytes]) -> bytes:
+    """
+    Calculates the Merkle root of the leaves. An odd node is paired with itself, like in the MerkleRoot of the CLI.
+
+    :param leaves: The leaf hashes
+    :type leaves: list[bytes]
+    :return: The Merkle root or 32 null bytes without leaves
+    :rtype: bytes
+    """
+    if not leaves:
+        return bytes(32)
+
+    level = leaves
+
+    while len(level) > 1:
+        level = _next_level(level)
+
+    return level[0]
+
+
+def merkle_proof(leaves: list[bytes], index: int) -> list[bytes]:
+    """
+    Builds the inclusion proof of a leaf, which are the sibling hashes from the leaf up to the root.
+
+    :param leaves: The leaf hashes
+    :type leaves: list[bytes]
+    :param index: The index of the leaf
+    :type index: int
+    :return: The sibling hashes
+    :rtype: list[bytes]
+    """
+    proof = []
+    level = leaves
+
+    while len(level) > 1:
+        sibling = index ^ 1
+        proof.append(level[sibling] if sibling < len(level) else level[index])
+        level = _next_level(level)
+        index //= 2
+
+    return proof
+
+
+def verify_merkle_proof(
+    leaf: bytes, index: int, proof: list[bytes], root: bytes
+) -> bool:
+    """
+    Verifies that a leaf at the given index is included in the tree with the given root.
+
+    :param leaf: The leaf hash
+    :type leaf: bytes
+    :param index: The index of the leaf
+    :type index: int
+    :param proof: The sibling hashes from the leaf up to the root
+    :type proof: list[bytes]
+    :param root: The expected Merkle root
+    :type root: bytes
+    :return: True if the proof leads to the root
+    :rtype: bool
+    """
+    node = leaf
+
+    for sibling in proof:
+        node = node_hash(node, sibling) if index % 2 == 0 else node_hash(sibling, node)
+        index //= 2
+
+    return index == 0 and node == root
+
+
+def node_hash(left: bytes, right: bytes) -> bytes:
+    """
+    Calculates the hash of an inner node from its children.
+
+    :param left: The hash of the left child
+    :type left: bytes
+    :param right: The hash of the right child
+    :type right: bytes
+    :return: The node hash
+    :rtype: bytes
+    """
+    return sha256(NODE_PREFIX + left + right).digest()
+
+
+def _next_level(level: list[bytes]) -> list[bytes]:
+    """
+    Hashes the pairs of a tree level into the next level.
+
+    :param level: The hashes of a tree level
+    :type level: list[bytes]
+    :return: The hashes of the next level
+    :rtype: list[bytes]
+    """
+    if len(level) % 2 != 0:
+        level = level + [level[-1]]
+
+    return [node_hash(level[i], level[i + 1]) for i in range(0, len(level), 2)]
@@ -0,0 +1,25 @@
+import argparse
+import traceback
+
+from pathlib import Path
+from blockchain import SCHEMA_VERSION, migrate
+
+# One-shot migration of an existing database to the current key schema.
+# Stop the peer node before running it, because LevelDB allows only one process to open the database.
+try:
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument(
+        "--db",
+        type=Path,
+        help="Path to the LevelDB database",
+        default=Path("data") / "plockchain.db",
+    )
+
+    args = parser.parse_args()
+    print(f"Migrating {args.db} to key schema version {SCHEMA_VERSION}...")
+    migrated = migrate(args.db)
+    print(f"Migrated {migrated} blocks.")
+except:
+    traceback.print_exc()
+    exit(1)
@@ -1,29 +1,116 @@
 import asyncio
-import json
+import random
+import struct
+import time
 
-from asyncio import StreamReader, StreamWriter
+from address_book import AddressBook
+from asyncio import Future, StreamReader, StreamWriter, Task
 from datetime import datetime
-from block import Block
+from block import Block, MultiRecordBlock, ParsedBlock
+from block_producer import BlockProducer
+from concurrent.futures import BrokenExecutor
 from blockchain import Blockchain
+from compact_block import PartialBlock, compact
+from connection import MAX_FRAME_SIZE, WIRE_VERSION, Connection
+from gossip import Gossip, SeenCache
+from mempool import Mempool
+from mempool_log import MempoolLog
+from merkle import record_leaf
+from sync import BlockDownload, verify_header_chain
+from verification import SignatureVerifier
 
 
-# TODO: Tests
 # TODO: Remove all prints and replace with proper logging. This is just for quick debugging and demonstration purposes.
 class PeerNode:
+    MAX_HEADERS_PER_MESSAGE = (
+        2000  # Upper bound of headers sent in one "headers" message
+    )
+
+    # Upper bound of peer list exchanges in flight during discovery
+    MAX_CONCURRENT_DIALS = 32
+
+    # Seconds a peer has to accept the connection and answer the "hello" message
+    PEER_TIMEOUT = 5.0
+
+    # Attempts per peer and the delay before the first retry, which doubles with every further retry
+    DIAL_ATTEMPTS = 3
+    RETRY_BACKOFF = 0.5
+
+    # Seconds between two peer exchanges and the number of random peers contacted in each of them
+    PEER_EXCHANGE_INTERVAL = 30.0
+    PEER_EXCHANGE_FANOUT = 8
+
+    # Number of random peers a new record or block is pushed to, seconds between two pulls from a random peer,
+    # and the upper bound of blocks sent in one "blocks" message
+    GOSSIP_FANOUT = 4
+    GOSSIP_PULL_INTERVAL = 5.0
+    MAX_BLOCKS_PER_MESSAGE = 100
+    # Half the maximum frame size, which leaves room for the encoding of the message
+    MAX_BLOCK_BYTES_PER_MESSAGE = MAX_FRAME_SIZE // 2
+
+    # Number of inventory IDs remembered per peer as known to it, number of record leaves remembered as included in a block,
+    # and number of record leaves remembered with a valid signature
+    KNOWN_INVENTORY_CAPACITY = 10000
+    INCLUDED_RECORDS_CAPACITY = 100000
+    VERIFIED_RECORDS_CAPACITY = 100000
+
+    # Seconds after which a block window of the initial block download is requested again from a faster idle peer,
+    # and seconds an idle download worker waits before it looks for a stalled window again
+    SYNC_STALL_TIMEOUT = 2.0
+    SYNC_POLL_INTERVAL = 0.1
+
+    # Upper bounds of the records and bytes in a produced block, and seconds a record of a client waits for its block at most
+    BLOCK_MAX_RECORDS = 1000
+    BLOCK_MAX_BYTES = 2**20
+    BLOCK_MAX_LATENCY = 0.05
+    # Seconds the blockchain collects blocks that share one write and one sync
+    GROUP_COMMIT_WINDOW = 0.002
+
     host: str
     port: int
-    peers: set[str]  # unique set of known peer addresses
-    connected_peers: set[str]  # peers we have already contacted
+    address_book: AddressBook  # known peer addresses with their liveness
+    connections: dict[str, Connection]  # open connections to peers by address
+    clients: set[Connection]  # open incoming connections of peers and clients
+    dialing: set[str]  # peers with a peer list exchange in progress
+    dial_semaphore: asyncio.Semaphore
+    gossip: Gossip
+    known_inventory: dict[
+        str, SeenCache
+    ]  # IDs of the blocks and records each peer is known to have
+    requested_inventory: set[bytes]  # IDs requested with "getdata" and not received yet
+    partial_blocks: dict[
+        bytes, PartialBlock
+    ]  # compact blocks waiting for their missing records by block hash
+    pulling: set[str]  # peers the node pulls blocks from right now
+    syncing: bool  # whether the initial block download runs
+    background_tasks: set[
+        Task
+    ]  # running pushes, which are not awaited by the handler that started them
+    bootstrap: str | None
     log_file: str  # TODO: Remove when we have proper logging
     blockchain: Blockchain
 
-    mempool: list[
-        tuple[bytes, bytes]
-    ]  # List of (payload, signature) tuples representing deployment records to be processed
+    mempool: Mempool  # Deployment records waiting for a block
+    # Write-ahead log of the records of clients, replayed on startup
+    mempool_log: MempoolLog
+    block_producer: BlockProducer  # Decides when the mempool is cut into a block
+    # Clients waiting for the commit of their record by record leaf
+    commit_waiters: dict[bytes, list[Future]]
+    verifier: SignatureVerifier  # Verifies record signatures in worker processes
+    included_records: SeenCache  # Leaves of the records recently put into a block
 
-    def __init__(self, host: str, port: int, bootstrap: str = None):
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        bootstrap: str = None,
+        sync: bool = True,
+        group_commit_window: float = GROUP_COMMIT_WINDOW,
+    ):
         """
         Initialize the PeerNode with the given host, port, and optional bootstrap peer.
+        Blocks are synced to disk by default, because clients are told that their records are committed once
+        their block is written. The group commit shares a sync between the blocks written within its window.
 
         :param self: Instance of PeerNode
         :param host: Host address of the peer node
@@ -32,64 +119,170 @@ class PeerNode:
         :type port: int
         :param bootstrap: Optional bootstrap peer address to connect to when starting the node
         :type bootstrap: str
+        :param sync: Whether blocks are synced to disk before the clients of their records are answered
+        :type sync: bool
+        :param group_commit_window: Seconds the blockchain collects blocks that share one write and one sync
+        :type group_commit_window: float
         """
         self.host = host
         self.port = int(port)
-        self.peers = set()  # unique set of peer addresses
-        self.connected_peers = set()  # peers we have already contacted
-        self.mempool = []
-        # self.blockchain = Blockchain()
+        self.address_book = AddressBook()
+        self.connections = {}
+        self.clients = set()
+        self.dialing = set()
+        self.dial_semaphore = asyncio.Semaphore(self.MAX_CONCURRENT_DIALS)
+        self.gossip = Gossip(self.GOSSIP_FANOUT)
+        self.known_inventory = {}
+        self.requested_inventory = set()
+        self.partial_blocks = {}
+        self.pulling = set()
+        self.syncing = False
+        self.background_tasks = set()
+        self.bootstrap = bootstrap
+        self.mempool = Mempool(on_evict=self._evict)
+        self.mempool_log = MempoolLog()
+        self.block_producer = BlockProducer(
+            self.BLOCK_MAX_RECORDS, self.BLOCK_MAX_BYTES, self.BLOCK_MAX_LATENCY
+        )
+        self.commit_waiters = {}
+        self.verifier = SignatureVerifier(cache_capacity=self.VERIFIED_RECORDS_CAPACITY)
+        self.included_records = SeenCache(self.INCLUDED_RECORDS_CAPACITY)
+        self.blockchain = Blockchain(sync=sync, group_commit_window=group_commit_window)
+        self._restore_mempool()
 
         self.log_file = (
             f"peer_communication.log"  # TODO: Remove when we have proper logging
         )
 
         if bootstrap:
-            self.peers.add(bootstrap)
+            self.address_book.add(bootstrap)
             print(f"Bootstrapping to {bootstrap}...")
 
     async def start(self):
         """
-        Start the peer node and listen for incoming connections. The node will handle incoming messages.
+        Start the peer node and listen for incoming connections. The node will handle incoming messages
+        and produce blocks from the records of its clients in the background.
+        The bootstrap peer is contacted on the same event loop, so the connection to it stays open while the node runs.
+        Then the node downloads the blocks it is missing from the discovered peers.
+        Afterwards the node exchanges peer lists with random known peers and pulls new blocks from a random peer periodically.
 
         :param self: Instance of PeerNode
         """
         print(f"Starting peer node on {self.host}:{self.port}...")
         server = await asyncio.start_server(self.handle_client, self.host, self.port)
+        self.verifier.start()
+        producer = asyncio.create_task(self._produce_blocks())
+        peer_exchange = None
+        pull = None
 
         async with server:
-            await server.serve_forever()
+            try:
+                if self.bootstrap:
+                    await self.connect_to_peer(self.bootstrap)
+
+                await self.sync()
+
+                peer_exchange = asyncio.create_task(self._exchange_peers_periodically())
+                pull = asyncio.create_task(self._pull_periodically())
+                # The server serves until the task is cancelled. serve_forever() is not used, because it waits
+                # for all incoming connections to close when cancelled, and peers keep their connections open.
+                await asyncio.get_running_loop().create_future()
+            finally:
+                for task in [producer, peer_exchange, pull, *self.background_tasks]:
+                    if task is not None:
+                        task.cancel()
+
+                for connection in [*self.connections.values(), *self.clients]:
+                    await connection.close()
 
     async def handle_client(self, reader: StreamReader, writer: StreamWriter):
         """
-        Handles an incoming client connection. The node will read a message from the client, process it, and respond accordingly.
+        Handles an incoming client connection. The connection stays open until the client closes it,
+        and every message on it is handled concurrently, so a client can keep many requests in flight.
+
         :param self: Instance of PeerNode
         :param reader: StreamReader object to read data from the client
         :type reader: StreamReader
         :param writer: StreamWriter object to send data to the client
         :type writer: StreamWriter
         """
-        data = await reader.readline()
-        msg = json.loads(data.decode())
+        connection = Connection(reader, writer, self.handle_message)
+        self.clients.add(connection)
 
+        try:
+            await connection.serve()
+        finally:
+            self.clients.discard(connection)
+
+    async def handle_message(self, msg: dict, connection: Connection):
+        """
+        Handles a single message received on a connection and responds on the same connection.
+
+        :param self: Instance of PeerNode
+        :param msg: The received message
+        :type msg: dict
+        :param connection: The connection the message was received on
+        :type connection: Connection
+        """
         if msg["type"] == "hello":
-            await self._handle_hello_message(msg, writer)
+            await self._handle_hello_message(msg, connection)
 
         if msg["type"] == "add_deployment_record":
-            await self._handle_add_deployment_record(msg, writer)
+            await self._handle_add_deployment_record(msg, connection)
+
+        if msg["type"] == "get_headers":
+            await self._handle_get_headers(msg, connection)
+
+        if msg["type"] == "get_record_proof":
+            await self._handle_get_record_proof(msg, connection)
+
+        if msg["type"] == "inv":
+            await self._handle_inv(msg, connection)
+
+        if msg["type"] == "getdata":
+            await self._handle_getdata(msg, connection)
+
+        if msg["type"] == "record":
+            await self._handle_record(msg)
+
+        if msg["type"] == "block":
+            await self._receive_block(msg["block"], msg.get("me"))
+
+        if msg["type"] == "compact_block":
+            await self._handle_compact_block(msg, connection)
+
+        if msg["type"] == "getblocktxn":
+            await self._handle_getblocktxn(msg, connection)
 
-        writer.close()
+        if msg["type"] == "blocktxn":
+            await self._handle_blocktxn(msg, connection)
 
-    async def _handle_hello_message(self, msg: dict, writer: StreamWriter):
+        if msg["type"] == "get_blocks":
+            await self._handle_get_blocks(msg, connection)
+
+        if msg["type"] == "get_tip":
+            await self._handle_get_tip(msg, connection)
+
+        if msg["type"] == "get_mempool_stats":
+            await self._handle_get_mempool_stats(msg, connection)
+
+    async def _handle_hello_message(self, msg: dict, connection: Connection):
         """
-        Handle a "hello" message from a peer. The node will update its known peers, and respond with its own peer list.
+        Handle a "hello" message from a peer. The node will update its known peers, and respond with the peers
+        added to its address book since the last exchange with the sender. The whole address book is sent
+        if the sender lost its state or is an old node that always expects full peer lists.
+        A hello without an address comes from a client, which only negotiates the wire protocol.
 
         :param self: Instance of PeerNode
         :param msg: The "hello" message received from a peer, containing the sender's address and their known peers
         :type msg: dict
-        :param writer: StreamWriter object to send data to the client
-        :type writer: StreamWriter
+        :param connection: The connection to respond on
+        :type connection: Connection
         """
+        if "me" not in msg:
+            await connection.reply(msg, {"type": "hello_response"})
+            return
+
         print(f"Hi {msg['me']}. Nice to meet you. 👋")
 
         self._log_greeting(
@@ -98,53 +291,792 @@ class PeerNode:
             f"Hi {msg['me']}. Nice to meet you. 👋",
         )
 
-        peers_without_sender = [p for p in self.peers if p != msg["me"]]
+        self.address_book.add(msg["me"])
+        entry = self.address_book.get(msg["me"])
+        sent = entry.sent if "full" in msg and not msg["full"] else None
+        # The delta is taken before the peers of the sender are added, so they are not echoed back to it.
+        peers = self.address_book.added_since(sent or 0, exclude=msg["me"])
+        self._update_own_peer_list(msg)
 
         print(
-            f"I know these peers: {peers_without_sender}"
-            if peers_without_sender
-            else "I don't know any peers yet."
+            f"I know these new peers: {peers}" if peers else "I don't know new peers."
         )
 
-        self._update_own_peer_list(msg)
-
-        await self._send_own_peer_list(
-            writer, "peer_list", list(self.peers), f"{self.host}:{self.port}"
+        response = self._peer_list_message(
+            "peer_list", peers, f"{self.host}:{self.port}"
         )
 
+        # Old nodes send no "full" field and get the full peer list every time, so no delta state is kept for them.
+        if "full" in msg:
+            response["full"] = sent is None
+            # The sender has sent a delta, but this node has no state for it, so it asks for the full list next time.
+            response["resync"] = sent is None and not msg["full"]
+            entry.sent = self.address_book.sequence
+
+        self.address_book.mark_alive(msg["me"])
+        await connection.reply(msg, response)
+
         await self._broadcast_new_peer(msg)
 
-    async def _handle_add_deployment_record(self, msg: dict, writer: StreamWriter):
-        # TODO: The signature is not used for now. We should verify the signature and only add the record to the mempool if the signature is valid.
-        self.mempool.append(
-            (bytes.fromhex(msg["record"]), bytes.fromhex(msg["signature"]))
+    async def _handle_add_deployment_record(self, msg: dict, connection: Connection):
+        """
+        Handle an "add_deployment_record" message of a client. A record with a valid signature is added to the mempool
+        and its log, and the block producer cuts it into a block in the background. The client is answered once the record
+        is in the mempool and its log is on disk if it asks for the durability "accepted", and once its block is written otherwise.
+
+        :param self: Instance of PeerNode
+        :param msg: The "add_deployment_record" message containing the record, its signature and the optional durability
+        :type msg: dict
+        :param connection: The connection to respond on
+        :type connection: Connection
+        """
+        leaf = record_leaf(msg["record"], msg["signature"])
+
+        # A record that is already waiting was verified when it was added.
+        valid = leaf in self.mempool or await self._verify_record(
+            leaf, msg["record"], msg["signature"]
         )
 
-        # TODO: The mempool is not used for reorgs right now.
-        record = self.mempool[0]
-        # TODO: Fix getting last block.
-        # latest_block = self.blockchain.get_latest_block()
-        # previous_hash = Block.calculate_hash(latest_block) if latest_block else None
-        # print(previous_hash)
-        # block = Block(record[0], record[1], previous_hash).build()
-        block = Block(record[0], record[1]).build()
-        print(block)
-        # self.blockchain.add_block(block)
-        self.mempool.pop(0)
-
-        writer.write(
-            (
-                json.dumps(
+        if valid is False:
+            await connection.reply(
+                msg, {"type": "add_deployment_record_response", "status": "rejected"}
+            )
+
+            return
+
+        if valid is None:
+            # The record is in a block already. Its commit is only awaited if other clients wait for it,
+            # because otherwise the block is not produced by this node or is already written.
+            if leaf not in self.commit_waiters and msg.get("durability") != "accepted":
+                await connection.reply(
+                    msg,
                     {
                         "type": "add_deployment_record_response",
                         "status": "success",
+                        "durability": "committed",
+                    },
+                )
+
+                return
+        elif self.mempool.add(msg["record"], msg["signature"], leaf):
+            self.mempool_log.append(leaf, msg["record"], msg["signature"])
+            self.gossip.accept(leaf)
+            self.block_producer.record_arrived()
+            self._spawn(self._announce(record_ids=[leaf]))
+        elif leaf not in self.mempool:
+            await connection.reply(
+                msg, {"type": "add_deployment_record_response", "status": "rejected"}
+            )
+
+            return
+
+        if msg.get("durability") == "accepted":
+            # The record is acknowledged before its block is produced, so it must survive a crash of the node.
+            await self.mempool_log.sync()
+            await connection.reply(
+                msg,
+                {
+                    "type": "add_deployment_record_response",
+                    "status": "success",
+                    "durability": "accepted",
+                },
+            )
+
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        self.commit_waiters.setdefault(leaf, []).append(future)
+
+        await connection.reply(
+            msg,
+            {
+                "type": "add_deployment_record_response",
+                **await future,
+                "durability": "committed",
+            },
+        )
+
+    async def _produce_blocks(self):
+        """
+        Cut the mempool into blocks whenever the block producer considers a block due. The commit of a block
+        is not awaited, so the next block is cut while the previous one is written, and the group commit
+        of the blockchain writes blocks that are cut in quick succession together.
+
+        :param self: Instance of PeerNode
+        """
+        while True:
+            await self.block_producer.wait(self.mempool)
+
+            # Blocks of the node would not link to the downloaded blocks, so the records wait for the download.
+            if self.syncing:
+                await asyncio.sleep(self.SYNC_POLL_INTERVAL)
+                continue
+
+            # TODO: The mempool is not used for reorgs right now.
+            # The records leave the mempool before the commit is awaited, so they never end up in a second block.
+            records = self.mempool.take(
+                self.block_producer.max_records, self.block_producer.max_bytes
+            )
+            self.block_producer.produced(len(self.mempool))
+
+            for record in records:
+                self.included_records.add(record_leaf(*record))
+
+            # The block is linked to the cached head hash of the chain, so the previous block is never read or hashed again.
+            # It is queued for the group commit right away, which moves the head hash before the next block is built.
+            block = MultiRecordBlock(records, self.blockchain.head_hash).build()
+            block_hash = Block.calculate_hash(block)
+            self.gossip.accept(block_hash)
+            commit = self.blockchain.enqueue_block(block)
+            self._spawn(self._commit_produced_block(commit, block_hash, records))
+
+    async def _commit_produced_block(
+        self, commit: Future, block_hash: bytes, records: list[tuple[bytes, bytes]]
+    ):
+        """
+        Wait until a produced block is written, answer the clients waiting for its records and announce it to random peers.
+        If the block cannot be written, its records are put back into the mempool for the next block.
+
+        :param self: Instance of PeerNode
+        :param commit: The future of the height of the queued block
+        :type commit: Future
+        :param block_hash: The hash of the block
+        :type block_hash: bytes
+        :param records: The (payload, signature) tuples of the records of the block
+        :type records: list[tuple[bytes, bytes]]
+        """
+        leaves = [record_leaf(*record) for record in records]
+
+        try:
+            height = await commit
+        except Exception as e:
+            print(f"Writing block {block_hash.hex()} failed: {e!r}")
+            self._put_back(records, leaves)
+            return
+
+        print(f"Added block {height} with {len(records)} deployment records.")
+        self.mempool_log.remove(leaves)
+        self._resolve_waiting(leaves, {"status": "success", "height": height})
+        await self._announce(block_hashes=[block_hash])
+
+    def _put_back(self, records: list[tuple[bytes, bytes]], leaves: list[bytes]):
+        """
+        Put the records of a block that could not be written back into the mempool. They stay in the mempool log,
+        and their clients keep waiting for the next block. Records that do not fit into the mempool anymore are rejected.
+
+        :param self: Instance of PeerNode
+        :param records: The (payload, signature) tuples of the records of the block
+        :type records: list[tuple[bytes, bytes]]
+        :param leaves: The Merkle leaves of the records
+        :type leaves: list[bytes]
+        """
+        for (payload, signature), leaf in zip(records, leaves):
+            self.included_records.discard(leaf)
+
+            if (
+                not self.mempool.add(payload, signature, leaf)
+                and leaf not in self.mempool
+            ):
+                self._evict(leaf)
+
+        self.block_producer.record_arrived()
+
+    def _resolve_waiting(self, leaves: list[bytes], result: dict):
+        """
+        Answer the clients waiting for the commit of records.
+
+        :param self: Instance of PeerNode
+        :param leaves: The Merkle leaves of the records
+        :type leaves: list[bytes]
+        :param result: The fields of the response to the clients
+        :type result: dict
+        """
+        for leaf in leaves:
+            for future in self.commit_waiters.pop(leaf, []):
+                if not future.done():
+                    future.set_result(result)
+
+    def _evict(self, leaf: bytes):
+        """
+        Remove a record that was evicted from the mempool from its log and answer the clients waiting for it.
+
+        :param self: Instance of PeerNode
+        :param leaf: The Merkle leaf of the evicted record
+        :type leaf: bytes
+        """
+        self.mempool_log.remove([leaf])
+        self._reject_waiting(leaf)
+
+    def _restore_mempool(self):
+        """
+        Put the records of clients that were accepted before a restart back into the mempool.
+        They were verified when they were accepted, so their signatures are not verified again.
+        A record whose block was written right before the node stopped is on the chain already and is dropped.
+
+        :param self: Instance of PeerNode
+        """
+        restored = 0
+
+        for leaf, payload, signature in self.mempool_log.replay():
+            if self.blockchain.has_record(payload, signature):
+                self.included_records.add(leaf)
+                self.gossip.accept(leaf)
+                self.mempool_log.remove([leaf])
+            elif self.mempool.add(payload, signature, leaf):
+                self.gossip.accept(leaf)
+                self.verifier.verified.add(leaf)
+                restored += 1
+            elif leaf not in self.mempool:
+                self.mempool_log.remove([leaf])
+
+        if restored:
+            print(f"Restored {restored} deployment records from the mempool log.")
+            self.block_producer.record_arrived()
+
+    def _reject_waiting(self, leaf: bytes):
+        """
+        Answer the clients waiting for a record that was evicted from the mempool.
+
+        :param self: Instance of PeerNode
+        :param leaf: The Merkle leaf of the evicted record
+        :type leaf: bytes
+        """
+        self._resolve_waiting([leaf], {"status": "rejected"})
+
+    async def _handle_record(self, msg: dict):
+        """
+        Handle a "record" message of a peer that answers a "getdata" message. A record seen for the first time
+        is verified, added to the mempool and announced to random peers. Records seen before are dropped,
+        so every record is relayed once per node.
+
+        :param self: Instance of PeerNode
+        :param msg: The "record" message containing the payload and the signature of the record
+        :type msg: dict
+        """
+        leaf = record_leaf(msg["record"], msg["signature"])
+        self.requested_inventory.discard(leaf)
+
+        if "me" in msg:
+            self._known_inventory(msg["me"]).add(leaf)
+
+        if not self.gossip.accept(leaf):
+            return
+
+        # The record stays marked as seen, so an invalid record is not requested again.
+        if not await self._verify_record(leaf, msg["record"], msg["signature"]):
+            return
+
+        self.mempool.add(msg["record"], msg["signature"], leaf)
+        self._spawn(self._announce(record_ids=[leaf]))
+
+    async def _verify_record(
+        self, leaf: bytes, payload: bytes, signature: bytes
+    ) -> bool | None:
+        """
+        Verify the signature of a new record in the worker processes. A record that a block included
+        before or while it is verified must not enter the mempool anymore.
+
+        :param self: Instance of PeerNode
+        :param leaf: The Merkle leaf of the record
+        :type leaf: bytes
+        :param payload: The payload of the record
+        :type payload: bytes
+        :param signature: The signature of the record
+        :type signature: bytes
+        :return: Whether the signature is valid, or None if a block included the record
+        :rtype: bool | None
+        """
+        if leaf in self.included_records:
+            return None
+
+        valid = await self.verifier.verify(payload, signature, leaf)
+        return None if leaf in self.included_records else valid
+
+    async def _receive_block(self, block: bytes, sender: str | None = None) -> bool:
+        """
+        Append a block fetched or pulled from a peer to the chain and announce it to random peers.
+        There is no consensus yet, so a block is only appended if it extends the local chain. Other blocks
+        are not marked as seen, so they can still be appended once the blocks before them are pulled.
+        The signatures of the records are verified before the block is appended. Malformed blocks are dropped.
+
+        :param self: Instance of PeerNode
+        :param block: The built block
+        :type block: bytes
+        :param sender: The address of the peer that sent the block, if known
+        :type sender: str | None
+        :return: True if the block was appended
+        :rtype: bool
+        """
+        try:
+            block_hash = Block.calculate_hash(block)
+            parsed = Block.from_bytes(block)
+        except (struct.error, ValueError):
+            print(f"Dropped a malformed block from {sender or 'a peer'}.")
+            return False
+
+        self.requested_inventory.discard(block_hash)
+
+        if sender is not None:
+            self._known_inventory(sender).add(block_hash)
+
+        # Blocks received during the initial block download are not marked as seen, so they are pulled afterwards.
+        if block_hash in self.gossip.seen or self.syncing:
+            return False
+
+        if not parsed.has_valid_records_root():
+            return False
+
+        if parsed.previous_hash != (self.blockchain.head_hash or bytes(32)):
+            # The block may be ahead of the local chain, so the blocks before it are pulled from its sender.
+            if sender is not None:
+                self._spawn(self._pull(sender))
+
+            return False
+
+        if not await self._verify_blocks([block]):
+            print(f"Block {block_hash.hex()} has invalid record signatures.")
+            self.gossip.accept(block_hash)
+            return False
+
+        # A concurrent copy of the block or a produced block may have been appended during the verification.
+        if (
+            block_hash in self.gossip.seen
+            or self.syncing
+            or parsed.previous_hash != (self.blockchain.head_hash or bytes(32))
+        ):
+            return False
+
+        # The block is marked as seen before the commit is awaited, so a concurrent copy of it is dropped.
+        leaves, taken = self._take_block_records(block_hash, parsed)
+
+        try:
+            height = await self.blockchain.commit_block(block)
+        except Exception as e:
+            print(f"Writing block {block_hash.hex()} failed: {e!r}")
+            self.gossip.seen.discard(block_hash)
+
+            for leaf in leaves:
+                self.included_records.discard(leaf)
+
+            self._put_back([record for record, _ in taken], [leaf for _, leaf in taken])
+            return False
+
+        included = self._accept_block(block_hash, parsed)
+        print(f"Received block {height} with {included} deployment records.")
+        self._spawn(self._announce(block_hashes=[block_hash]))
+        return True
+
+    async def _verify_blocks(self, blocks: list[bytes]) -> bool:
+        """
+        Verify the record signatures of blocks from peers. Most records were gossiped before they landed in a block,
+        so the verifier finds them in its cache and only the records never seen before are verified.
+
+        :param self: Instance of PeerNode
+        :param blocks: The built blocks
+        :type blocks: list[bytes]
+        :return: True if the blocks can be parsed and all signatures are valid
+        :rtype: bool
+        """
+        try:
+            records = [
+                record for block in blocks for record in ParsedBlock(block).records()
+            ]
+        except (struct.error, ValueError, TypeError):
+            return False
+
+        return all(await self.verifier.verify_many(records))
+
+    def _take_block_records(
+        self, block_hash: bytes, parsed: ParsedBlock
+    ) -> tuple[list[bytes], list[tuple[tuple[bytes, bytes], bytes]]]:
+        """
+        Mark a block that is being written as seen and take its records out of the mempool,
+        so no block produced in the meantime includes them again.
+
+        :param self: Instance of PeerNode
+        :param block_hash: The hash of the block
+        :type block_hash: bytes
+        :param parsed: The parsed block
+        :type parsed: ParsedBlock
+        :return: The leaves of all records of the block and the ((payload, signature), leaf) tuples taken from the mempool
+        :rtype: tuple[list[bytes], list[tuple[tuple[bytes, bytes], bytes]]]
+        """
+        self.gossip.accept(block_hash)
+        leaves = []
+        taken = []
+
+        for payload, signature in parsed.records():
+            leaf = record_leaf(payload, signature)
+            leaves.append(leaf)
+            self.included_records.add(leaf)
+            record = self.mempool.remove(leaf)
+
+            if record is not None:
+                taken.append((record, leaf))
+
+        return leaves, taken
+
+    def _accept_block(self, block_hash: bytes, parsed: ParsedBlock) -> int:
+        """
+        Mark a written block and its records as seen, remove the records from the mempool and its log
+        and answer the clients waiting for them.
+
+        :param self: Instance of PeerNode
+        :param block_hash: The hash of the block
+        :type block_hash: bytes
+        :param parsed: The parsed block
+        :type parsed: ParsedBlock
+        :return: The number of records of the block
+        :rtype: int
+        """
+        self.gossip.accept(block_hash)
+        included = set()
+
+        for payload, signature in parsed.records():
+            leaf = record_leaf(payload, signature)
+            included.add(leaf)
+            self.gossip.accept(leaf)
+
+        self.mempool.remove_many(included)
+        # Only written blocks are accepted, so a record leaves the log once it is on the chain and not earlier.
+        self.mempool_log.remove(included)
+
+        for leaf in included:
+            self.included_records.add(leaf)
+        # The records of waiting clients may have been put into a block by another node.
+        self._resolve_waiting(list(included), {"status": "success"})
+
+        return len(included)
+
+    async def _handle_inv(self, msg: dict, connection: Connection):
+        """
+        Handle an "inv" message that announces the hashes of blocks and the IDs of records.
+        The node requests only the items it neither has nor requested from another peer yet,
+        so every item crosses a link at most once.
+
+        :param self: Instance of PeerNode
+        :param msg: The "inv" message containing the sender's address, the block hashes and the record IDs
+        :type msg: dict
+        :param connection: The connection to request the items on
+        :type connection: Connection
+        """
+        known = self._known_inventory(msg["me"])
+        wanted = {"block_hashes": [], "record_ids": []}
+
+        for field in wanted:
+            for item_id in msg.get(field, []):
+                known.add(item_id)
+
+                if (
+                    item_id in self.gossip.seen
+                    or item_id in self.requested_inventory
+                    or (
+                        field == "block_hashes"
+                        and self.blockchain.get_height_by_hash(item_id) is not None
+                    )
+                ):
+                    continue
+
+                wanted[field].append(item_id)
+                self.requested_inventory.add(item_id)
+
+                # A peer that never delivers does not block the item, another announcement requests it again.
+                asyncio.get_running_loop().call_later(
+                    self.PEER_TIMEOUT, self.requested_inventory.discard, item_id
+                )
+
+        if wanted["block_hashes"] or wanted["record_ids"]:
+            await connection.send(
+                {
+                    "type": "getdata",
+                    "me": f"{self.host}:{self.port}",
+                    "compact": True,
+                    **wanted,
+                }
+            )
+
+    async def _handle_getdata(self, msg: dict, connection: Connection):
+        """
+        Handle a "getdata" message that requests announced blocks and records. Every item is sent
+        as a "block" or "record" message on the same connection. Items that are gone are skipped.
+        Multi-record blocks are sent as "compact_block" messages to peers that ask for them,
+        because the peer most likely holds their records in its mempool already.
+
+        :param self: Instance of PeerNode
+        :param msg: The "getdata" message containing the requester's address, the block hashes and the record IDs
+        :type msg: dict
+        :param connection: The connection to send the items on
+        :type connection: Connection
+        """
+        me = f"{self.host}:{self.port}"
+        known = self._known_inventory(msg["me"])
+
+        for block_hash in msg.get("block_hashes", []):
+            block = self.blockchain.get_block_by_hash(block_hash)
+
+            if block is None:
+                continue
+
+            known.add(block_hash)
+
+            if (
+                msg.get("compact")
+                and Block.header_size(block) == Block.RECORDS_HEADER_SIZE
+            ):
+                header, short_ids = compact(block)
+                await connection.send(
+                    {
+                        "type": "compact_block",
+                        "header": header,
+                        "short_ids": short_ids,
+                        "me": me,
                     }
                 )
-                + "\n"  # Note: the newline is important to signal the end of the message for readline()
-            ).encode()
+            else:
+                await connection.send({"type": "block", "block": block, "me": me})
+
+        for leaf in msg.get("record_ids", []):
+            record = self.mempool.get(leaf)
+
+            if record is not None:
+                known.add(leaf)
+                await connection.send({**self._record_message(*record), "me": me})
+
+    async def _handle_compact_block(self, msg: dict, connection: Connection):
+        """
+        Handle a "compact_block" message that carries the header of a block and the short IDs of its records.
+        The block is rebuilt from the mempool, and only the missing records are requested from the sender.
+
+        :param self: Instance of PeerNode
+        :param msg: The "compact_block" message containing the sender's address, the header and the short IDs
+        :type msg: dict
+        :param connection: The connection to request the missing records on
+        :type connection: Connection
+        """
+        block_hash = Block.calculate_hash(msg["header"])
+
+        if block_hash in self.gossip.seen or block_hash in self.partial_blocks:
+            return
+
+        partial = PartialBlock(msg["header"], msg["short_ids"])
+        partial.fill_from(self.mempool.items())
+        await self._complete_partial_block(block_hash, partial, msg["me"], connection)
+
+    async def _handle_getblocktxn(self, msg: dict, connection: Connection):
+        """
+        Handle a "getblocktxn" message of a peer that rebuilds a compact block and misses some of its records.
+
+        :param self: Instance of PeerNode
+        :param msg: The "getblocktxn" message containing the block hash and the positions of the missing records
+        :type msg: dict
+        :param connection: The connection to send the records on
+        :type connection: Connection
+        """
+        block = self.blockchain.get_block_by_hash(msg["block_hash"])
+
+        if block is None:
+            return
+
+        records = Block.from_bytes(block).records()
+        indexes = [index for index in msg["indexes"] if 0 <= index < len(records)]
+
+        await connection.send(
+            {
+                "type": "blocktxn",
+                "block_hash": msg["block_hash"],
+                "indexes": indexes,
+                "payloads": [bytes(records[index][0]) for index in indexes],
+                "signatures": [bytes(records[index][1]) for index in indexes],
+                "me": f"{self.host}:{self.port}",
+            }
+        )
+
+    async def _handle_blocktxn(self, msg: dict, connection: Connection):
+        """
+        Handle a "blocktxn" message that delivers the missing records of a compact block.
+
+        :param self: Instance of PeerNode
+        :param msg: The "blocktxn" message containing the block hash, the positions and the records
+        :type msg: dict
+        :param connection: The connection to request further records on
+        :type connection: Connection
+        """
+        partial = self.partial_blocks.pop(msg["block_hash"], None)
+
+        if partial is None:
+            return
+
+        partial.fill(msg["indexes"], list(zip(msg["payloads"], msg["signatures"])))
+        await self._complete_partial_block(
+            msg["block_hash"], partial, msg["me"], connection
+        )
+
+    async def _complete_partial_block(
+        self,
+        block_hash: bytes,
+        partial: PartialBlock,
+        sender: str,
+        connection: Connection,
+    ):
+        """
+        Append a rebuilt compact block or request its missing records from the sender. If the rebuilt block
+        does not match its records root, a short ID matched a wrong record and all records are requested.
+
+        :param self: Instance of PeerNode
+        :param block_hash: The hash of the block
+        :type block_hash: bytes
+        :param partial: The block that is being rebuilt
+        :type partial: PartialBlock
+        :param sender: The address of the peer that sent the compact block
+        :type sender: str
+        :param connection: The connection to request the missing records on
+        :type connection: Connection
+        """
+        missing = partial.missing()
+
+        if not missing:
+            block = partial.build()
+
+            if block is not None:
+                await self._receive_block(block, sender)
+                return
+
+            missing = list(range(len(partial.records)))
+            partial.records = [None] * len(partial.records)
+
+        self.partial_blocks[block_hash] = partial
+
+        # A peer that never delivers does not keep the block, another announcement requests it again.
+        asyncio.get_running_loop().call_later(
+            self.PEER_TIMEOUT, self.partial_blocks.pop, block_hash, None
         )
 
-        await writer.drain()
+        await connection.send(
+            {
+                "type": "getblocktxn",
+                "block_hash": block_hash,
+                "indexes": missing,
+                "me": f"{self.host}:{self.port}",
+            }
+        )
+
+    async def _handle_get_blocks(self, msg: dict, connection: Connection):
+        """
+        Handle a "get_blocks" message of a peer that pulls the blocks it is missing.
+        The reply is capped by size as well, so it always fits into a frame. It carries at least one block.
+
+        :param self: Instance of PeerNode
+        :param msg: The "get_blocks" message containing the first height and the number of requested blocks
+        :type msg: dict
+        :param connection: The connection to respond on
+        :type connection: Connection
+        """
+        start = int(msg["start"])
+        count = min(int(msg["count"]), self.MAX_BLOCKS_PER_MESSAGE)
+        blocks = []
+        size = 0
+
+        for _, block in self.blockchain.iter_blocks(start, start + count):
+            size += len(block)
+
+            if blocks and size > self.MAX_BLOCK_BYTES_PER_MESSAGE:
+                break
+
+            blocks.append(block)
+
+        await connection.reply(
+            msg, {"type": "blocks", "start": start, "blocks": blocks}
+        )
+
+    async def _handle_get_tip(self, msg: dict, connection: Connection):
+        """
+        Handle a "get_tip" message of a peer that starts an initial block download.
+
+        :param self: Instance of PeerNode
+        :param msg: The "get_tip" message
+        :type msg: dict
+        :param connection: The connection to respond on
+        :type connection: Connection
+        """
+        await connection.reply(
+            msg,
+            {
+                "type": "tip",
+                "height": self.blockchain.tip_height,
+                "block_hash": self.blockchain.tip_hash or bytes(32),
+            },
+        )
+
+    async def _handle_get_mempool_stats(self, msg: dict, connection: Connection):
+        """
+        Handle a "get_mempool_stats" message of a monitoring client with the fill level and the counters of the mempool.
+
+        :param self: Instance of PeerNode
+        :param msg: The "get_mempool_stats" message
+        :type msg: dict
+        :param connection: The connection to respond on
+        :type connection: Connection
+        """
+        await connection.reply(msg, {"type": "mempool_stats", **self.mempool.stats()})
+
+    async def _handle_get_headers(self, msg: dict, connection: Connection):
+        """
+        Handle a "get_headers" message from a light client or peer. The node responds with the packed block headers
+        starting at the requested height, so the requester can verify the header chain without any payload.
+
+        :param self: Instance of PeerNode
+        :param msg: The "get_headers" message containing the first height and the number of requested headers
+        :type msg: dict
+        :param connection: The connection to respond on
+        :type connection: Connection
+        """
+        start = int(msg["start"])
+        count = min(int(msg["count"]), self.MAX_HEADERS_PER_MESSAGE)
+
+        await connection.reply(
+            msg,
+            {
+                "type": "headers",
+                "start": start,
+                "headers": [
+                    header
+                    for _, header in self.blockchain.iter_headers(start, start + count)
+                ],
+            },
+        )
+
+    async def _handle_get_record_proof(self, msg: dict, connection: Connection):
+        """
+        Handle a "get_record_proof" message from a light client. The node responds with the record of the deployment
+        with the requested Merkle root and its Merkle inclusion proof against the header of its block.
+
+        :param self: Instance of PeerNode
+        :param msg: The "get_record_proof" message containing the Merkle root of the deployment
+        :type msg: dict
+        :param connection: The connection to respond on
+        :type connection: Connection
+        """
+        proof = self.blockchain.get_record_proof(msg["merkle_root"])
+
+        if proof is None:
+            await connection.reply(msg, {"type": "record_proof", "status": "not_found"})
+
+            return
+
+        height, index, payload, signature, siblings = proof
+
+        await connection.reply(
+            msg,
+            {
+                "type": "record_proof",
+                "status": "success",
+                "height": height,
+                "index": index,
+                "record": payload,
+                "signature": signature,
+                "proof": siblings,
+            },
+        )
 
     def _update_own_peer_list(self, msg: dict):
         """
@@ -154,41 +1086,26 @@ class PeerNode:
         :param msg: The "hello" message received from a peer, containing the sender's address and their known peers
         :type msg: dict
         """
-        self.peers.update(
-            [peer for peer in msg["peers"] if peer != f"{self.host}:{self.port}"]
-            + [msg["me"]]
-        )  # We don't want to add ourselfs as a peer but we want to add the sender
+        # We don't want to add ourselfs as a peer but we want to add the sender
+        for peer in msg["peers"] + [msg["me"]]:
+            if peer != f"{self.host}:{self.port}":
+                self.address_book.add(peer)
 
-    async def _send_own_peer_list(
-        self, writer: StreamWriter, type: str, peers: list[str], me: str
-    ):
+    def _peer_list_message(self, type: str, peers: list[str], me: str) -> dict:
         """
-        Send the node's own peer list back to the sender of the "hello" message.
+        Build a message with the node's own peer list.
 
         :param self: Instance of PeerNode
-        :param writer: StreamWriter object to send data to the client
-        :type writer: StreamWriter
         :param type: The type of the message to send (e.g., "peer_list" or "hello")
         :type type: str
         :param peers: The list of known peers to include in the message
         :type peers: list[str]
         :param me: The address of the current node to include in the message
         :type me: str
+        :return: The message
+        :rtype: dict
         """
-        writer.write(
-            (
-                json.dumps(
-                    {
-                        "type": type,
-                        "peers": peers,
-                        "me": me,
-                    }
-                )
-                + "\n"  # Note: the newline is important to signal the end of the message for readline()
-            ).encode()
-        )
-
-        await writer.drain()
+        return {"type": type, "peers": peers, "me": me}
 
     async def _broadcast_new_peer(self, msg: dict):
         """
@@ -198,60 +1115,603 @@ class PeerNode:
         :param msg: The "hello" message received from a peer, containing the sender's address and their known peers
         :type msg: dict
         """
-        for peer in self.peers - {
-            msg["me"]
-        }:  # We don't want to contact the sender again. He already has received our peer list.
-            if (
-                peer not in self.connected_peers
-            ):  # We don't contact peers we have already contacted. This prevents infinite loops of contacting the same peers again and again.
-                await self.connect_to_peer(peer)
+        # We don't want to contact the sender again. He already has received our peer list.
+        await self._connect_to_peers(
+            [peer for peer in self.address_book if peer != msg["me"]]
+        )
+
+    async def _connect_to_peers(self, peers: list[str]):
+        """
+        Connect to all given peers concurrently, skipping peers that are already contacted.
+        This prevents infinite loops of contacting the same peers again and again.
+
+        :param self: Instance of PeerNode
+        :param peers: The addresses of the peers to connect to
+        :type peers: list[str]
+        """
+        await asyncio.gather(
+            *(
+                self.connect_to_peer(peer)
+                for peer in peers
+                if not self.address_book.is_contacted(peer)
+            )
+        )
 
     async def connect_to_peer(self, peer: str):
         """
-        Connect to a peer and exchange peer lists.
+        Connect to a peer, exchange peer lists and connect to the newly discovered peers concurrently.
+        The exchange is bounded by a timeout and retried with exponential backoff, so a dead peer only
+        delays its own branch of the discovery. A peer that never answers is given up and loses liveness score.
 
         :param self: Instance of PeerNode
         :param peer: The address of the peer to connect to
         :type peer: str
         """
+        if peer in self.dialing:
+            return
+
+        self.address_book.add(peer)
+        self.dialing.add(peer)
+
+        try:
+            for attempt in range(self.DIAL_ATTEMPTS):
+                try:
+                    async with self.dial_semaphore:
+                        peer_list = await asyncio.wait_for(
+                            self._exchange_peers(peer), self.PEER_TIMEOUT
+                        )
+
+                    break
+                except (OSError, asyncio.TimeoutError) as e:
+                    await self._drop_connection(peer)
+
+                    if attempt == self.DIAL_ATTEMPTS - 1:
+                        print(f"Giving up on {peer}: {e!r}")
+                        self._mark_failed(peer)
+                        return
+
+                    await asyncio.sleep(self.RETRY_BACKOFF * 2**attempt)
+        finally:
+            self.dialing.discard(peer)
+
+        me = f"{self.host}:{self.port}"
+        self.address_book.mark_alive(peer)
+
+        # We don't want to add ourselfs as a peer
+        new_peers = [p for p in peer_list if p != me and self.address_book.add(p)]
+
+        # Connect to newly discovered peers
+        await self._connect_to_peers(new_peers)
+
+    async def _exchange_peers(self, peer: str) -> list[str]:
+        """
+        Send a "hello" message with the peers added to the address book since the last exchange with a peer,
+        and return the peers of its response, which are the ones it added since the last exchange as well.
+
+        :param self: Instance of PeerNode
+        :param peer: The address of the peer
+        :type peer: str
+        :return: The peers the peer added since the last exchange
+        :rtype: list[str]
+        """
         print(f"Hello {peer} 👋")
         self._log_greeting(f"{self.host}:{self.port}", peer, f"Hello {peer} 👋")
 
-        peers_without_target_peer = [p for p in self.peers if p != peer]
+        sent = self.address_book.get(peer).sent
+        sequence = self.address_book.sequence
+        new_peers = self.address_book.added_since(sent or 0, exclude=peer)
 
         print(
-            f"I also know these peers: {peers_without_target_peer}"
-            if peers_without_target_peer
-            else "I don't know any peers yet."
+            f"I also know these new peers: {new_peers}"
+            if new_peers
+            else "I don't know new peers."
         )
 
-        host, port = peer.split(":")
-        reader, writer = await asyncio.open_connection(host, int(port))
         me = f"{self.host}:{self.port}"
-        await self._send_own_peer_list(writer, "hello", peers_without_target_peer, me)
-        data = await reader.readline()
-        msg = json.loads(data.decode())
-        old_peers = self.peers.copy()
+        connection = await self._get_connection(peer)
+
+        # The hello offers the binary wire protocol. Old peers ignore the offer and the connection keeps JSON lines.
+        msg = await connection.request(
+            {
+                **self._peer_list_message("hello", new_peers, me),
+                "full": sent is None,
+                "wire": WIRE_VERSION,
+            }
+        )
 
-        self.peers.update(
-            p for p in msg["peers"] if p != me
-        )  # We don't want to add ourselfs as a peer
+        entry = self.address_book.get(peer)
 
-        writer.close()
-        self.connected_peers.add(peer)
+        # Old peers answer without a "full" field and expect the full peer list every time.
+        if entry is not None:
+            entry.sent = None if "full" not in msg or msg["resync"] else sequence
 
-        # Connect to newly discovered peers
-        new_peers = self.peers - old_peers
+        return msg["peers"]
+
+    async def _exchange_peers_periodically(self):
+        """
+        Exchange peer lists with random known peers in a fixed interval and evict stale peers before.
+        Random peers spread the liveness checks over the whole address book.
+        A failed round is logged, so the exchanges go on in the next interval.
+
+        :param self: Instance of PeerNode
+        """
+        while True:
+            await asyncio.sleep(self.PEER_EXCHANGE_INTERVAL)
+
+            try:
+                for peer in self.address_book.evict_stale():
+                    self.known_inventory.pop(peer, None)
+                    await self._drop_connection(peer)
+
+                peers = list(self.address_book)
+
+                await asyncio.gather(
+                    *(
+                        self.connect_to_peer(peer)
+                        for peer in random.sample(
+                            peers, min(len(peers), self.PEER_EXCHANGE_FANOUT)
+                        )
+                    )
+                )
+            except Exception as e:
+                print(f"Exchanging peers failed: {e!r}")
+
+    async def sync(self):
+        """
+        Download the blocks the node is missing with a headers-first initial block download.
+        The header chain is downloaded from the peer with the highest tip and verified first. Then the bodies
+        are fetched in windows from all peers that have the whole chain at once, checked against the headers
+        and written in batches. A failed download leaves the rest to the periodic pull.
+
+        :param self: Instance of PeerNode
+        """
+        peers = self._contacted_peers()
+        tips = await asyncio.gather(*[self._request_tip(peer) for peer in peers])
+        tips = {peer: tip for peer, tip in zip(peers, tips) if tip is not None}
+
+        if not tips:
+            return
+
+        source = max(tips, key=lambda peer: tips[peer][0])
+        tip_height, tip_hash = tips[source]
+        start = self.blockchain.head_height + 1
+
+        if tip_height < start:
+            return
+
+        self.syncing = True
+
+        try:
+            headers = await self._download_headers(source, start, tip_height)
+
+            if len(headers) < tip_height - start + 1:
+                # The source has fewer blocks than it announced, so the hash of its last header is unknown.
+                tip_hash = (
+                    Block.parse_header(headers.pop()).previous_hash if headers else None
+                )
+
+            if not headers:
+                return
+
+            if verify_header_chain(
+                self.blockchain.head_hash or bytes(32), headers
+            ) < len(headers):
+                print(f"The header chain of {source} is invalid.")
+                self._mark_failed(source)
+                return
+
+            download = BlockDownload(
+                start,
+                headers,
+                tip_hash,
+                self.MAX_BLOCKS_PER_MESSAGE,
+                self.SYNC_STALL_TIMEOUT,
+            )
+            target = start + len(headers) - 1
+
+            await asyncio.gather(
+                *[
+                    self._download_blocks(peer, download)
+                    for peer, (height, _) in tips.items()
+                    if height >= target
+                ]
+            )
+
+            print(
+                f"Downloaded {self.blockchain.tip_height - start + 1} of {len(headers)} blocks."
+            )
+        except (OSError, asyncio.TimeoutError, ValueError, struct.error) as e:
+            print(f"Downloading the headers from {source} failed: {e!r}")
+            self._mark_failed(source)
+            await self._drop_connection(source)
+        finally:
+            self.syncing = False
+
+    async def _request_tip(self, peer: str) -> tuple[int, bytes] | None:
+        """
+        Request the height and hash of the latest block of a peer.
+
+        :param self: Instance of PeerNode
+        :param peer: The address of the peer
+        :type peer: str
+        :return: The (height, hash) of the tip or None if the peer did not answer
+        :rtype: tuple[int, bytes] | None
+        """
+        try:
+            connection = await self._get_connection(peer)
+            msg = await asyncio.wait_for(
+                connection.request({"type": "get_tip"}), self.PEER_TIMEOUT
+            )
+            return msg["height"], msg["block_hash"]
+        except (OSError, asyncio.TimeoutError, KeyError):
+            return None
+
+    async def _download_headers(self, peer: str, start: int, stop: int) -> list[bytes]:
+        """
+        Download the headers of a height range from a peer.
+
+        :param self: Instance of PeerNode
+        :param peer: The address of the peer
+        :type peer: str
+        :param start: The height of the first header
+        :type start: int
+        :param stop: The height of the last header
+        :type stop: int
+        :return: The headers, fewer if the peer has fewer blocks
+        :rtype: list[bytes]
+        """
+        headers = []
+
+        while start + len(headers) <= stop:
+            connection = await self._get_connection(peer)
+            msg = await asyncio.wait_for(
+                connection.request(
+                    {
+                        "type": "get_headers",
+                        "start": start + len(headers),
+                        "count": min(
+                            self.MAX_HEADERS_PER_MESSAGE,
+                            stop - start - len(headers) + 1,
+                        ),
+                    }
+                ),
+                self.PEER_TIMEOUT,
+            )
+
+            page = msg.get("headers")
+
+            if not isinstance(page, list) or not all(
+                isinstance(header, bytes) for header in page
+            ):
+                raise ValueError(f"{peer} sent malformed headers.")
+
+            if not page:
+                break
+
+            headers.extend(page)
+
+        return headers[: stop - start + 1]
+
+    async def _download_blocks(self, peer: str, download: BlockDownload):
+        """
+        Download block windows from a peer until all blocks are downloaded. A peer that fails, sends
+        invalid blocks or whose blocks cannot be verified gives its window back to the other peers and stops.
+
+        :param self: Instance of PeerNode
+        :param peer: The address of the peer
+        :type peer: str
+        :param download: The state of the download
+        :type download: BlockDownload
+        """
+        while self.syncing and not download.is_done():
+            window = download.next_window(peer, time.monotonic())
+
+            if window is None:
+                await asyncio.sleep(self.SYNC_POLL_INTERVAL)
+                continue
+
+            try:
+                connection = await self._get_connection(peer)
+                msg = await asyncio.wait_for(
+                    connection.request(
+                        {
+                            "type": "get_blocks",
+                            "start": window,
+                            "count": download.window_count(window),
+                        }
+                    ),
+                    self.PEER_TIMEOUT,
+                )
+            except (OSError, asyncio.TimeoutError) as e:
+                print(f"Downloading blocks from {peer} failed: {e!r}")
+                download.fail(window, peer)
+                self._mark_failed(peer)
+                await self._drop_connection(peer)
+                return
+
+            blocks = msg.get("blocks")
+
+            try:
+                valid = (
+                    isinstance(blocks, list)
+                    and await self._verify_blocks(blocks)
+                    and download.complete(window, peer, blocks, time.monotonic())
+                )
+            except BrokenExecutor as e:
+                # The peer is not to blame, so only the window is given back to the other peers.
+                print(f"Verifying the blocks from {peer} failed: {e!r}")
+                download.fail(window, peer)
+                return
+
+            if not valid:
+                print(f"{peer} sent invalid blocks.")
+                download.fail(window, peer)
+                self._mark_failed(peer)
+                return
+
+            self._append_downloaded_blocks(download.take_ready())
+
+    def _append_downloaded_blocks(self, blocks: list[bytes]):
+        """
+        Write downloaded blocks in one batch. The download stops if the chain changed in the meantime,
+        e.g. because the node built a block of its own.
+
+        :param self: Instance of PeerNode
+        :param blocks: The downloaded blocks in height order
+        :type blocks: list[bytes]
+        """
+        if not blocks:
+            return
+
+        if (
+            self.blockchain.head_height != self.blockchain.tip_height
+            or Block.from_bytes(blocks[0]).previous_hash
+            != (self.blockchain.tip_hash or bytes(32))
+        ):
+            self.syncing = False
+            return
+
+        self.blockchain.add_blocks(blocks)
+
+        for block in blocks:
+            self._accept_block(Block.calculate_hash(block), Block.from_bytes(block))
+
+    async def _pull_periodically(self):
+        """
+        Pull the blocks after the local chain from a random peer in a fixed interval.
+        Pulls repair pushes that were lost or went to other peers, and cost a single request when the chains match.
+        A failed pull is logged, so the pulls go on in the next interval.
+
+        :param self: Instance of PeerNode
+        """
+        while True:
+            await asyncio.sleep(self.GOSSIP_PULL_INTERVAL)
+            peers = self.gossip.select_peers(self._contacted_peers())
+
+            if not peers:
+                continue
+
+            try:
+                await self._pull(peers[0])
+            except Exception as e:
+                print(f"Pulling from {peers[0]} failed: {e!r}")
+
+    async def _pull(self, peer: str):
+        """
+        Pull the blocks after the local chain from a peer until it has no more blocks that extend the chain.
+        Only one pull per peer runs at a time.
+
+        :param self: Instance of PeerNode
+        :param peer: The address of the peer
+        :type peer: str
+        """
+        if peer in self.pulling or self.syncing:
+            return
+
+        self.pulling.add(peer)
+
+        try:
+            while True:
+                connection = await self._get_connection(peer)
+
+                msg = await asyncio.wait_for(
+                    connection.request(
+                        {
+                            "type": "get_blocks",
+                            "start": self.blockchain.head_height + 1,
+                            "count": self.MAX_BLOCKS_PER_MESSAGE,
+                        }
+                    ),
+                    self.PEER_TIMEOUT,
+                )
+
+                appended = [await self._receive_block(block) for block in msg["blocks"]]
+
+                # Replies are capped by size, so only an empty reply shows that the peer has no more blocks.
+                if not msg["blocks"] or not all(appended):
+                    return
+        except (OSError, asyncio.TimeoutError) as e:
+            print(f"Pulling from {peer} failed: {e!r}")
+            self._mark_failed(peer)
+            await self._drop_connection(peer)
+        finally:
+            self.pulling.discard(peer)
+
+    async def _announce(
+        self,
+        block_hashes: list[bytes] | None = None,
+        record_ids: list[bytes] | None = None,
+    ):
+        """
+        Announce new blocks and records with an "inv" message to random peers that are not known to have them.
+        The peers request the items they miss with "getdata", so no body is sent to a peer that already has it.
+
+        :param self: Instance of PeerNode
+        :param block_hashes: The hashes of the new blocks
+        :type block_hashes: list[bytes] | None
+        :param record_ids: The Merkle leaves of the new records
+        :type record_ids: list[bytes] | None
+        """
+        block_hashes = block_hashes or []
+        record_ids = record_ids or []
+        item_ids = block_hashes + record_ids
+
+        candidates = [
+            peer
+            for peer in self._contacted_peers()
+            if not all(item_id in self._known_inventory(peer) for item_id in item_ids)
+        ]
+
+        msg = {
+            "type": "inv",
+            "me": f"{self.host}:{self.port}",
+            "block_hashes": block_hashes,
+            "record_ids": record_ids,
+        }
+
+        peers = self.gossip.select_peers(candidates)
+
+        for peer in peers:
+            for item_id in item_ids:
+                self._known_inventory(peer).add(item_id)
+
+        await asyncio.gather(*(self._send_to_peer(peer, msg) for peer in peers))
+
+    async def _send_to_peer(self, peer: str, msg: dict):
+        """
+        Send a message to a peer without waiting for a response. A peer that cannot be reached loses liveness score.
+
+        :param self: Instance of PeerNode
+        :param peer: The address of the peer
+        :type peer: str
+        :param msg: The message to send
+        :type msg: dict
+        """
+        try:
+            connection = await asyncio.wait_for(
+                self._get_connection(peer), self.PEER_TIMEOUT
+            )
+
+            await asyncio.wait_for(connection.send(msg), self.PEER_TIMEOUT)
+        except (OSError, asyncio.TimeoutError):
+            self._mark_failed(peer)
+            await self._drop_connection(peer)
+
+    def _known_inventory(self, peer: str) -> SeenCache:
+        """
+        Return the IDs of the blocks and records a peer is known to have, because it announced,
+        sent or requested them, or because they were announced to it.
+
+        :param self: Instance of PeerNode
+        :param peer: The address of the peer
+        :type peer: str
+        :return: The known inventory of the peer
+        :rtype: SeenCache
+        """
+        known = self.known_inventory.get(peer)
+
+        if known is None:
+            known = self.known_inventory[peer] = SeenCache(
+                self.KNOWN_INVENTORY_CAPACITY
+            )
+
+        return known
+
+    def _contacted_peers(self) -> list[str]:
+        """
+        Return the known peers that have answered at least once.
+
+        :param self: Instance of PeerNode
+        :return: The addresses of the peers
+        :rtype: list[str]
+        """
+        return [
+            peer for peer in self.address_book if self.address_book.is_contacted(peer)
+        ]
+
+    def _record_message(self, payload: bytes, signature: bytes) -> dict:
+        """
+        Build a "record" message that pushes a deployment record to peers.
+
+        :param self: Instance of PeerNode
+        :param payload: The payload of the record
+        :type payload: bytes
+        :param signature: The signature of the record
+        :type signature: bytes
+        :return: The message
+        :rtype: dict
+        """
+        return {"type": "record", "record": payload, "signature": signature}
+
+    def _spawn(self, coroutine):
+        """
+        Run a coroutine in the background and keep a reference to its task until it is done.
+
+        :param self: Instance of PeerNode
+        :param coroutine: The coroutine to run
+        """
+        task = asyncio.create_task(coroutine)
+        self.background_tasks.add(task)
+        task.add_done_callback(self.background_tasks.discard)
+
+    def _mark_failed(self, peer: str):
+        """
+        Lower the liveness score of a peer that did not answer. The next exchange with it sends the full peer list,
+        because it is unknown whether the peer received the last one.
+
+        :param self: Instance of PeerNode
+        :param peer: The address of the peer
+        :type peer: str
+        """
+        self.address_book.mark_failed(peer)
+        entry = self.address_book.get(peer)
+
+        if entry is not None:
+            entry.sent = None
+
+    async def _get_connection(self, peer: str) -> Connection:
+        """
+        Returns the open connection to a peer and opens a new one if there is none or the peer closed it.
+
+        :param self: Instance of PeerNode
+        :param peer: The address of the peer
+        :type peer: str
+        :return: The open connection to the peer
+        :rtype: Connection
+        """
+        connection = self.connections.get(peer)
+
+        if connection is None or connection.is_closed():
+            connection = await Connection.open(peer, self.handle_message)
+            existing = self.connections.get(peer)
+
+            # Another task opened a connection to the peer in the meantime, so the new one is not needed.
+            if existing is not None and not existing.is_closed():
+                await connection.close()
+                return existing
+
+            self.connections[peer] = connection
+
+        return connection
+
+    async def _drop_connection(self, peer: str):
+        """
+        Close and forget the connection to a peer, so the next exchange opens a fresh one.
+
+        :param self: Instance of PeerNode
+        :param peer: The address of the peer
+        :type peer: str
+        """
+        connection = self.connections.pop(peer, None)
 
-        for new_peer in new_peers:
-            if new_peer not in self.connected_peers:
-                print(f"Hello {new_peer} 👋")
-                await self.connect_to_peer(new_peer)
+        if connection is not None:
+            await connection.close()
 
     def close(self):
-        """Close resources like the LevelDB handle."""
-        # self.blockchain.close()
-        # TODO: Activate the code
+        """Close resources like the LevelDB handle, the mempool log and the signature verification workers."""
+        self.verifier.close()
+        self.mempool_log.close()
+        self.blockchain.close()
 
     # TODO: Remove this logging method. It is only for demonstration purposes to show the greetings in the log files.
     def _log_greeting(self, sender: str, receiver: str, message: str):
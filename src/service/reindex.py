@@ -0,0 +1,279 @@
+import argparse
+import heapq
+import os
+import time
+import traceback
+
+from concurrent.futures import Future, ProcessPoolExecutor
+from pathlib import Path
+from typing import Callable, Iterator
+from plyvel import DB
+from block import Block
+from blockchain import (
+    DERIVED_PREFIXES,
+    SCHEMA_VERSION,
+    index_entries,
+    iter_blocks,
+    read_schema_version,
+)
+
+
+def reindex(
+    path: Path,
+    workers: int | None = None,
+    chunk_size: int = 1000,
+    batch_size: int = 100000,
+    progress: Callable[[str, int, float], None] | None = None,
+) -> int:
+    """
+    Drops all derived keyspaces of a database and rebuilds them from the raw blocks.
+    The blocks are read with one sequential scan, their index entries are extracted in a process pool,
+    and the sorted runs of the workers are merged and bulk loaded in key order with large write batches.
+    The peer node must be stopped, because LevelDB allows only one process to open the database.
+
+    :param path: Path to the LevelDB database
+    :type path: Path
+    :param workers: Number of worker processes or None for one per CPU
+    :type workers: int | None
+    :param chunk_size: Number of blocks sent to a worker at once
+    :type chunk_size: int
+    :param batch_size: Number of index entries per write batch
+    :type batch_size: int
+    :param progress: Called with the phase, the number of processed items and the elapsed seconds
+    :type progress: Callable[[str, int, float], None] | None
+    :return: The number of written index entries
+    :rtype: int
+    """
+    db = DB(str(path), create_if_missing=False)
+
+    try:
+        version = read_schema_version(db)
+
+        if version not in (None, SCHEMA_VERSION):
+            raise RuntimeError(
+                f"The database uses key schema version {version} but version {SCHEMA_VERSION} is required. Run migrate.py first."
+            )
+
+        _drop_derived_keyspaces(db, batch_size)
+        runs = _extract_runs(db, workers or os.cpu_count(), chunk_size, progress)
+        return _bulk_load(db, heapq.merge(*runs), batch_size, progress)
+    finally:
+        db.close()
+
+
+def _drop_derived_keyspaces(db: DB, batch_size: int):
+    """
+    Deletes all keys of the derived keyspaces.
+
+    :param db: The opened LevelDB database
+    :type db: DB
+    :param batch_size: Number of deletes per write batch
+    :type batch_size: int
+    """
+    for prefix in DERIVED_PREFIXES:
+        with db.iterator(prefix=prefix, include_value=False) as it:
+            batch = db.write_batch()
+
+            for i, key in enumerate(it, 1):
+                batch.delete(key)
+
+                if i % batch_size == 0:
+                    batch.write()
+                    batch = db.write_batch()
+
+            batch.write()
+
+
+def _extract_runs(
+    db: DB,
+    workers: int,
+    chunk_size: int,
+    progress: Callable[[str, int, float], None] | None,
+) -> list[list[tuple[bytes, bytes]]]:
+    """
+    Streams the blocks in chunks to a process pool and collects the sorted index entries of every chunk.
+    At most two chunks per worker are in flight, so the scan never runs far ahead of the workers.
+
+    :param db: The opened LevelDB database
+    :type db: DB
+    :param workers: Number of worker processes
+    :type workers: int
+    :param chunk_size: Number of blocks sent to a worker at once
+    :type chunk_size: int
+    :param progress: Called with the phase, the number of processed blocks and the elapsed seconds
+    :type progress: Callable[[str, int, float], None] | None
+    :return: The sorted runs of index entries
+    :rtype: list[list[tuple[bytes, bytes]]]
+    """
+    started = time.monotonic()
+    runs = []
+    in_flight: list[Future] = []
+    processed = 0
+
+    def collect(future: Future):
+        nonlocal processed
+        run, blocks = future.result()
+        runs.append(run)
+        processed += blocks
+
+        if progress is not None:
+            progress("extract", processed, time.monotonic() - started)
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for chunk in _read_chunks(db, chunk_size):
+            if len(in_flight) >= 2 * workers:
+                collect(in_flight.pop(0))
+
+            in_flight.append(executor.submit(_extract_chunk, chunk))
+
+        for future in in_flight:
+            collect(future)
+
+    return runs
+
+
+def _read_chunks(db: DB, chunk_size: int) -> Iterator[list[tuple[int, bytes]]]:
+    """
+    Reads the blocks in height order with sequential scans and groups them into chunks.
+
+    :param db: The opened LevelDB database
+    :type db: DB
+    :param chunk_size: Number of blocks per chunk
+    :type chunk_size: int
+    :return: An iterator of chunks of (height, block) tuples
+    :rtype: Iterator[list[tuple[int, bytes]]]
+    """
+    chunk = []
+
+    for height, block_bytes in iter_blocks(db):
+        chunk.append((height, block_bytes))
+
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+
+    if chunk:
+        yield chunk
+
+
+def _extract_chunk(
+    chunk: list[tuple[int, bytes]],
+) -> tuple[list[tuple[bytes, bytes]], int]:
+    """
+    Extracts the index entries of a chunk of blocks. Runs in a worker process.
+
+    :param chunk: The (height, block) tuples of the chunk
+    :type chunk: list[tuple[int, bytes]]
+    :return: The sorted index entries and the number of blocks in the chunk
+    :rtype: tuple[list[tuple[bytes, bytes]], int]
+    """
+    run = []
+
+    for height, block_bytes in chunk:
+        run.extend(
+            index_entries(height, block_bytes, Block.calculate_hash(block_bytes))
+        )
+
+    run.sort()
+    return run, len(chunk)
+
+
+def _bulk_load(
+    db: DB,
+    entries: Iterator[tuple[bytes, bytes]],
+    batch_size: int,
+    progress: Callable[[str, int, float], None] | None,
+) -> int:
+    """
+    Writes the merged index entries in key order with large write batches.
+
+    :param db: The opened LevelDB database
+    :type db: DB
+    :param entries: The index entries in key order
+    :type entries: Iterator[tuple[bytes, bytes]]
+    :param batch_size: Number of index entries per write batch
+    :type batch_size: int
+    :param progress: Called with the phase, the number of written entries and the elapsed seconds
+    :type progress: Callable[[str, int, float], None] | None
+    :return: The number of written index entries
+    :rtype: int
+    """
+    started = time.monotonic()
+    written = 0
+    batch = db.write_batch()
+
+    for key, value in entries:
+        batch.put(key, value)
+        written += 1
+
+        if written % batch_size == 0:
+            batch.write()
+            batch = db.write_batch()
+
+            if progress is not None:
+                progress("load", written, time.monotonic() - started)
+
+    batch.write()
+
+    if progress is not None:
+        progress("load", written, time.monotonic() - started)
+
+    return written
+
+
+def _print_progress(phase: str, count: int, elapsed: float):
+    """
+    Prints the progress and throughput of a phase.
+
+    :param phase: The phase of the reindex
+    :type phase: str
+    :param count: The number of processed items
+    :type count: int
+    :param elapsed: The elapsed seconds of the phase
+    :type elapsed: float
+    """
+    unit = "blocks" if phase == "extract" else "entries"
+    rate = count / elapsed if elapsed > 0 else 0
+    print(f"{phase}: {count} {unit} ({rate:.0f} {unit}/s)")
+
+
+# The guard is required, because the worker processes import this module again on platforms that spawn processes.
+if __name__ == "__main__":
+    try:
+        parser = argparse.ArgumentParser()
+
+        parser.add_argument(
+            "--db",
+            type=Path,
+            help="Path to the LevelDB database",
+            default=Path("data") / "plockchain.db",
+        )
+
+        parser.add_argument(
+            "--workers", type=int, help="Number of worker processes", default=None
+        )
+
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            help="Number of index entries per write batch",
+            default=100000,
+        )
+
+        args = parser.parse_args()
+        print(f"Rebuilding the indexes of {args.db}...")
+
+        written = reindex(
+            args.db,
+            workers=args.workers,
+            batch_size=args.batch_size,
+            progress=_print_progress,
+        )
+
+        print(f"Wrote {written} index entries.")
+    except KeyboardInterrupt:
+        print("Reindex interrupted. Run it again to rebuild the indexes.")
+        exit(1)
+    except:
+        traceback.print_exc()
+        exit(1)
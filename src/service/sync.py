@@ -0,0 +1,318 @@
+import struct
+
+from block import Block, BlockHeader, ParsedBlock
+from collections import deque
+
+
+def verify_header_chain(previous_hash: bytes | None, headers: list[bytes]) -> int:
+    """
+    Verifies that headers link to each other starting at the given hash. Version 1 blocks are hashed
+    as a whole, so the link after a version 1 header can only be verified once its body is downloaded.
+
+    :param previous_hash: The hash the first header must link to, or None if it is unknown
+    :type previous_hash: bytes | None
+    :param headers: The packed headers in height order
+    :type headers: list[bytes]
+    :return: The number of leading headers that form a valid chain
+    :rtype: int
+    """
+    expected = previous_hash
+
+    for count, header in enumerate(headers):
+        try:
+            parsed = BlockHeader.from_bytes(header)
+        except struct.error:
+            return count
+
+        if len(header) != parsed.size or (
+            expected is not None and parsed.previous_hash != expected
+        ):
+            return count
+
+        expected = (
+            Block.calculate_hash(header)
+            if parsed.version >= Block.RECORDS_VERSION
+            else None
+        )
+
+    return len(headers)
+
+
+class PeerThroughput:
+    """
+    The download speed of a peer as an exponential moving average of the blocks per second of its windows.
+    """
+
+    SMOOTHING = 0.3
+
+    blocks_per_second: float | None  # None until the first window was downloaded
+
+    def __init__(self):
+        """
+        Initializes a PeerThroughput without any measurement.
+
+        :param self: Instance of PeerThroughput
+        """
+        self.blocks_per_second = None
+
+    def record(self, blocks: int, seconds: float):
+        """
+        Adds the measurement of a downloaded window.
+
+        :param self: Instance of PeerThroughput
+        :param blocks: The number of downloaded blocks
+        :type blocks: int
+        :param seconds: The time the download took
+        :type seconds: float
+        """
+        rate = blocks / max(seconds, 1e-6)
+
+        if self.blocks_per_second is None:
+            self.blocks_per_second = rate
+        else:
+            self.blocks_per_second += self.SMOOTHING * (rate - self.blocks_per_second)
+
+    def is_slower_than(self, other: "PeerThroughput") -> bool:
+        """
+        Compares two peers. A peer without a measurement is neither slower nor faster.
+
+        :param self: Instance of PeerThroughput
+        :param other: The throughput of the other peer
+        :type other: PeerThroughput
+        :return: True if both peers were measured and this one is slower
+        :rtype: bool
+        """
+        return (
+            self.blocks_per_second is not None
+            and other.blocks_per_second is not None
+            and self.blocks_per_second < other.blocks_per_second
+        )
+
+
+class BlockDownload:
+    """
+    The state of a headers-first block download. The verified headers fix the hash of every block,
+    so the bodies can be fetched in windows from many peers at once and checked one by one.
+    Fast peers take more windows, and a window that stalls at a slow peer is requested again from an idle one.
+    Completed windows are handed out in height order, so they can be written in batches.
+    """
+
+    start: int  # Height of the first downloaded block
+    headers: list[bytes]  # Verified headers of the downloaded blocks
+    tip_hash: bytes  # Hash of the last downloaded block
+    window_size: int
+    stall_timeout: (
+        float  # Seconds after which a window may be requested again from another peer
+    )
+    throughput: dict[str, PeerThroughput]  # Download speed by peer address
+    _queue: deque[int]  # Start heights of the windows nobody downloads yet
+    _in_flight: dict[
+        int, tuple[str, float]
+    ]  # (peer, start time) by window start height
+    _retried: set[int]  # Windows that were requested again from a second peer
+    _completed: dict[int, list[bytes]]  # Downloaded blocks by window start height
+    _next: int  # Height of the next block to hand out
+
+    def __init__(
+        self,
+        start: int,
+        headers: list[bytes],
+        tip_hash: bytes,
+        window_size: int = 100,
+        stall_timeout: float = 2.0,
+    ):
+        """
+        Initializes a BlockDownload for the blocks of verified headers.
+
+        :param self: Instance of BlockDownload
+        :param start: The height of the first block
+        :type start: int
+        :param headers: The verified headers of the blocks in height order
+        :type headers: list[bytes]
+        :param tip_hash: The hash of the last block, which the peer announced with its tip
+        :type tip_hash: bytes
+        :param window_size: The number of blocks requested at once
+        :type window_size: int
+        :param stall_timeout: Seconds after which a window may be requested again from another peer
+        :type stall_timeout: float
+        """
+        self.start = start
+        self.headers = headers
+        self.tip_hash = tip_hash
+        self.window_size = window_size
+        self.stall_timeout = stall_timeout
+        self.throughput = {}
+        self._queue = deque(range(start, start + len(headers), window_size))
+        self._in_flight = {}
+        self._retried = set()
+        self._completed = {}
+        self._next = start
+
+    def window_count(self, window: int) -> int:
+        """
+        Returns the number of blocks of a window. The rest of a window that a peer delivered only partly
+        is a window of its own, which ends where the original window ends.
+
+        :param self: Instance of BlockDownload
+        :param window: The start height of the window
+        :type window: int
+        :return: The number of blocks
+        :rtype: int
+        """
+        return min(
+            self.window_size - (window - self.start) % self.window_size,
+            self.start + len(self.headers) - window,
+        )
+
+    def next_window(self, peer: str, now: float) -> int | None:
+        """
+        Assigns the next window to a peer. If all windows are assigned, a window that stalls
+        at a slower peer is assigned a second time, and the first complete copy wins.
+
+        :param self: Instance of BlockDownload
+        :param peer: The address of the peer
+        :type peer: str
+        :param now: The monotonic time
+        :type now: float
+        :return: The start height of the window or None if there is nothing to do for the peer
+        :rtype: int | None
+        """
+        throughput = self.throughput.setdefault(peer, PeerThroughput())
+
+        if self._queue:
+            window = self._queue.popleft()
+            self._in_flight[window] = (peer, now)
+            return window
+
+        for window, (owner, started) in sorted(
+            self._in_flight.items(), key=lambda item: item[1][1]
+        ):
+            if (
+                owner != peer
+                and window not in self._retried
+                and now - started > self.stall_timeout
+                and not throughput.is_slower_than(self.throughput[owner])
+            ):
+                self._retried.add(window)
+                return window
+
+        return None
+
+    def complete(self, window: int, peer: str, blocks: list[bytes], now: float) -> bool:
+        """
+        Verifies the downloaded blocks of a window against their headers and hashes and stores them.
+        Peers cap their replies by size, so a reply may carry only the first blocks of the window.
+        The missing blocks are put back as a window of their own.
+
+        :param self: Instance of BlockDownload
+        :param window: The start height of the window
+        :type window: int
+        :param peer: The address of the peer that sent the blocks
+        :type peer: str
+        :param blocks: The downloaded blocks
+        :type blocks: list[bytes]
+        :param now: The monotonic time
+        :type now: float
+        :return: True if the blocks are valid, False if the window must be downloaded again
+        :rtype: bool
+        """
+        owner, started = self._in_flight.get(window, (peer, now))
+
+        if window in self._completed or window < self._next:
+            return True
+
+        if not 0 < len(blocks) <= self.window_count(window) or not all(
+            self._is_valid_block(window + offset, block)
+            for offset, block in enumerate(blocks)
+        ):
+            return False
+
+        self._in_flight.pop(window, None)
+        self._completed[window] = blocks
+
+        if len(blocks) < self.window_count(window):
+            self._queue.appendleft(window + len(blocks))
+
+        if owner == peer:
+            self.throughput[peer].record(len(blocks), now - started)
+
+        return True
+
+    def fail(self, window: int, peer: str):
+        """
+        Puts back a window that a peer did not deliver, unless another peer still downloads it.
+
+        :param self: Instance of BlockDownload
+        :param window: The start height of the window
+        :type window: int
+        :param peer: The address of the peer that failed
+        :type peer: str
+        """
+        if window in self._completed or window < self._next:
+            return
+
+        if window in self._retried:
+            self._retried.discard(window)
+
+            return
+
+        self._in_flight.pop(window, None)
+        self._queue.appendleft(window)
+
+    def take_ready(self) -> list[bytes]:
+        """
+        Hands out the downloaded blocks that directly follow the blocks handed out before.
+
+        :param self: Instance of BlockDownload
+        :return: The blocks in height order, possibly none
+        :rtype: list[bytes]
+        """
+        blocks = []
+
+        while self._next in self._completed:
+            window = self._completed.pop(self._next)
+            blocks.extend(window)
+            self._next += len(window)
+
+        return blocks
+
+    def is_done(self) -> bool:
+        """
+        Returns whether all blocks were handed out.
+
+        :param self: Instance of BlockDownload
+        :return: True if the download is complete
+        :rtype: bool
+        """
+        return self._next == self.start + len(self.headers)
+
+    def _is_valid_block(self, height: int, block: bytes) -> bool:
+        """
+        Checks that a block has its verified header, matching records and the hash the next block links to.
+
+        :param self: Instance of BlockDownload
+        :param height: The height of the block
+        :type height: int
+        :param block: The downloaded block
+        :type block: bytes
+        :return: True if the block is valid
+        :rtype: bool
+        """
+        index = height - self.start
+        header = self.headers[index]
+        expected_hash = (
+            BlockHeader.from_bytes(self.headers[index + 1]).previous_hash
+            if index + 1 < len(self.headers)
+            else self.tip_hash
+        )
+
+        try:
+            parsed = ParsedBlock(block)
+
+            return (
+                parsed.header == header
+                and parsed.has_valid_records_root()
+                and Block.calculate_hash(block) == expected_hash
+            )
+        except (struct.error, ValueError):
+            return False
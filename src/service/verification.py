@@ -0,0 +1,314 @@
+import asyncio
+import base58
+import multiprocessing
+
+from asyncio import Future
+from concurrent.futures import BrokenExecutor, Executor, ProcessPoolExecutor
+from cryptography.exceptions import InvalidSignature
+from cryptography.hazmat.primitives.asymmetric import ed25519
+from functools import partial
+from gossip import SeenCache
+from hashlib import sha256
+from indexes import decode_record
+from merkle import record_leaf
+
+
+def verify_record(payload: bytes, signature: bytes) -> bool:
+    """
+    Verifies the Ed25519 signature of a deployment record. The signer is the Base58 encoded public key
+    in the "address" field of the payload, and DeploymentRecord.serialize of the CLI signs the SHA-256 hash of the payload.
+
+    :param payload: The msgpack payload of the record
+    :type payload: bytes
+    :param signature: The signature of the record
+    :type signature: bytes
+    :return: True if the signature is valid
+    :rtype: bool
+    """
+    record = decode_record(payload)
+
+    if record is None or not isinstance(record.get("address"), str):
+        return False
+
+    try:
+        public_key = ed25519.Ed25519PublicKey.from_public_bytes(
+            base58.b58decode(record["address"])
+        )
+        public_key.verify(signature, sha256(payload).digest())
+    except (InvalidSignature, ValueError):
+        return False
+
+    return True
+
+
+def verify_batch(records: list[tuple[bytes, bytes]]) -> list[bool]:
+    """
+    Verifies the signatures of many records. Runs in the worker processes of the SignatureVerifier,
+    so it must stay a module-level function that can be pickled.
+
+    :param records: The (payload, signature) tuples of the records
+    :type records: list[tuple[bytes, bytes]]
+    :return: Whether each signature is valid, in the order of the records
+    :rtype: list[bool]
+    """
+    return [verify_record(payload, signature) for payload, signature in records]
+
+
+class SignatureVerifier:
+    """
+    Verifies record signatures in worker processes, so the event loop never runs the cryptography itself
+    and all cores share the work. Records that arrive together are collected into micro-batches,
+    which amortizes the cost of sending them to a worker over many records.
+    The leaves of valid records are cached, so a record that was verified when it was gossiped
+    is not verified again when it arrives inside a block. A leaf hashes the payload and the signature,
+    so a cached leaf never vouches for another signature of the same payload.
+    """
+
+    max_batch: int  # Number of records that are sent to a worker at once at most
+    max_delay: float  # Seconds a record waits for further records of its batch at most
+    workers: int | None  # Number of worker processes or None for one per core
+    verified: SeenCache  # Leaves of the records with a valid signature, least recently used ones are forgotten
+    # Created when the first batch is verified, and again after a worker died
+    _executor: Executor | None
+    _batch: list[tuple[bytes, bytes]]
+    _futures: list[Future]  # Futures of the records of the collected batch
+    _flush_handle: asyncio.TimerHandle | None
+
+    def __init__(
+        self,
+        max_batch: int = 64,
+        max_delay: float = 0.001,
+        workers: int | None = None,
+        cache_capacity: int = 100000,
+    ):
+        """
+        Initializes the SignatureVerifier. The worker processes are started when the first batch is verified.
+
+        :param self: Instance of SignatureVerifier
+        :param max_batch: Number of records that are sent to a worker at once at most
+        :type max_batch: int
+        :param max_delay: Seconds a record waits for further records of its batch at most
+        :type max_delay: float
+        :param workers: Number of worker processes or None for one per core
+        :type workers: int | None
+        :param cache_capacity: Number of verified record leaves that are remembered
+        :type cache_capacity: int
+        """
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.workers = workers
+        self.verified = SeenCache(cache_capacity)
+        self._executor = None
+        self._batch = []
+        self._futures = []
+        self._flush_handle = None
+
+    def start(self):
+        """
+        Starts the worker processes ahead of the first batch. Spawning a worker imports the cryptography again,
+        which would otherwise delay the first records and blocks.
+
+        :param self: Instance of SignatureVerifier
+        """
+        self._get_executor().submit(verify_batch, [])
+
+    async def verify(
+        self, payload: bytes, signature: bytes, leaf: bytes | None = None
+    ) -> bool:
+        """
+        Verifies the signature of a record in the next micro-batch, unless the record was verified before.
+
+        :param self: Instance of SignatureVerifier
+        :param payload: The msgpack payload of the record
+        :type payload: bytes
+        :param signature: The signature of the record
+        :type signature: bytes
+        :param leaf: The Merkle leaf of the record if it is already known
+        :type leaf: bytes | None
+        :return: True if the signature is valid
+        :rtype: bool
+        """
+        leaf = record_leaf(payload, signature) if leaf is None else leaf
+
+        if leaf in self.verified:
+            self.verified.add(leaf)
+            return True
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._batch.append((bytes(payload), bytes(signature)))
+        self._futures.append(future)
+
+        if len(self._batch) >= self.max_batch:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.max_delay, self._flush)
+
+        valid = await future
+
+        if valid:
+            self.verified.add(leaf)
+
+        return valid
+
+    async def verify_many(self, records: list[tuple[bytes, bytes]]) -> list[bool]:
+        """
+        Verifies the signatures of many records at once, e.g. the records of a block.
+        Only the records that were not verified before are split into batches that are verified in parallel.
+        If a worker died, the pool is replaced for the next call and the error is raised.
+
+        :param self: Instance of SignatureVerifier
+        :param records: The (payload, signature) tuples of the records
+        :type records: list[tuple[bytes, bytes]]
+        :return: Whether each signature is valid, in the order of the records
+        :rtype: list[bool]
+        """
+        leaves = [record_leaf(payload, signature) for payload, signature in records]
+        results = [leaf in self.verified for leaf in leaves]
+        unverified = [index for index, valid in enumerate(results) if not valid]
+
+        for leaf, valid in zip(leaves, results):
+            if valid:
+                self.verified.add(leaf)
+
+        if not unverified:
+            return results
+
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor()
+
+        try:
+            batches = await asyncio.gather(
+                *[
+                    loop.run_in_executor(
+                        executor,
+                        verify_batch,
+                        [
+                            (bytes(records[index][0]), bytes(records[index][1]))
+                            for index in unverified[i : i + self.max_batch]
+                        ],
+                    )
+                    for i in range(0, len(unverified), self.max_batch)
+                ]
+            )
+        except BrokenExecutor:
+            self._drop_executor(executor)
+            raise
+
+        for index, valid in zip(
+            unverified, [valid for batch in batches for valid in batch]
+        ):
+            results[index] = valid
+
+            if valid:
+                self.verified.add(leaves[index])
+
+        return results
+
+    def close(self):
+        """
+        Stops the worker processes. Records that wait for their batch are not verified.
+
+        :param self: Instance of SignatureVerifier
+        """
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        if self._executor is not None:
+            self._drop_executor(self._executor)
+
+    def _flush(self):
+        """
+        Sends the collected batch to a worker and resolves the futures of its records once it is verified.
+        If a worker died, the futures fail and the pool is replaced for the next batch.
+
+        :param self: Instance of SignatureVerifier
+        """
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        batch, self._batch = self._batch, []
+        futures, self._futures = self._futures, []
+
+        if not batch:
+            return
+
+        executor = self._get_executor()
+
+        try:
+            task = asyncio.get_running_loop().run_in_executor(
+                executor, verify_batch, batch
+            )
+        except BrokenExecutor as e:
+            self._drop_executor(executor)
+
+            for future in futures:
+                if not future.done():
+                    future.set_exception(e)
+
+            return
+
+        task.add_done_callback(partial(self._resolve_batch, executor, futures))
+
+    def _resolve_batch(self, executor: Executor, futures: list[Future], task: Future):
+        """
+        Resolves the futures of the records of a verified batch.
+
+        :param self: Instance of SignatureVerifier
+        :param executor: The pool that verified the batch
+        :type executor: Executor
+        :param futures: The futures of the records in the order of the batch
+        :type futures: list[Future]
+        :param task: The finished verification of the batch
+        :type task: Future
+        """
+        if task.cancelled():
+            for future in futures:
+                future.cancel()
+
+            return
+
+        if task.exception() is not None:
+            if isinstance(task.exception(), BrokenExecutor):
+                self._drop_executor(executor)
+
+            for future in futures:
+                if not future.done():
+                    future.set_exception(task.exception())
+
+            return
+
+        for future, valid in zip(futures, task.result()):
+            if not future.done():
+                future.set_result(valid)
+
+    def _drop_executor(self, executor: Executor):
+        """
+        Stops a pool, e.g. one with a dead worker, so the next batch starts a new one.
+
+        :param self: Instance of SignatureVerifier
+        :param executor: The pool to stop
+        :type executor: Executor
+        """
+        executor.shutdown(wait=False, cancel_futures=True)
+
+        if self._executor is executor:
+            self._executor = None
+
+    def _get_executor(self) -> Executor:
+        """
+        Returns the pool of worker processes and starts it if necessary.
+
+        :param self: Instance of SignatureVerifier
+        :return: The pool
+        :rtype: Executor
+        """
+        if self._executor is None:
+            # Spawned workers behave the same on all platforms and never inherit the threads of the node.
+            self._executor = ProcessPoolExecutor(
+                self.workers, mp_context=multiprocessing.get_context("spawn")
+            )
+
+        return self._executor
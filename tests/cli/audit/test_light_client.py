@@ -0,0 +1,100 @@
+import asyncio
+import pytest
+import struct
+
+from hashlib import sha256
+from audit.light_client import LightClient
+from tests.helpers import signed_record
+
+
+def _header(previous_hash, records_root):
+    return struct.pack(
+        LightClient.HEADER_FORMAT, 2, 0, 0, 0, previous_hash, records_root
+    )
+
+
+def _light_client(monkeypatch, tmp_path, responses):
+    monkeypatch.setattr(
+        LightClient, "_headers_path", lambda self: tmp_path / "headers.bin"
+    )
+    light_client = LightClient()
+    requests = []
+
+    async def fake_request(msg):
+        requests.append(msg)
+        return responses.pop(0)
+
+    monkeypatch.setattr(light_client, "_request", fake_request)
+    return light_client, requests
+
+
+def test_sync_headers_stores_linked_headers(monkeypatch, tmp_path):
+    first = _header(bytes(32), bytes(32))
+    second = _header(sha256(first).digest(), bytes(32))
+    responses = [{"headers": [first, second]}]
+    light_client, requests = _light_client(monkeypatch, tmp_path, responses)
+    assert asyncio.run(light_client.sync_headers()) == 2
+    assert requests[0]["start"] == 0
+    assert LightClient().headers == [first, second]
+
+
+def test_sync_headers_rejects_unlinked_headers(monkeypatch, tmp_path):
+    first = _header(bytes(32), bytes(32))
+    second = _header(bytes(32), bytes(32))
+    light_client, _ = _light_client(
+        monkeypatch, tmp_path, [{"headers": [first, second]}]
+    )
+
+    with pytest.raises(ValueError):
+        asyncio.run(light_client.sync_headers())
+
+
+def test_verify_deployment_checks_proof_and_signature(monkeypatch, tmp_path):
+    payload, signature = signed_record("a" * 64)
+    leaf = sha256(
+        b"\x00" + len(payload).to_bytes(4, "big") + payload + signature
+    ).digest()
+    sibling = sha256(b"other").digest()
+    header = _header(bytes(32), sha256(b"\x01" + leaf + sibling).digest())
+    proof = {
+        "status": "success",
+        "height": 0,
+        "index": 0,
+        "record": payload,
+        "signature": signature,
+        "proof": [sibling],
+    }
+
+    light_client, _ = _light_client(
+        monkeypatch, tmp_path, [{"headers": [header]}, proof]
+    )
+    asyncio.run(light_client.sync_headers())
+    record = asyncio.run(light_client.verify_deployment("a" * 64))
+    assert record["height"] == 0
+    assert record["merkle_root"] == "a" * 64
+
+
+def test_verify_deployment_rejects_proof_for_another_root(monkeypatch, tmp_path):
+    payload, signature = signed_record("a" * 64)
+    header = _header(bytes(32), sha256(b"other").digest())
+    proof = {
+        "status": "success",
+        "height": 0,
+        "index": 0,
+        "record": payload,
+        "signature": signature,
+        "proof": [],
+    }
+
+    light_client, _ = _light_client(
+        monkeypatch, tmp_path, [{"headers": [header]}, proof]
+    )
+    asyncio.run(light_client.sync_headers())
+
+    with pytest.raises(ValueError):
+        asyncio.run(light_client.verify_deployment("a" * 64))
+
+
+def test_verify_deployment_returns_none_when_not_recorded(monkeypatch, tmp_path):
+    light_client, _ = _light_client(monkeypatch, tmp_path, [{"status": "not_found"}])
+    assert asyncio.run(light_client.verify_deployment("a" * 64)) is None
@@ -0,0 +1,87 @@
+import asyncio
+import json
+import pytest
+
+from common.connection import Connection, encode_message, read_message
+
+
+async def _serve(handle_client, run):
+    server = await asyncio.start_server(handle_client, "127.0.0.1", 0)
+
+    async with server:
+        return await run(f"127.0.0.1:{server.sockets[0].getsockname()[1]}")
+
+
+def test_binary_responses_in_any_order_complete_their_requests():
+    frames = []
+
+    async def handle_client(reader, writer):
+        offer = json.loads(await reader.readline())
+        writer.write(encode_message({"reply_to": offer["id"], "wire": 2}, 1))
+        first = await read_message(reader)
+        second = await read_message(reader)
+        frames.append(first)
+
+        for msg in (second, first):
+            writer.write(encode_message({"reply_to": msg["id"], **msg}, 2))
+
+        await writer.drain()
+        await reader.read()
+        writer.close()
+
+    async def run(address):
+        connection = await Connection.open(address)
+        await connection.request({"type": "get_mempool_stats"})
+        responses = await asyncio.gather(
+            connection.request({"record": b"\x00\x01"}),
+            connection.request({"record": b"\x02"}),
+        )
+        await connection.close()
+        return connection.wire, responses
+
+    wire, responses = asyncio.run(_serve(handle_client, run))
+    assert wire == 2
+    assert [msg["record"] for msg in responses] == [b"\x00\x01", b"\x02"]
+    assert frames[0]["record"] == b"\x00\x01"
+    assert "wire" not in frames[0]
+
+
+def test_service_without_binary_framing_keeps_json_lines():
+    requests = []
+
+    async def handle_client(reader, writer):
+        # Like a service from before the wire protocol, which would drop a hello without peer address.
+        for _ in range(2):
+            msg = json.loads(await reader.readline())
+            requests.append(msg)
+            response = {"reply_to": msg["id"], "proof": msg.get("proof", [])}
+            writer.write((json.dumps(response) + "\n").encode())
+
+        await reader.read()
+        writer.close()
+
+    async def run(address):
+        connection = await Connection.open(address)
+        await connection.request({"type": "get_headers"})
+        response = await connection.request({"proof": [b"\xff"]})
+        await connection.close()
+        return connection.wire, response
+
+    wire, response = asyncio.run(_serve(handle_client, run))
+    assert wire == 1
+    assert response["proof"] == [b"\xff"]
+    assert [msg.get("type") for msg in requests] == ["get_headers", None]
+    assert requests[0]["wire"] == 2 and "wire" not in requests[1]
+
+
+def test_closed_connection_fails_waiting_requests():
+    async def handle_client(reader, writer):
+        await reader.readline()
+        writer.close()
+
+    async def run(address):
+        connection = await Connection.open(address)
+        return await connection.request({"type": "get_headers"})
+
+    with pytest.raises(ConnectionError):
+        asyncio.run(_serve(handle_client, run))
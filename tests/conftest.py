@@ -4,13 +4,18 @@ from pathlib import Path
 
 
 # It sets PROJECT_ROOT to the project directory, appends the src/cli path to sys.path, and thereby enables imports like address.address.
+# The src/service path is appended as well to enable imports like blockchain of the service.
 
 PROJECT_ROOT = Path(__file__).resolve().parents[1]
 SRC_PATH = PROJECT_ROOT / "src" / "cli"
+SERVICE_SRC_PATH = PROJECT_ROOT / "src" / "service"
 
 if str(SRC_PATH) not in sys.path:
     sys.path.insert(0, str(SRC_PATH))
 
+if str(SERVICE_SRC_PATH) not in sys.path:
+    sys.path.append(str(SERVICE_SRC_PATH))
+
 
 from config.config import configure
 
@@ -1,4 +1,9 @@
+import base58
 import importlib
+import msgpack
+
+from cryptography.hazmat.primitives.asymmetric import ed25519
+from hashlib import sha256
 from types import ModuleType
 
 
@@ -17,3 +22,41 @@ def fake_method_call(method: str, return_value):
         return type("Dummy", (), {method: lambda self: return_value})()
 
     return method_call
+
+
+def deployment_record(merkle_root: str, address: str, **metadata) -> bytes:
+    """
+    Build the msgpack payload of a deployment record.
+
+    :param merkle_root: The Merkle root of the deployed files
+    :type merkle_root: str
+    :param address: The address of the signer
+    :type address: str
+    :param metadata: The metadata of the deployment
+    :return: The payload
+    :rtype: bytes
+    """
+    return msgpack.packb(
+        {
+            "version": "1",
+            "address": address,
+            "merkle_root": merkle_root,
+            "metadata": metadata,
+        },
+        use_bin_type=True,
+    )
+
+
+def signed_record(merkle_root: str) -> tuple[bytes, bytes]:
+    """
+    Build a deployment record of a new key pair and sign the SHA-256 hash of its payload like the CLI does.
+
+    :param merkle_root: The Merkle root of the deployed files
+    :type merkle_root: str
+    :return: The payload and the signature
+    :rtype: tuple[bytes, bytes]
+    """
+    private_key = ed25519.Ed25519PrivateKey.generate()
+    address = base58.b58encode(private_key.public_key().public_bytes_raw()).decode()
+    payload = deployment_record(merkle_root, address)
+    return payload, private_key.sign(sha256(payload).digest())
@@ -0,0 +1,40 @@
+from address_book import AddressBook
+
+
+def test_added_since_returns_the_delta():
+    book = AddressBook()
+    book.add("a:1")
+    sequence = book.sequence
+    book.add("b:1")
+    book.add("c:1")
+    assert not book.add("a:1")
+    assert book.added_since(0) == ["a:1", "b:1", "c:1"]
+    assert book.added_since(sequence, exclude="c:1") == ["b:1"]
+
+
+def test_full_book_evicts_the_lowest_score():
+    book = AddressBook(capacity=2)
+    book.add("a:1", now=0)
+    book.add("b:1", now=0)
+    book.mark_alive("a:1", now=1)
+    book.add("c:1", now=2)
+    assert set(book) == {"a:1", "c:1"}
+
+
+def test_failed_peer_is_evicted_before_a_fresh_one():
+    book = AddressBook(capacity=2)
+    book.add("a:1", now=1)
+    book.add("b:1", now=0)
+    book.mark_failed("a:1")
+    book.add("c:1", now=2)
+    assert set(book) == {"b:1", "c:1"}
+
+
+def test_evict_stale_removes_peers_without_sign_of_life():
+    book = AddressBook(stale_after=10)
+    book.add("a:1", now=0)
+    book.add("b:1", now=0)
+    book.mark_alive("b:1", now=15)
+    assert book.evict_stale(now=20) == ["a:1"]
+    assert list(book) == ["b:1"]
+    assert book.is_contacted("b:1")
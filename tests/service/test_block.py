@@ -0,0 +1,114 @@
+import pytest
+import struct
+
+from block import Block, BlockHeader, MultiRecordBlock, ParsedBlock
+from merkle import merkle_root, record_leaf
+
+
+def test_from_bytes_parses_header_payload_and_signature():
+    previous_hash = bytes(range(32))
+    block = Block(b"payload", b"signature", previous_hash).build()
+    parsed = Block.from_bytes(block)
+    assert parsed.version == 1
+    assert parsed.flags == 0
+    assert parsed.payload_length == len(b"payload")
+    assert parsed.previous_hash == previous_hash
+    assert parsed.payload == b"payload"
+    assert parsed.signature == b"signature"
+    assert bytes(parsed.header) + parsed.payload + parsed.signature == block
+
+
+def test_from_bytes_does_not_copy_the_payload():
+    block = bytearray(Block(b"payload", b"signature").build())
+    parsed = Block.from_bytes(block)
+    block[Block.HEADER_SIZE] = ord("P")
+    assert parsed.payload == b"Payload"
+
+
+def test_parse_header_reads_only_the_header():
+    block = Block(b"payload", b"signature").build()
+    header = Block.parse_header(block[: Block.HEADER_SIZE])
+    assert isinstance(header, BlockHeader)
+    assert header.payload_length == len(b"payload")
+    assert header.previous_hash == bytes(32)
+
+
+def test_parsed_blocks_have_no_instance_dict():
+    parsed = Block.from_bytes(Block(b"payload", b"signature").build())
+    assert isinstance(parsed, ParsedBlock)
+    assert not hasattr(parsed, "__dict__")
+
+
+def test_from_bytes_rejects_truncated_blocks():
+    block = Block(b"payload", b"signature").build()
+
+    with pytest.raises(ValueError):
+        Block.from_bytes(block[: Block.HEADER_SIZE + 3])
+
+
+def test_from_bytes_rejects_bytes_after_the_records():
+    block = MultiRecordBlock([(b"payload", b"signature")]).build()
+
+    with pytest.raises(ValueError):
+        Block.from_bytes(block + b"JUNK")
+
+
+def test_records_reject_a_payload_shorter_than_the_record_count():
+    header = struct.pack(
+        Block.RECORDS_HEADER_FORMAT,
+        Block.RECORDS_VERSION,
+        0,
+        0,
+        2,
+        bytes(32),
+        bytes(32),
+    )
+
+    with pytest.raises(ValueError):
+        Block.from_bytes(header + b"\x01\x00").records()
+
+
+def test_multi_record_block_commits_to_the_records_root():
+    records = [(f"payload{i}".encode(), f"signature{i}".encode()) for i in range(3)]
+    block = MultiRecordBlock(records, bytes(range(32))).build()
+    parsed = Block.from_bytes(block)
+    assert parsed.version == Block.RECORDS_VERSION
+    assert parsed.previous_hash == bytes(range(32))
+    assert parsed.records_root == merkle_root(
+        [record_leaf(payload, signature) for payload, signature in records]
+    )
+    assert [(bytes(p), bytes(s)) for p, s in parsed.records()] == records
+    assert parsed.has_valid_records_root()
+
+
+def test_multi_record_block_hash_covers_only_the_header():
+    block = MultiRecordBlock([(b"payload", b"signature")]).build()
+    header = block[: Block.RECORDS_HEADER_SIZE]
+    assert Block.calculate_hash(block) == Block.calculate_hash(header)
+    assert Block.parse_header(header).size == Block.RECORDS_HEADER_SIZE
+
+
+def test_tampered_records_do_not_match_the_records_root():
+    block = bytearray(MultiRecordBlock([(b"payload", b"signature")]).build())
+    block[-1] ^= 1
+    assert not Block.from_bytes(block).has_valid_records_root()
+
+
+def test_version_1_block_holds_one_record():
+    parsed = Block.from_bytes(Block(b"payload", b"signature").build())
+    assert [(bytes(p), bytes(s)) for p, s in parsed.records()] == [
+        (b"payload", b"signature")
+    ]
+    assert parsed.records_root is None
+    assert parsed.has_valid_records_root()
+
+
+def test_records_reject_truncated_payloads():
+    block = MultiRecordBlock([(b"payload", b"signature")]).build()
+    header = bytearray(block[: Block.RECORDS_HEADER_SIZE])
+    parsed = Block.from_bytes(
+        bytes(header) + b"\x02\x00\x00\x00" + block[Block.RECORDS_HEADER_SIZE + 4 :]
+    )
+
+    with pytest.raises(ValueError):
+        parsed.records()
@@ -0,0 +1,53 @@
+import asyncio
+
+from block_producer import BlockProducer
+from mempool import Mempool
+
+
+def test_a_single_record_is_due_at_once():
+    producer = BlockProducer()
+    producer.record_arrived(now=0.0)
+    assert producer.is_due(1, 10, 0.0)
+
+
+def test_a_burst_is_batched_until_the_target_or_the_latency():
+    producer = BlockProducer(max_records=100, max_latency=0.05)
+
+    for i in range(20):
+        producer.record_arrived(now=i * 0.001)
+
+    target = producer.target_records()
+    assert 1 < target <= 100
+    assert not producer.is_due(target - 1, 10, 0.02)
+    assert producer.is_due(target, 10, 0.02)
+    assert producer.is_due(1, 10, 0.05)
+
+
+def test_the_byte_limit_makes_a_block_due():
+    producer = BlockProducer(max_records=100, max_bytes=100, max_latency=1.0)
+
+    for i in range(20):
+        producer.record_arrived(now=i * 0.001)
+
+    assert not producer.is_due(2, 99, 0.02)
+    assert producer.is_due(2, 100, 0.02)
+
+
+def test_no_block_is_due_without_records_of_clients():
+    producer = BlockProducer()
+    assert not producer.is_due(5, 100, 10.0)
+    producer.record_arrived(now=0.0)
+    producer.produced(0, now=0.0)
+    assert not producer.is_due(5, 100, 10.0)
+
+
+def test_wait_returns_after_the_maximum_latency():
+    async def run():
+        producer = BlockProducer(max_latency=0.01)
+        producer.arrival_rate = 10000.0
+        mempool = Mempool()
+        mempool.add(b"payload", b"signature")
+        producer.record_arrived()
+        await asyncio.wait_for(producer.wait(mempool), 1.0)
+
+    asyncio.run(run())
@@ -0,0 +1,395 @@
+import asyncio
+import pytest
+
+from plyvel import DB
+from block import Block, MultiRecordBlock
+from blockchain import Blockchain, migrate
+from indexes import encode_timestamp, software_key
+from merkle import record_leaf, verify_merkle_proof
+from tests.helpers import deployment_record
+
+
+def test_empty_chain_has_no_tip(tmp_path):
+    blockchain = Blockchain(tmp_path / "chain.db")
+    assert blockchain.tip_height == -1
+    assert blockchain.tip_hash is None
+    assert blockchain.get_latest_block() is None
+    blockchain.close()
+
+
+def test_add_block_advances_tip(tmp_path):
+    blockchain = Blockchain(tmp_path / "chain.db")
+    first = Block(b"payload1", b"signature1").build()
+    second = Block(b"payload2", b"signature2", Block.calculate_hash(first)).build()
+    assert blockchain.add_block(first) == 0
+    assert blockchain.add_block(second) == 1
+    assert blockchain.tip_height == 1
+    assert blockchain.tip_hash == Block.calculate_hash(second)
+    assert blockchain.get_block(0) == first
+    assert blockchain.get_latest_block() == second
+    blockchain.close()
+
+
+def test_tip_is_restored_after_reopening(tmp_path):
+    blockchain = Blockchain(tmp_path / "chain.db")
+    block = Block(b"payload", b"signature").build()
+    blockchain.add_block(block)
+    blockchain.close()
+    blockchain = Blockchain(tmp_path / "chain.db")
+    assert blockchain.tip_height == 0
+    assert blockchain.tip_hash == Block.calculate_hash(block)
+    blockchain.close()
+
+
+def test_add_blocks_writes_all_blocks_in_order(tmp_path):
+    blockchain = Blockchain(tmp_path / "chain.db")
+    blocks = [Block(f"payload{i}".encode(), b"signature").build() for i in range(3)]
+    assert blockchain.add_blocks(blocks) == [0, 1, 2]
+    assert [blockchain.get_block(height) for height in range(3)] == blocks
+    assert blockchain.tip_hash == Block.calculate_hash(blocks[-1])
+    blockchain.close()
+
+
+def test_add_blocks_without_blocks_keeps_tip(tmp_path):
+    blockchain = Blockchain(tmp_path / "chain.db")
+    assert blockchain.add_blocks([]) == []
+    assert blockchain.tip_height == -1
+    blockchain.close()
+
+
+def test_concurrent_commits_share_one_group_commit(tmp_path, monkeypatch):
+    blockchain = Blockchain(tmp_path / "chain.db", group_commit_window=0.01)
+    batches = []
+    add_blocks = blockchain.add_blocks
+
+    def record_batch(blocks):
+        batches.append(len(blocks))
+        return add_blocks(blocks)
+
+    monkeypatch.setattr(blockchain, "add_blocks", record_batch)
+    blocks = [Block(f"payload{i}".encode(), b"signature").build() for i in range(5)]
+
+    async def commit_all():
+        return await asyncio.gather(*(blockchain.commit_block(b) for b in blocks))
+
+    assert asyncio.run(commit_all()) == [0, 1, 2, 3, 4]
+    assert batches == [5]
+    blockchain.close()
+
+
+def test_iter_blocks_streams_in_height_order_beyond_255(tmp_path):
+    blockchain = Blockchain(tmp_path / "chain.db")
+    blocks = [Block(f"payload{i}".encode(), b"signature").build() for i in range(300)]
+    blockchain.add_blocks(blocks)
+    assert [height for height, _ in blockchain.iter_blocks()] == list(range(300))
+    assert list(blockchain.iter_blocks(250, 260)) == [
+        (height, blocks[height]) for height in range(250, 260)
+    ]
+    assert blockchain.get_latest_block() == blocks[-1]
+    blockchain.close()
+
+
+def test_opening_legacy_schema_requires_migration(tmp_path):
+    db = DB(str(tmp_path / "chain.db"), create_if_missing=True)
+    db.put((0).to_bytes(8, "little"), Block(b"payload", b"signature").build())
+    db.close()
+
+    with pytest.raises(RuntimeError):
+        Blockchain(tmp_path / "chain.db")
+
+
+def test_migrate_moves_legacy_blocks_into_big_endian_keys(tmp_path):
+    db = DB(str(tmp_path / "chain.db"), create_if_missing=True)
+    blocks = [Block(f"payload{i}".encode(), b"signature").build() for i in range(260)]
+
+    for height, block in enumerate(blocks):
+        db.put(height.to_bytes(8, "little"), block)
+
+    db.close()
+    assert migrate(tmp_path / "chain.db", batch_size=100) == 260
+    blockchain = Blockchain(tmp_path / "chain.db")
+    assert blockchain.tip_height == 259
+    assert blockchain.tip_hash == Block.calculate_hash(blocks[-1])
+    assert [block for _, block in blockchain.iter_blocks()] == blocks
+    assert blockchain.get_height_by_hash(Block.calculate_hash(blocks[42])) == 42
+    blockchain.close()
+    assert migrate(tmp_path / "chain.db") == 0
+
+
+def test_get_block_by_hash_uses_the_hash_index(tmp_path):
+    blockchain = Blockchain(tmp_path / "chain.db")
+    blocks = [Block(f"payload{i}".encode(), b"signature").build() for i in range(3)]
+    blockchain.add_blocks(blocks)
+    block_hash = Block.calculate_hash(blocks[1])
+    assert blockchain.get_height_by_hash(block_hash) == 1
+    assert blockchain.get_block_by_hash(block_hash) == blocks[1]
+    assert blockchain.get_height_by_hash(bytes(32)) is None
+    assert blockchain.get_block_by_hash(bytes(32)) is None
+    blockchain.close()
+
+
+def test_find_deployments_by_merkle_root(tmp_path):
+    blockchain = Blockchain(tmp_path / "chain.db")
+    blockchain.add_blocks(
+        [
+            Block(deployment_record("a" * 64, "Signer1"), b"signature").build(),
+            Block(b"no record", b"signature").build(),
+            Block(deployment_record("a" * 64, "Signer2"), b"signature").build(),
+        ]
+    )
+    assert blockchain.find_deployments("a" * 64) == [(0, "Signer1"), (2, "Signer2")]
+    assert blockchain.has_merkle_root("a" * 64)
+    assert not blockchain.has_merkle_root("b" * 64)
+    assert blockchain.find_deployments("a" * 63) == []
+    blockchain.close()
+
+
+def test_has_record_finds_the_exact_record(tmp_path):
+    blockchain = Blockchain(tmp_path / "chain.db")
+    payload = deployment_record("a" * 64, "Signer")
+    blockchain.add_block(MultiRecordBlock([(payload, b"signature")], None).build())
+    assert blockchain.has_record(payload, b"signature")
+    assert not blockchain.has_record(payload, b"other signature")
+    assert not blockchain.has_record(
+        deployment_record("b" * 64, "Signer"), b"signature"
+    )
+    assert not blockchain.has_record(b"no record", b"signature")
+    blockchain.close()
+
+
+def test_unknown_merkle_root_does_not_touch_the_disk(tmp_path, monkeypatch):
+    blockchain = Blockchain(tmp_path / "chain.db")
+    blockchain.add_block(
+        Block(deployment_record("a" * 64, "Signer"), b"signature").build()
+    )
+    monkeypatch.setattr(blockchain, "_db", None)
+    assert not blockchain.has_merkle_root("b" * 64)
+
+
+def test_merkle_root_filter_is_rebuilt_on_open(tmp_path):
+    blockchain = Blockchain(tmp_path / "chain.db")
+    blockchain.add_block(
+        Block(deployment_record("a" * 64, "Signer"), b"signature").build()
+    )
+    blockchain.close()
+    blockchain = Blockchain(tmp_path / "chain.db")
+    assert b"a" * 64 in blockchain.merkle_root_filter
+    assert blockchain.find_deployments("a" * 64) == [(0, "Signer")]
+    blockchain.close()
+
+
+def test_query_index_yields_heights_by_prefix(tmp_path):
+    blockchain = Blockchain(tmp_path / "chain.db")
+    blockchain.add_blocks(
+        [
+            Block(
+                deployment_record(
+                    "a" * 64, "Signer1", software_name="App", version="1.0"
+                ),
+                b"s",
+            ).build(),
+            Block(
+                deployment_record(
+                    "b" * 64, "Signer2", software_name="App", version="2.0"
+                ),
+                b"s",
+            ).build(),
+            Block(
+                deployment_record(
+                    "c" * 64, "Signer1", software_name="Other", version="1.0"
+                ),
+                b"s",
+            ).build(),
+        ]
+    )
+    assert list(blockchain.query_index("address", b"Signer1")) == [0, 2]
+    assert list(blockchain.query_index_prefix("software", software_key("App"))) == [
+        0,
+        1,
+    ]
+    assert list(blockchain.query_index("software", software_key("App", "2.0"))) == [1]
+    blockchain.close()
+
+
+def test_query_index_matches_keys_exactly(tmp_path):
+    blockchain = Blockchain(tmp_path / "chain.db")
+    blockchain.add_blocks(
+        [
+            Block(
+                deployment_record("a" * 64, "abc", software_name="x", version="1.0"),
+                b"s",
+            ).build(),
+            Block(
+                deployment_record("b" * 64, "abcd", software_name="x", version="1.0.1"),
+                b"s",
+            ).build(),
+        ]
+    )
+    assert list(blockchain.query_index("address", b"abc")) == [0]
+    assert list(blockchain.query_index_prefix("address", b"abc")) == [0, 1]
+    assert list(blockchain.query_index("software", software_key("x", "1.0"))) == [0]
+    blockchain.close()
+
+
+def test_query_index_range_yields_heights_in_key_order(tmp_path):
+    blockchain = Blockchain(tmp_path / "chain.db")
+    blockchain.add_blocks(
+        [
+            Block(deployment_record("a" * 64, "Signer", timestamp=300.0), b"s").build(),
+            Block(deployment_record("b" * 64, "Signer", timestamp=100.0), b"s").build(),
+            Block(deployment_record("c" * 64, "Signer", timestamp=200.0), b"s").build(),
+        ]
+    )
+    assert list(
+        blockchain.query_index_range(
+            "timestamp", encode_timestamp(100.0), encode_timestamp(300.0)
+        )
+    ) == [1, 2]
+    assert list(blockchain.query_index_range("timestamp", encode_timestamp(150.0))) == [
+        2,
+        0,
+    ]
+    blockchain.close()
+
+
+def test_blocks_with_unindexable_timestamps_are_committed(tmp_path):
+    blockchain = Blockchain(tmp_path / "chain.db")
+    blocks = [
+        Block(
+            deployment_record("a" * 64, "Signer", timestamp=float("inf")), b"s"
+        ).build(),
+        Block(
+            deployment_record("b" * 64, "Signer", timestamp=float("nan")), b"s"
+        ).build(),
+        Block(deployment_record("c" * 64, "Signer", timestamp=1e300), b"s").build(),
+    ]
+    assert blockchain.add_blocks(blocks) == [0, 1, 2]
+    assert list(blockchain.query_index_range("timestamp", bytes(8))) == []
+    blockchain.close()
+
+
+def test_query_unknown_index_raises(tmp_path):
+    blockchain = Blockchain(tmp_path / "chain.db")
+
+    with pytest.raises(ValueError):
+        list(blockchain.query_index_prefix("unknown"))
+
+    blockchain.close()
+
+
+def test_headers_are_stored_apart_from_bodies(tmp_path):
+    blockchain = Blockchain(tmp_path / "chain.db")
+    block = Block(b"payload", b"signature").build()
+    blockchain.add_block(block)
+    assert blockchain.get_header(0) == block[: Block.HEADER_SIZE]
+    assert list(blockchain.iter_headers()) == [(0, block[: Block.HEADER_SIZE])]
+    assert blockchain.get_block(0) == block
+    assert blockchain.get_header(1) is None
+    assert blockchain.get_block(1) is None
+    blockchain.close()
+
+
+def test_verify_links_walks_the_header_chain(tmp_path):
+    blockchain = Blockchain(tmp_path / "chain.db")
+    first = Block(b"payload1", b"signature").build()
+    second = Block(b"payload2", b"signature", Block.calculate_hash(first)).build()
+    blockchain.add_blocks([first, second])
+    assert blockchain.verify_links() is None
+    blockchain.add_block(Block(b"payload3", b"signature").build())
+    assert blockchain.verify_links() == 2
+    blockchain.close()
+
+
+def test_migrate_splits_schema_2_blocks_into_headers_and_bodies(tmp_path):
+    db = DB(str(tmp_path / "chain.db"), create_if_missing=True)
+    blocks = [Block(f"payload{i}".encode(), b"signature").build() for i in range(5)]
+
+    for height, block in enumerate(blocks):
+        db.put(b"b" + height.to_bytes(8, "big"), block)
+
+    db.put(b"h" + (0).to_bytes(8, "big"), blocks[0][: Block.HEADER_SIZE])
+    db.put(b"b" + (0).to_bytes(8, "big"), blocks[0][Block.HEADER_SIZE :])
+    db.put(b"m:schema_version", (2).to_bytes(2, "big"))
+    db.close()
+    assert migrate(tmp_path / "chain.db", batch_size=2) == 4
+    blockchain = Blockchain(tmp_path / "chain.db")
+    assert [block for _, block in blockchain.iter_blocks()] == blocks
+    blockchain.close()
+
+
+def test_migrate_rebuilds_schema_3_indexes_with_terminated_keys(tmp_path):
+    blockchain = Blockchain(tmp_path / "chain.db")
+    blockchain.add_blocks(
+        [
+            Block(deployment_record("a" * 64, "abc"), b"s").build(),
+            Block(deployment_record("b" * 64, "abcd"), b"s").build(),
+        ]
+    )
+    blockchain.close()
+    db = DB(str(tmp_path / "chain.db"))
+
+    with db.iterator(prefix=b"i", include_value=False) as it:
+        for key in it:
+            db.delete(key)
+
+    db.put(b"iaddress\x00abc" + (0).to_bytes(8, "big"), b"")
+    db.put(b"iaddress\x00abcd" + (1).to_bytes(8, "big"), b"")
+    db.put(b"m:schema_version", (3).to_bytes(2, "big"))
+    db.close()
+    migrate(tmp_path / "chain.db")
+    blockchain = Blockchain(tmp_path / "chain.db")
+    assert list(blockchain.query_index("address", b"abc")) == [0]
+    assert list(blockchain.query_index_prefix("address", b"abc")) == [0, 1]
+    blockchain.close()
+
+
+def test_multi_record_blocks_index_every_record(tmp_path):
+    blockchain = Blockchain(tmp_path / "chain.db")
+    block = MultiRecordBlock(
+        [
+            (deployment_record("a" * 64, "Signer1"), b"s"),
+            (deployment_record("b" * 64, "Signer2"), b"s"),
+        ]
+    ).build()
+    blockchain.add_block(block)
+    assert blockchain.find_deployments("b" * 64) == [(0, "Signer2")]
+    assert list(blockchain.query_index_prefix("address", b"Signer")) == [0, 0]
+    assert blockchain.get_block_by_hash(Block.calculate_hash(block)) == block
+    assert blockchain.get_header(0) == block[: Block.RECORDS_HEADER_SIZE]
+    blockchain.close()
+
+
+def test_get_record_proof_verifies_against_the_header(tmp_path):
+    blockchain = Blockchain(tmp_path / "chain.db")
+    records = [
+        (deployment_record(f"{i:064x}", "Signer"), f"signature{i}".encode())
+        for i in range(5)
+    ]
+    blockchain.add_block(MultiRecordBlock(records).build())
+    height, index, payload, signature, proof = blockchain.get_record_proof(f"{3:064x}")
+    header = Block.parse_header(blockchain.get_header(height))
+    assert (height, index) == (0, 3)
+    assert (payload, signature) == records[3]
+    assert verify_merkle_proof(
+        record_leaf(payload, signature), index, proof, header.records_root
+    )
+    assert blockchain.get_record_proof("f" * 64) is None
+    blockchain.close()
+
+
+def test_head_hash_includes_blocks_waiting_for_a_group_commit(tmp_path):
+    blockchain = Blockchain(tmp_path / "chain.db", group_commit_window=0.01)
+
+    async def commit_linked_blocks():
+        first = MultiRecordBlock([(b"payload1", b"s")], blockchain.head_hash).build()
+        first_commit = asyncio.ensure_future(blockchain.commit_block(first))
+        await asyncio.sleep(0)
+        assert blockchain.head_hash == Block.calculate_hash(first)
+        assert blockchain.tip_hash is None
+        second = MultiRecordBlock([(b"payload2", b"s")], blockchain.head_hash).build()
+        return await asyncio.gather(first_commit, blockchain.commit_block(second))
+
+    assert asyncio.run(commit_linked_blocks()) == [0, 1]
+    assert blockchain.verify_links() is None
+    assert blockchain.head_hash == blockchain.tip_hash
+    blockchain.close()
@@ -0,0 +1,30 @@
+from bloom_filter import BloomFilter
+
+
+def test_added_items_are_always_contained():
+    bloom_filter = BloomFilter(1000)
+    items = [f"item{i}".encode() for i in range(1000)]
+
+    for item in items:
+        bloom_filter.add(item)
+
+    assert all(item in bloom_filter for item in items)
+
+
+def test_false_positive_rate_stays_near_error_rate():
+    bloom_filter = BloomFilter(1000, error_rate=0.01)
+
+    for i in range(1000):
+        bloom_filter.add(f"item{i}".encode())
+
+    false_positives = sum(f"other{i}".encode() in bloom_filter for i in range(10000))
+    assert false_positives < 300
+
+
+def test_is_full_after_capacity_is_exceeded():
+    bloom_filter = BloomFilter(2)
+    bloom_filter.add(b"a")
+    bloom_filter.add(b"b")
+    assert not bloom_filter.is_full()
+    bloom_filter.add(b"c")
+    assert bloom_filter.is_full()
@@ -0,0 +1,54 @@
+from block import MultiRecordBlock
+from compact_block import SHORT_ID_SIZE, PartialBlock, compact
+from merkle import record_leaf
+
+RECORDS = [(b"payload-1", b"sig-1"), (b"payload-2", b"sig-2"), (b"payload-3", b"sig-3")]
+
+
+def test_compact_splits_the_header_and_short_ids():
+    block = MultiRecordBlock(RECORDS).build()
+
+    header, short_ids = compact(block)
+
+    assert header == block[: MultiRecordBlock.RECORDS_HEADER_SIZE]
+    assert len(short_ids) == len(RECORDS)
+    assert all(len(short_id) == SHORT_ID_SIZE for short_id in short_ids)
+
+
+def test_rebuilds_the_block_from_the_mempool():
+    block = MultiRecordBlock(RECORDS).build()
+    partial = PartialBlock(*compact(block))
+
+    partial.fill_from(
+        (record_leaf(*record), record)
+        for record in [(b"other", b"sig"), *reversed(RECORDS)]
+    )
+
+    assert partial.missing() == []
+    assert partial.build() == block
+
+
+def test_requests_only_the_missing_records():
+    block = MultiRecordBlock(RECORDS).build()
+    partial = PartialBlock(*compact(block))
+
+    partial.fill_from(
+        (record_leaf(*record), record) for record in [RECORDS[0], RECORDS[2]]
+    )
+
+    assert partial.missing() == [1]
+    assert partial.build() is None
+
+    partial.fill([1], [RECORDS[1]])
+
+    assert partial.build() == block
+
+
+def test_a_wrong_record_fails_the_records_root():
+    block = MultiRecordBlock(RECORDS).build()
+    partial = PartialBlock(*compact(block))
+
+    partial.fill([0, 1, 2], [RECORDS[0], (b"forged", b"sig"), RECORDS[2]])
+
+    assert partial.missing() == []
+    assert partial.build() is None
@@ -0,0 +1,140 @@
+import asyncio
+import json
+
+from connection import WIRE_VERSION, Connection, encode_message, read_message
+
+
+async def _echo_server(handler):
+    async def handle_client(reader, writer):
+        await Connection(reader, writer, handler).serve()
+
+    server = await asyncio.start_server(handle_client, "127.0.0.1", 0)
+    return server, f"127.0.0.1:{server.sockets[0].getsockname()[1]}"
+
+
+def test_requests_in_flight_are_matched_by_id():
+    async def handler(msg, connection):
+        await asyncio.sleep(msg["delay"])
+        await connection.reply(msg, {"value": msg["value"]})
+
+    async def run():
+        server, address = await _echo_server(handler)
+
+        async with server:
+            connection = await Connection.open(address)
+            responses = await asyncio.gather(
+                connection.request({"type": "echo", "value": 1, "delay": 0.05}),
+                connection.request({"type": "echo", "value": 2, "delay": 0}),
+            )
+            await connection.close()
+            return responses
+
+    responses = asyncio.run(run())
+    assert [msg["value"] for msg in responses] == [1, 2]
+    assert [msg["reply_to"] for msg in responses] == [1, 2]
+
+
+def test_requests_without_id_get_responses_without_id():
+    async def handler(msg, connection):
+        await connection.reply(msg, {"type": "pong"})
+
+    async def run():
+        server, address = await _echo_server(handler)
+
+        async with server:
+            host, port = address.split(":")
+            reader, writer = await asyncio.open_connection(host, int(port))
+            writer.write(b'{"type": "ping"}\n')
+            msg = json.loads(await reader.readline())
+            writer.close()
+            return msg
+
+    assert asyncio.run(run()) == {"type": "pong"}
+
+
+def test_untagged_legacy_response_completes_oldest_request():
+    received = []
+
+    async def handler(msg, connection):
+        received.append(msg)
+
+    async def handle_client(reader, writer):
+        await reader.readline()
+        writer.write(b'{"type": "inv"}\n{"type": "peer_list", "peers": []}\n')
+        await writer.drain()
+        writer.close()
+
+    async def run():
+        server = await asyncio.start_server(handle_client, "127.0.0.1", 0)
+
+        async with server:
+            port = server.sockets[0].getsockname()[1]
+            connection = await Connection.open(f"127.0.0.1:{port}", handler)
+            msg = await connection.request({"type": "hello"})
+            await connection.close()
+            return msg
+
+    assert asyncio.run(run()) == {"type": "peer_list", "peers": []}
+    assert received == [{"type": "inv"}]
+
+
+def test_values_that_are_not_messages_are_ignored():
+    received = []
+
+    async def handler(msg, connection):
+        received.append(msg)
+        await connection.reply(msg, {"type": "pong"})
+
+    async def run():
+        server, address = await _echo_server(handler)
+
+        async with server:
+            host, port = address.split(":")
+            reader, writer = await asyncio.open_connection(host, int(port))
+            writer.write(b'{"id": 1}\n')
+            writer.write(encode_message(42, WIRE_VERSION))
+            writer.write(b'{"type": "ping"}\n')
+            msg = json.loads(await reader.readline())
+            writer.close()
+            return msg
+
+    assert asyncio.run(run()) == {"type": "pong"}
+    assert received == [{"type": "ping"}]
+
+
+def test_wire_offer_switches_both_sides_to_binary_frames():
+    async def handler(msg, connection):
+        await connection.reply(msg, {"signature": msg.get("signature", b"")})
+
+    async def run():
+        server, address = await _echo_server(handler)
+
+        async with server:
+            connection = await Connection.open(address)
+            await connection.request({"type": "hello", "wire": WIRE_VERSION})
+            response = await connection.request(
+                {"type": "echo", "signature": b"\x00\xff"}
+            )
+            await connection.close()
+            return connection.wire, response
+
+    wire, response = asyncio.run(run())
+    assert wire == WIRE_VERSION
+    assert response["signature"] == b"\x00\xff"
+
+
+def test_json_lines_carry_bytes_fields_as_hex():
+    encoded = encode_message({"record": b"\x01", "headers": [b"\x02"]}, 1)
+    assert json.loads(encoded) == {"record": "01", "headers": ["02"]}
+
+    async def run():
+        reader = asyncio.StreamReader()
+        reader.feed_data(encoded + encode_message({"record": b"\x01"}, WIRE_VERSION))
+        reader.feed_eof()
+        return [await read_message(reader) for _ in range(3)]
+
+    assert asyncio.run(run()) == [
+        {"record": b"\x01", "headers": [b"\x02"]},
+        {"record": b"\x01"},
+        None,
+    ]
@@ -0,0 +1,27 @@
+from gossip import Gossip, SeenCache
+
+
+def test_seen_cache_forgets_the_least_recently_seen_id():
+    cache = SeenCache(2)
+    assert cache.add(b"a")
+    assert cache.add(b"b")
+    assert not cache.add(b"a")
+    assert cache.add(b"c")
+    assert b"a" in cache
+    assert b"b" not in cache
+    assert len(cache) == 2
+
+
+def test_accept_only_new_items():
+    gossip = Gossip()
+    assert gossip.accept(b"a")
+    assert not gossip.accept(b"a")
+
+
+def test_select_peers_is_bounded_by_the_fanout():
+    gossip = Gossip(fanout=3)
+    peers = [f"10.0.0.{i}:5000" for i in range(10)]
+    selected = gossip.select_peers(peers)
+    assert len(set(selected)) == 3
+    assert set(selected) <= set(peers)
+    assert gossip.select_peers(peers[:2]) != []
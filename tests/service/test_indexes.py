@@ -0,0 +1,62 @@
+from indexes import (
+    SecondaryIndex,
+    decode_record,
+    encode_key,
+    encode_timestamp,
+    extract_address,
+    extract_commit_hash,
+    extract_software,
+    extract_timestamp,
+    software_key,
+)
+
+
+def test_decode_record_returns_none_for_non_records():
+    assert decode_record(b"\xc1") is None
+    assert decode_record(b"\x01") is None
+
+
+def test_extractors_read_the_record_fields():
+    record = {
+        "address": "Signer",
+        "metadata": {
+            "software_name": "App",
+            "version": "1.0",
+            "commit_hash": "abc",
+            "timestamp": 1.5,
+        },
+    }
+
+    assert extract_address(record) == b"Signer"
+    assert extract_software(record) == b"App\x001.0"
+    assert extract_commit_hash(record) == b"abc"
+    assert extract_timestamp(record) == encode_timestamp(1.5)
+
+
+def test_extractors_skip_missing_fields():
+    record = {"metadata": {"timestamp": -1}}
+    assert extract_address(record) is None
+    assert extract_software(record) is None
+    assert extract_commit_hash(record) is None
+    assert extract_timestamp(record) is None
+
+
+def test_timestamps_outside_the_key_range_are_not_indexed():
+    for timestamp in [float("inf"), float("nan"), 1e300, 2**64]:
+        assert extract_timestamp({"metadata": {"timestamp": timestamp}}) is None
+
+
+def test_encoded_timestamps_sort_like_numbers():
+    assert encode_timestamp(9.0) < encode_timestamp(10.0) < encode_timestamp(256.0)
+
+
+def test_encoded_keys_are_never_prefixes_of_each_other():
+    assert not encode_key(b"abcd").startswith(encode_key(b"abc"))
+    assert encode_key(b"a\x00") < encode_key(b"a\x00b") < encode_key(b"a\x01")
+
+
+def test_entry_key_appends_height_to_index_key():
+    index = SecondaryIndex("software", extract_software)
+    assert index.entry_key(
+        software_key("App", "1.0"), 1
+    ) == b"isoftware\x00App\x00\xff1.0\x00" + (1).to_bytes(8, "big")
@@ -0,0 +1,56 @@
+from mempool import Mempool
+from merkle import record_leaf
+
+
+def test_records_are_deduplicated_and_taken_in_insertion_order():
+    mempool = Mempool()
+    assert mempool.add(b"a", b"signature")
+    assert mempool.add(b"b", b"signature")
+    assert not mempool.add(b"a", b"signature")
+    assert len(mempool) == 2
+    assert mempool.take(1) == [(b"a", b"signature")]
+    assert mempool.take() == [(b"b", b"signature")]
+    assert mempool.stats()["duplicates"] == 1
+    assert mempool.size == 0
+
+
+def test_records_are_looked_up_and_removed_by_leaf():
+    mempool = Mempool()
+    mempool.add(b"a", b"signature")
+    mempool.add(b"b", b"signature")
+    leaf = record_leaf(b"a", b"signature")
+    assert leaf in mempool
+    assert mempool.get(leaf) == (b"a", b"signature")
+    mempool.remove_many([leaf, record_leaf(b"unknown", b"signature")])
+    assert leaf not in mempool
+    assert list(mempool) == [(b"b", b"signature")]
+    assert mempool.size == len(b"b") + len(b"signature")
+
+
+def test_the_oldest_records_are_evicted_at_the_count_cap():
+    mempool = Mempool(max_count=2)
+
+    for payload in [b"a", b"b", b"c"]:
+        mempool.add(payload, b"sig")
+
+    assert list(mempool) == [(b"b", b"sig"), (b"c", b"sig")]
+    assert mempool.stats()["evicted"] == 1
+
+
+def test_the_oldest_records_are_evicted_at_the_byte_cap():
+    mempool = Mempool(max_bytes=10)
+    mempool.add(b"aaa", b"sig")
+    mempool.add(b"bbb", b"sig")
+    assert not mempool.add(b"x" * 10, b"sig")
+    assert mempool.add(b"cccc", b"sig")
+    assert list(mempool) == [(b"cccc", b"sig")]
+    assert mempool.stats() == {
+        "count": 1,
+        "bytes": 7,
+        "max_count": 100000,
+        "max_bytes": 10,
+        "added": 3,
+        "duplicates": 0,
+        "evicted": 2,
+        "rejected": 1,
+    }
@@ -0,0 +1,90 @@
+import asyncio
+
+from mempool_log import MempoolLog
+from merkle import record_leaf
+
+
+def _record(payload):
+    return record_leaf(payload, b"signature"), payload, b"signature"
+
+
+def test_replay_restores_the_records_that_were_not_removed(tmp_path):
+    log = MempoolLog(tmp_path)
+    log.replay()
+    a, b, c = _record(b"a"), _record(b"b"), _record(b"c")
+
+    for record in [a, b, c]:
+        log.append(*record)
+
+    log.remove([b[0], record_leaf(b"unknown", b"signature")])
+    asyncio.run(log.sync())
+    log.close()
+
+    restarted = MempoolLog(tmp_path)
+    assert restarted.replay() == [a, c]
+    assert b[0] not in restarted
+    restarted.append(*_record(b"d"))
+    restarted.close()
+    assert MempoolLog(tmp_path).replay() == [a, c, _record(b"d")]
+
+
+def test_replay_stops_at_a_torn_entry(tmp_path):
+    log = MempoolLog(tmp_path)
+    log.replay()
+    log.append(*_record(b"a"))
+    log.append(*_record(b"b"))
+    log.close()
+    (segment,) = tmp_path.glob("*.wal")
+    segment.write_bytes(segment.read_bytes()[:-3])
+
+    restarted = MempoolLog(tmp_path)
+    assert restarted.replay() == [_record(b"a")]
+    restarted.append(*_record(b"c"))
+    restarted.close()
+    assert MempoolLog(tmp_path).replay() == [_record(b"a"), _record(b"c")]
+
+
+def test_segments_are_deleted_once_their_records_are_removed(tmp_path, monkeypatch):
+    monkeypatch.setattr(MempoolLog, "SEGMENT_SIZE", 100)
+    monkeypatch.setattr(MempoolLog, "MAX_SEGMENTS", 3)
+    log = MempoolLog(tmp_path)
+    log.replay()
+    waiting = _record(b"waiting")
+    log.append(*waiting)
+    records = [_record(b"%d" % i) for i in range(20)]
+
+    for record in records:
+        log.append(*record)
+        log.remove([record[0]])
+
+    # The waiting record was copied forward, so its first segment could be deleted.
+    assert not (tmp_path / "00000001.wal").exists()
+    assert len(list(tmp_path.glob("*.wal"))) <= 3
+    log.close()
+    assert MempoolLog(tmp_path).replay() == [waiting]
+
+
+def test_concurrent_syncs_share_an_fsync(tmp_path, monkeypatch):
+    log = MempoolLog(tmp_path)
+    log.replay()
+    fsyncs = []
+    fsync = MempoolLog._fsync
+
+    async def counting_fsync(self):
+        fsyncs.append(self._appended)
+        await fsync(self)
+
+    monkeypatch.setattr(MempoolLog, "_fsync", counting_fsync)
+
+    async def run():
+        syncs = []
+
+        for payload in [b"a", b"b", b"c"]:
+            log.append(*_record(payload))
+            syncs.append(log.sync())
+
+        await asyncio.gather(*syncs)
+
+    asyncio.run(run())
+    assert fsyncs == [3]
+    log.close()
@@ -0,0 +1,50 @@
+from hashlib import sha256
+from merkle import (
+    merkle_proof,
+    merkle_root,
+    node_hash,
+    record_leaf,
+    verify_merkle_proof,
+)
+
+
+def test_merkle_root_of_one_leaf_is_the_leaf():
+    leaf = record_leaf(b"payload", b"signature")
+    assert merkle_root([leaf]) == leaf
+
+
+def test_merkle_root_pairs_an_odd_leaf_with_itself():
+    leaves = [sha256(bytes([i])).digest() for i in range(3)]
+    left = sha256(b"\x01" + leaves[0] + leaves[1]).digest()
+    right = sha256(b"\x01" + leaves[2] + leaves[2]).digest()
+    assert merkle_root(leaves) == sha256(b"\x01" + left + right).digest()
+
+
+def test_leaves_commit_to_the_split_of_payload_and_signature():
+    leaf = record_leaf(b"payload", b"signature")
+    assert (
+        leaf == sha256(b"\x00" + (7).to_bytes(4, "big") + b"payloadsignature").digest()
+    )
+    assert record_leaf(b"payloadsig", b"nature") != leaf
+    assert node_hash(leaf, leaf) != sha256(leaf + leaf).digest()
+
+
+def test_merkle_root_without_leaves_is_zero():
+    assert merkle_root([]) == bytes(32)
+
+
+def test_proofs_of_all_leaves_verify():
+    leaves = [sha256(bytes([i])).digest() for i in range(7)]
+    root = merkle_root(leaves)
+
+    for index, leaf in enumerate(leaves):
+        assert verify_merkle_proof(leaf, index, merkle_proof(leaves, index), root)
+
+
+def test_proof_does_not_verify_another_leaf_or_index():
+    leaves = [sha256(bytes([i])).digest() for i in range(4)]
+    root = merkle_root(leaves)
+    proof = merkle_proof(leaves, 1)
+    assert not verify_merkle_proof(leaves[2], 1, proof, root)
+    assert not verify_merkle_proof(leaves[1], 0, proof, root)
+    assert not verify_merkle_proof(leaves[1], 5, proof, root)
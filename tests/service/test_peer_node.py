@@ -0,0 +1,671 @@
+import asyncio
+import peer_node
+import time
+
+from concurrent.futures.process import BrokenProcessPool
+from block import Block, MultiRecordBlock
+from blockchain import Blockchain
+from merkle import record_leaf
+from peer_node import PeerNode
+from tests.helpers import signed_record
+
+
+def _node(monkeypatch, tmp_path, network):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(peer_node, "Blockchain", lambda **options: None)
+    monkeypatch.setattr(PeerNode, "PEER_TIMEOUT", 0.05)
+    monkeypatch.setattr(PeerNode, "RETRY_BACKOFF", 0.01)
+    node = PeerNode("127.0.0.1", 5000)
+    attempts = {}
+
+    async def fake_exchange_peers(peer):
+        attempts[peer] = attempts.get(peer, 0) + 1
+
+        if network[peer] == "refused":
+            raise ConnectionRefusedError()
+
+        if network[peer] == "silent":
+            await asyncio.sleep(10)
+
+        await asyncio.sleep(0.01)
+        return network[peer]
+
+    monkeypatch.setattr(node, "_exchange_peers", fake_exchange_peers)
+    return node, attempts
+
+
+def _contacted(node):
+    return {peer for peer in node.address_book if node.address_book.is_contacted(peer)}
+
+
+def test_blocks_are_synced_to_disk_by_default(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    options = []
+    monkeypatch.setattr(
+        peer_node, "Blockchain", lambda **kwargs: options.append(kwargs)
+    )
+    PeerNode("127.0.0.1", 5000)
+    PeerNode("127.0.0.1", 5001, sync=False, group_commit_window=0.01)
+    assert options == [
+        {"sync": True, "group_commit_window": PeerNode.GROUP_COMMIT_WINDOW},
+        {"sync": False, "group_commit_window": 0.01},
+    ]
+
+
+def test_discovery_runs_concurrently_and_skips_dead_peers(monkeypatch, tmp_path):
+    addresses = [f"10.0.0.{i}:5000" for i in range(200)]
+    network = {address: addresses for address in addresses}
+    network["10.0.1.1:5000"] = "refused"
+    network["10.0.1.2:5000"] = "silent"
+    network[addresses[0]] = addresses + ["10.0.1.1:5000", "10.0.1.2:5000"]
+    node, attempts = _node(monkeypatch, tmp_path, network)
+    started = time.monotonic()
+    asyncio.run(node.connect_to_peer(addresses[0]))
+    assert time.monotonic() - started < 2
+    assert _contacted(node) == set(addresses)
+    assert attempts["10.0.1.1:5000"] == PeerNode.DIAL_ATTEMPTS
+    assert attempts["10.0.1.2:5000"] == PeerNode.DIAL_ATTEMPTS
+    assert all(attempts[address] == 1 for address in addresses)
+
+
+def test_discovery_retries_a_peer_that_fails_once(monkeypatch, tmp_path):
+    network = {"10.0.0.1:5000": []}
+    node, attempts = _node(monkeypatch, tmp_path, network)
+    exchange_peers = node._exchange_peers
+
+    async def flaky_exchange_peers(peer):
+        if not attempts:
+            attempts[peer] = 1
+            raise ConnectionResetError()
+
+        return await exchange_peers(peer)
+
+    monkeypatch.setattr(node, "_exchange_peers", flaky_exchange_peers)
+    asyncio.run(node.connect_to_peer("10.0.0.1:5000"))
+    assert _contacted(node) == {"10.0.0.1:5000"}
+    assert attempts["10.0.0.1:5000"] == 2
+
+
+class _FakeConnection:
+    def __init__(self):
+        self.replies = []
+
+        self.sent = []
+
+    async def reply(self, request, msg):
+        self.replies.append(msg)
+
+    async def send(self, msg):
+        self.sent.append(msg)
+
+
+def _hello(node, peers, full):
+    connection = _FakeConnection()
+    msg = {"type": "hello", "me": "10.0.0.9:5000", "peers": peers, "full": full}
+    asyncio.run(node._handle_hello_message(msg, connection))
+    return connection.replies[0]
+
+
+def test_hello_responses_carry_only_peers_added_since_the_last_exchange(
+    monkeypatch, tmp_path
+):
+    node, _ = _node(monkeypatch, tmp_path, {})
+
+    async def no_discovery(peers):
+        pass
+
+    monkeypatch.setattr(node, "_connect_to_peers", no_discovery)
+    node.address_book.add("10.0.0.1:5000")
+    first = _hello(node, ["10.0.0.2:5000"], True)
+    assert first["peers"] == ["10.0.0.1:5000"]
+    assert first["full"] and not first["resync"]
+    node.address_book.add("10.0.0.3:5000")
+    second = _hello(node, [], False)
+    assert second["peers"] == ["10.0.0.3:5000"]
+    assert not second["full"]
+
+
+def test_hello_delta_without_state_asks_for_resync(monkeypatch, tmp_path):
+    node, _ = _node(monkeypatch, tmp_path, {})
+
+    async def no_discovery(peers):
+        pass
+
+    monkeypatch.setattr(node, "_connect_to_peers", no_discovery)
+    node.address_book.add("10.0.0.1:5000")
+    response = _hello(node, ["10.0.0.2:5000"], False)
+    assert response["peers"] == ["10.0.0.1:5000"]
+    assert response["full"] and response["resync"]
+
+
+def _chain_node(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(
+        peer_node,
+        "Blockchain",
+        lambda **options: Blockchain(tmp_path / "db", group_commit_window=0),
+    )
+    node = PeerNode("127.0.0.1", 5000)
+    announced = []
+
+    async def fake_announce(block_hashes=None, record_ids=None):
+        announced.append((block_hashes, record_ids))
+
+    monkeypatch.setattr(node, "_announce", fake_announce)
+    return node, announced
+
+
+def test_received_block_extending_the_chain_is_appended_and_announced(
+    monkeypatch, tmp_path
+):
+    node, announced = _chain_node(monkeypatch, tmp_path)
+    record, other = signed_record("a"), signed_record("b")
+    node.mempool.add(*record)
+    node.mempool.add(*other)
+    block = MultiRecordBlock([record], None).build()
+
+    async def run():
+        appended = await node._receive_block(block)
+        duplicate = await node._receive_block(block)
+        await asyncio.sleep(0)
+        return appended, duplicate
+
+    assert asyncio.run(run()) == (True, False)
+    assert node.blockchain.get_block(0) == block
+    assert list(node.mempool) == [other]
+    assert announced == [([Block.calculate_hash(block)], None)]
+    node.close()
+
+
+def test_received_block_not_extending_the_chain_is_dropped(monkeypatch, tmp_path):
+    node, announced = _chain_node(monkeypatch, tmp_path)
+    block = MultiRecordBlock([(b"payload", b"signature")], bytes([1]) * 32).build()
+    assert not asyncio.run(node._receive_block(block))
+    assert node.blockchain.tip_height == -1
+    assert announced == []
+    node.close()
+
+
+def test_received_block_with_a_forged_signature_is_dropped(monkeypatch, tmp_path):
+    node, announced = _chain_node(monkeypatch, tmp_path)
+    payload, _ = signed_record("a")
+    block = MultiRecordBlock([(payload, bytes(64))], None).build()
+    assert not asyncio.run(node._receive_block(block))
+    assert node.blockchain.tip_height == -1
+    assert announced == []
+    node.close()
+
+
+def test_received_block_that_failed_to_write_is_not_accepted(monkeypatch, tmp_path):
+    node, announced = _chain_node(monkeypatch, tmp_path)
+    record = signed_record("a")
+    leaf = record_leaf(*record)
+    block = MultiRecordBlock([record], None).build()
+
+    async def failing_commit_block(block):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(node.blockchain, "commit_block", failing_commit_block)
+
+    async def run():
+        await node._handle_add_deployment_record(
+            {"record": record[0], "signature": record[1], "durability": "accepted"},
+            _FakeConnection(),
+        )
+        waiter = asyncio.get_running_loop().create_future()
+        node.commit_waiters[leaf] = [waiter]
+        return await node._receive_block(block), waiter.done()
+
+    assert asyncio.run(run()) == (False, False)
+    assert Block.calculate_hash(block) not in node.gossip.seen
+    assert list(node.mempool) == [record]
+    assert leaf in node.mempool_log
+    assert leaf not in node.included_records
+    assert ([Block.calculate_hash(block)], None) not in announced
+    node.close()
+
+
+def test_received_malformed_blocks_are_dropped(monkeypatch, tmp_path):
+    node, announced = _chain_node(monkeypatch, tmp_path)
+    block = MultiRecordBlock([signed_record("a")], None).build()
+
+    async def run():
+        return [
+            await node._receive_block(malformed, "10.0.0.1:5000")
+            for malformed in [b"\x02", block[:-1], block + b"\x00"]
+        ]
+
+    assert asyncio.run(run()) == [False, False, False]
+    assert node.blockchain.tip_height == -1
+    assert announced == []
+    node.close()
+
+
+def test_pulls_go_on_after_a_failed_round(monkeypatch, tmp_path):
+    node, _ = _chain_node(monkeypatch, tmp_path)
+    monkeypatch.setattr(node, "GOSSIP_PULL_INTERVAL", 0)
+    monkeypatch.setattr(node, "_contacted_peers", lambda: ["10.0.0.1:5000"])
+    pulls = []
+
+    async def failing_pull(peer):
+        pulls.append(peer)
+
+        if len(pulls) == 1:
+            raise KeyError("blocks")
+
+    monkeypatch.setattr(node, "_pull", failing_pull)
+
+    async def run():
+        task = asyncio.create_task(node._pull_periodically())
+
+        while len(pulls) < 2:
+            await asyncio.sleep(0)
+
+        task.cancel()
+
+    asyncio.run(asyncio.wait_for(run(), 1))
+    assert pulls == ["10.0.0.1:5000", "10.0.0.1:5000"]
+    node.close()
+
+
+def test_block_replies_are_capped_by_size(monkeypatch, tmp_path):
+    node, _ = _chain_node(monkeypatch, tmp_path)
+    blocks = [MultiRecordBlock([signed_record("0")], None).build()]
+
+    for i in range(1, 4):
+        previous_hash = Block.calculate_hash(blocks[-1])
+        blocks.append(MultiRecordBlock([signed_record(str(i))], previous_hash).build())
+
+    node.blockchain.add_blocks(blocks)
+    monkeypatch.setattr(
+        node, "MAX_BLOCK_BYTES_PER_MESSAGE", len(blocks[0]) + len(blocks[1])
+    )
+    connection = _FakeConnection()
+
+    async def run():
+        for start, count in [(0, 4), (3, 1)]:
+            msg = {"type": "get_blocks", "start": start, "count": count}
+            await node._handle_get_blocks(msg, connection)
+
+    asyncio.run(run())
+    assert [reply["blocks"] for reply in connection.replies] == [
+        blocks[0:2],
+        blocks[3:],
+    ]
+    node.close()
+
+
+def test_received_record_is_announced_once(monkeypatch, tmp_path):
+    node, announced = _chain_node(monkeypatch, tmp_path)
+    payload, signature = signed_record("a")
+    msg = {"type": "record", "record": payload, "signature": signature}
+    forged = {"type": "record", "record": payload, "signature": bytes(64)}
+
+    async def run():
+        await node._handle_record(msg)
+        await node._handle_record(msg)
+        await node._handle_record(forged)
+        await asyncio.sleep(0)
+
+    asyncio.run(run())
+    assert list(node.mempool) == [(payload, signature)]
+    assert announced == [(None, [record_leaf(payload, signature)])]
+    node.close()
+
+
+def test_inv_requests_only_unknown_items(monkeypatch, tmp_path):
+    node, _ = _chain_node(monkeypatch, tmp_path)
+    node.gossip.accept(b"seen")
+    connection = _FakeConnection()
+    msg = {"me": "10.0.0.1:5000", "block_hashes": [b"seen", b"new"], "record_ids": []}
+
+    async def run():
+        await node._handle_inv(msg, connection)
+        await node._handle_inv(msg, connection)
+
+    asyncio.run(run())
+    assert [msg["block_hashes"] for msg in connection.sent] == [[b"new"]]
+    assert b"seen" in node.known_inventory["10.0.0.1:5000"]
+    node.close()
+
+
+def test_getdata_sends_the_requested_records(monkeypatch, tmp_path):
+    node, _ = _chain_node(monkeypatch, tmp_path)
+    node.mempool.add(b"a", b"signature")
+    node.mempool.add(b"b", b"signature")
+    connection = _FakeConnection()
+    msg = {"me": "10.0.0.1:5000", "record_ids": [record_leaf(b"b", b"signature")]}
+    asyncio.run(node._handle_getdata(msg, connection))
+    assert [(msg["type"], msg["record"]) for msg in connection.sent] == [
+        ("record", b"b")
+    ]
+    node.close()
+
+
+def test_compact_block_is_rebuilt_from_the_mempool_and_missing_records(
+    monkeypatch, tmp_path
+):
+    sender, _ = _chain_node(monkeypatch, tmp_path)
+    (tmp_path / "receiver").mkdir()
+    receiver, announced = _chain_node(monkeypatch, tmp_path / "receiver")
+    records = [signed_record("a"), signed_record("b")]
+    block = MultiRecordBlock(records, None).build()
+    receiver.mempool.add(*records[0])
+    to_receiver = _FakeConnection()
+    to_sender = _FakeConnection()
+
+    async def run():
+        await sender.blockchain.commit_block(block)
+        getdata = {
+            "me": "10.0.0.1:5000",
+            "block_hashes": [Block.calculate_hash(block)],
+            "compact": True,
+        }
+        await sender._handle_getdata(getdata, to_receiver)
+        await receiver._handle_compact_block(to_receiver.sent[-1], to_sender)
+        await sender._handle_getblocktxn(to_sender.sent[-1], to_receiver)
+        await receiver._handle_blocktxn(to_receiver.sent[-1], to_sender)
+        await asyncio.sleep(0)
+
+    asyncio.run(run())
+    assert [msg["type"] for msg in to_receiver.sent] == ["compact_block", "blocktxn"]
+    assert to_sender.sent[0]["indexes"] == [1]
+    assert to_receiver.sent[1]["payloads"] == [records[1][0]]
+    assert receiver.blockchain.get_block(0) == block
+    assert len(receiver.mempool) == 0
+    assert receiver.partial_blocks == {}
+    assert announced == [([Block.calculate_hash(block)], None)]
+    sender.close()
+    receiver.close()
+
+
+class _ServingConnection:
+    def __init__(self, node):
+        self.node = node
+
+    async def request(self, msg):
+        connection = _FakeConnection()
+        await self.node.handle_message(msg, connection)
+        return connection.replies[0]
+
+
+def test_sync_downloads_the_missing_chain_in_windows(monkeypatch, tmp_path):
+    source, _ = _chain_node(monkeypatch, tmp_path)
+    (tmp_path / "fresh").mkdir()
+    fresh, announced = _chain_node(monkeypatch, tmp_path / "fresh")
+    monkeypatch.setattr(fresh, "MAX_BLOCKS_PER_MESSAGE", 3)
+    monkeypatch.setattr(fresh, "MAX_HEADERS_PER_MESSAGE", 4)
+
+    async def get_connection(peer):
+        return _ServingConnection(source)
+
+    monkeypatch.setattr(fresh, "_get_connection", get_connection)
+    blocks = []
+
+    for height in range(10):
+        previous_hash = Block.calculate_hash(blocks[-1]) if blocks else None
+        records = [signed_record(f"payload-{height}")]
+        blocks.append(MultiRecordBlock(records, previous_hash).build())
+
+    source.blockchain.add_blocks(blocks)
+
+    for peer in ["10.0.0.1:5000", "10.0.0.2:5000"]:
+        fresh.address_book.add(peer)
+        fresh.address_book.mark_alive(peer)
+
+    asyncio.run(fresh.sync())
+    assert [block for _, block in fresh.blockchain.iter_blocks()] == blocks
+    assert Block.calculate_hash(blocks[-1]) in fresh.gossip.seen
+    assert not fresh.syncing
+    assert announced == []
+    source.close()
+    fresh.close()
+
+
+class _MalformedConnection(_ServingConnection):
+    def __init__(self, node, reply_type):
+        super().__init__(node)
+        self.reply_type = reply_type
+
+    async def request(self, msg):
+        if msg["type"] == self.reply_type:
+            return {"type": self.reply_type, "headers": "junk", "blocks": [1, 2]}
+
+        return await super().request(msg)
+
+
+def _synced_chain(monkeypatch, tmp_path, length):
+    source, _ = _chain_node(monkeypatch, tmp_path)
+    (tmp_path / "fresh").mkdir()
+    fresh, _ = _chain_node(monkeypatch, tmp_path / "fresh")
+    monkeypatch.setattr(fresh, "MAX_BLOCKS_PER_MESSAGE", 2)
+    blocks = []
+
+    for height in range(length):
+        previous_hash = Block.calculate_hash(blocks[-1]) if blocks else None
+        records = [signed_record(f"payload-{height}")]
+        blocks.append(MultiRecordBlock(records, previous_hash).build())
+
+    source.blockchain.add_blocks(blocks)
+
+    for peer in ["10.0.0.1:5000", "10.0.0.2:5000"]:
+        fresh.address_book.add(peer)
+        fresh.address_book.mark_alive(peer)
+
+    return source, fresh, blocks
+
+
+def test_sync_skips_a_peer_with_malformed_blocks(monkeypatch, tmp_path):
+    source, fresh, blocks = _synced_chain(monkeypatch, tmp_path, 6)
+
+    async def get_connection(peer):
+        if peer == "10.0.0.2:5000":
+            return _MalformedConnection(source, "get_blocks")
+
+        return _ServingConnection(source)
+
+    monkeypatch.setattr(fresh, "_get_connection", get_connection)
+    asyncio.run(fresh.sync())
+    assert [block for _, block in fresh.blockchain.iter_blocks()] == blocks
+    source.close()
+    fresh.close()
+
+
+def test_sync_survives_malformed_headers_and_a_broken_verifier(monkeypatch, tmp_path):
+    source, fresh, blocks = _synced_chain(monkeypatch, tmp_path, 4)
+    connections = [_MalformedConnection(source, "get_headers")]
+    verify_many = fresh.verifier.verify_many
+    verifications = []
+
+    async def get_connection(peer):
+        return connections[0]
+
+    async def broken_once(records):
+        verifications.append(records)
+
+        if len(verifications) == 1:
+            raise BrokenProcessPool()
+
+        return await verify_many(records)
+
+    monkeypatch.setattr(fresh, "_get_connection", get_connection)
+    monkeypatch.setattr(fresh.verifier, "verify_many", broken_once)
+    asyncio.run(fresh.sync())
+    assert fresh.blockchain.tip_height == -1
+    connections[0] = _ServingConnection(source)
+    # The window of the broken verification is downloaded again from the other peer.
+    asyncio.run(fresh.sync())
+    assert not fresh.syncing
+    assert len(verifications) == 3
+    assert [block for _, block in fresh.blockchain.iter_blocks()] == blocks
+    source.close()
+    fresh.close()
+
+
+def test_records_are_acked_when_accepted_or_committed(monkeypatch, tmp_path):
+    node, announced = _chain_node(monkeypatch, tmp_path)
+    accepted = _FakeConnection()
+    committed = _FakeConnection()
+    rejected = _FakeConnection()
+    first, second = signed_record("a"), signed_record("b")
+
+    async def run():
+        producer = asyncio.create_task(node._produce_blocks())
+        await node._handle_add_deployment_record(
+            {"record": first[0], "signature": first[1], "durability": "accepted"},
+            accepted,
+        )
+        assert accepted.replies[0]["durability"] == "accepted"
+        assert "height" not in accepted.replies[0]
+        await asyncio.gather(
+            node._handle_add_deployment_record(
+                {"record": second[0], "signature": second[1]}, committed
+            ),
+            node._handle_add_deployment_record(
+                {"record": second[0], "signature": second[1]}, committed
+            ),
+            node._handle_add_deployment_record(
+                {"record": second[0], "signature": first[1]}, rejected
+            ),
+        )
+        producer.cancel()
+
+    asyncio.run(run())
+    assert [reply["status"] for reply in accepted.replies + committed.replies] == [
+        "success"
+    ] * 3
+    assert rejected.replies[0]["status"] == "rejected"
+    assert {reply["durability"] for reply in committed.replies} == {"committed"}
+    assert committed.replies[0]["height"] <= node.blockchain.tip_height
+    assert node.mempool.stats()["duplicates"] == 1
+    assert len(node.mempool) == 0
+    assert node.commit_waiters == {}
+    node.close()
+
+
+def test_blocks_produced_back_to_back_form_one_chain(monkeypatch, tmp_path):
+    monkeypatch.setattr(PeerNode, "BLOCK_MAX_RECORDS", 3)
+    node, _ = _chain_node(monkeypatch, tmp_path)
+
+    for i in range(10):
+        node.mempool.add(*signed_record(str(i)))
+
+    async def run():
+        producer = asyncio.create_task(node._produce_blocks())
+        node.block_producer.record_arrived()
+
+        while node.blockchain.tip_height < 3:
+            await asyncio.sleep(0.01)
+
+        producer.cancel()
+
+    asyncio.run(asyncio.wait_for(run(), 5))
+    assert node.blockchain.tip_height == 3
+    assert node.blockchain.verify_links() is None
+    node.close()
+
+
+def test_records_of_a_block_that_failed_to_write_go_into_the_next_block(
+    monkeypatch, tmp_path
+):
+    node, _ = _chain_node(monkeypatch, tmp_path)
+    connection = _FakeConnection()
+    payload, signature = signed_record("a")
+    enqueue_block = node.blockchain.enqueue_block
+    attempts = []
+
+    def failing_enqueue_block(block):
+        attempts.append(block)
+
+        if len(attempts) == 1:
+            failed = asyncio.get_running_loop().create_future()
+            failed.set_exception(OSError("disk full"))
+            return failed
+
+        return enqueue_block(block)
+
+    monkeypatch.setattr(node.blockchain, "enqueue_block", failing_enqueue_block)
+
+    async def run():
+        producer = asyncio.create_task(node._produce_blocks())
+        await node._handle_add_deployment_record(
+            {"record": payload, "signature": signature}, connection
+        )
+        producer.cancel()
+
+    asyncio.run(asyncio.wait_for(run(), 5))
+    assert len(attempts) == 2
+    assert connection.replies[0]["status"] == "success"
+    assert connection.replies[0]["height"] == 0
+    assert node.blockchain.get_block(0) == attempts[1]
+    assert record_leaf(payload, signature) not in node.mempool_log
+    node.close()
+
+
+def test_accepted_records_survive_a_restart(monkeypatch, tmp_path):
+    node, _ = _chain_node(monkeypatch, tmp_path)
+    committed, accepted = signed_record("a"), signed_record("b")
+    connection = _FakeConnection()
+
+    async def run():
+        for payload, signature in [committed, accepted]:
+            await node._handle_add_deployment_record(
+                {"record": payload, "signature": signature, "durability": "accepted"},
+                connection,
+            )
+
+        node.mempool.take(1)
+        block = MultiRecordBlock([committed], None).build()
+        await node._commit_produced_block(
+            node.blockchain.enqueue_block(block),
+            Block.calculate_hash(block),
+            [committed],
+        )
+
+    asyncio.run(run())
+    node.close()
+    restarted, _ = _chain_node(monkeypatch, tmp_path)
+    assert list(restarted.mempool) == [accepted]
+    assert record_leaf(*accepted) in restarted.gossip.seen
+    restarted.close()
+
+
+def test_accepted_records_of_a_written_block_are_not_restored(monkeypatch, tmp_path):
+    node, _ = _chain_node(monkeypatch, tmp_path)
+    record = signed_record("a")
+    connection = _FakeConnection()
+
+    async def run():
+        await node._handle_add_deployment_record(
+            {"record": record[0], "signature": record[1], "durability": "accepted"},
+            connection,
+        )
+        # The node stops after the block is written and before the record is removed from the log.
+        await node.blockchain.commit_block(MultiRecordBlock([record], None).build())
+
+    asyncio.run(run())
+    node.close()
+    restarted, _ = _chain_node(monkeypatch, tmp_path)
+    assert len(restarted.mempool) == 0
+    assert record_leaf(*record) in restarted.included_records
+    assert record_leaf(*record) not in restarted.mempool_log
+    restarted.close()
+
+
+def test_announce_skips_peers_that_know_the_item(monkeypatch, tmp_path):
+    node, _ = _node(monkeypatch, tmp_path, {})
+    sent = []
+
+    async def fake_send_to_peer(peer, msg):
+        sent.append(peer)
+
+    monkeypatch.setattr(node, "_send_to_peer", fake_send_to_peer)
+
+    for peer in ["10.0.0.1:5000", "10.0.0.2:5000"]:
+        node.address_book.add(peer)
+        node.address_book.mark_alive(peer)
+
+    node._known_inventory("10.0.0.1:5000").add(b"block")
+    asyncio.run(node._announce(block_hashes=[b"block"]))
+    asyncio.run(node._announce(block_hashes=[b"block"]))
+    assert sent == ["10.0.0.2:5000"]
@@ -0,0 +1,52 @@
+from plyvel import DB
+from block import Block
+from blockchain import HASH_INDEX_PREFIX, Blockchain
+from reindex import reindex
+from tests.helpers import deployment_record
+
+
+def test_reindex_rebuilds_dropped_indexes(tmp_path):
+    path = tmp_path / "chain.db"
+    blockchain = Blockchain(path)
+    blocks = [
+        Block(deployment_record(f"{i:064x}", f"Signer{i % 3}"), b"s").build()
+        for i in range(50)
+    ]
+    blockchain.add_blocks(blocks)
+    blockchain.close()
+    db = DB(str(path))
+
+    for key in list(db.iterator(include_value=False)):
+        if not key.startswith((b"b", b"h", b"m")):
+            db.delete(key)
+
+    db.close()
+    progress = []
+    written = reindex(
+        path,
+        workers=2,
+        chunk_size=7,
+        batch_size=10,
+        progress=lambda *args: progress.append(args),
+    )
+    assert written == 150
+    assert progress[-1][:2] == ("load", 150)
+    blockchain = Blockchain(path)
+    assert blockchain.get_height_by_hash(Block.calculate_hash(blocks[42])) == 42
+    assert blockchain.find_deployments(f"{42:064x}") == [(42, "Signer0")]
+    assert list(blockchain.query_index("address", b"Signer1")) == list(range(1, 50, 3))
+    blockchain.close()
+
+
+def test_reindex_drops_stale_index_entries(tmp_path):
+    path = tmp_path / "chain.db"
+    blockchain = Blockchain(path)
+    blockchain.add_block(Block(b"payload", b"s").build())
+    blockchain.close()
+    db = DB(str(path))
+    db.put(HASH_INDEX_PREFIX + bytes(32), (7).to_bytes(8, "big"))
+    db.close()
+    reindex(path, workers=1)
+    blockchain = Blockchain(path)
+    assert blockchain.get_height_by_hash(bytes(32)) is None
+    blockchain.close()
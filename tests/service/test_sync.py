@@ -0,0 +1,122 @@
+from block import Block, MultiRecordBlock
+from sync import BlockDownload, verify_header_chain
+
+
+def _chain(length):
+    blocks = []
+    previous_hash = None
+
+    for height in range(length):
+        block = MultiRecordBlock(
+            [(f"payload-{height}".encode(), b"sig")], previous_hash
+        ).build()
+        previous_hash = Block.calculate_hash(block)
+        blocks.append(block)
+
+    return blocks
+
+
+def _headers(blocks):
+    return [block[: Block.RECORDS_HEADER_SIZE] for block in blocks]
+
+
+def test_verifies_the_header_chain_up_to_the_first_broken_link():
+    blocks = _chain(4)
+    headers = _headers(blocks)
+
+    assert verify_header_chain(bytes(32), headers) == 4
+    assert verify_header_chain(bytes(32), [headers[0], headers[2], headers[3]]) == 1
+    assert verify_header_chain(bytes([1]) * 32, headers) == 0
+
+
+def test_links_after_a_version_1_header_are_checked_with_the_body():
+    legacy = Block(b"payload", b"signature").build()
+    block = MultiRecordBlock(
+        [(b"payload", b"sig")], Block.calculate_hash(legacy)
+    ).build()
+    headers = [legacy[: Block.HEADER_SIZE], block[: Block.RECORDS_HEADER_SIZE]]
+
+    assert verify_header_chain(bytes(32), headers) == 2
+
+    download = BlockDownload(0, headers, Block.calculate_hash(block), window_size=2)
+    window = download.next_window("peer", 0.0)
+    forged = Block(b"payload", b"forged").build()
+
+    assert not download.complete(window, "peer", [forged, block], 1.0)
+    assert download.complete(window, "peer", [legacy, block], 1.0)
+
+
+def test_windows_are_handed_out_in_height_order():
+    blocks = _chain(5)
+    download = BlockDownload(
+        0, _headers(blocks), Block.calculate_hash(blocks[-1]), window_size=2
+    )
+
+    assert [download.next_window(peer, 0.0) for peer in ["a", "b", "c"]] == [0, 2, 4]
+    assert download.complete(2, "b", blocks[2:4], 1.0)
+    assert download.take_ready() == []
+    assert download.complete(0, "a", blocks[0:2], 1.0)
+    assert download.take_ready() == blocks[0:4]
+    assert not download.is_done()
+    assert download.complete(4, "c", blocks[4:], 1.0)
+    assert download.take_ready() == blocks[4:]
+    assert download.is_done()
+
+
+def test_invalid_and_failed_windows_are_downloaded_again():
+    blocks = _chain(4)
+    download = BlockDownload(
+        0, _headers(blocks), Block.calculate_hash(blocks[-1]), window_size=2
+    )
+    window = download.next_window("a", 0.0)
+
+    assert not download.complete(window, "a", [blocks[1], blocks[0]], 1.0)
+    assert not download.complete(window, "a", [], 1.0)
+
+    download.fail(window, "a")
+
+    assert download.next_window("b", 1.0) == window
+
+
+def test_the_rest_of_a_short_window_is_downloaded_again():
+    blocks = _chain(5)
+    download = BlockDownload(
+        0, _headers(blocks), Block.calculate_hash(blocks[-1]), window_size=3
+    )
+
+    assert download.next_window("a", 0.0) == 0
+    assert download.complete(0, "a", blocks[0:1], 1.0)
+    assert download.take_ready() == blocks[0:1]
+    assert download.next_window("a", 1.0) == 1
+    assert download.window_count(1) == 2
+    assert not download.complete(1, "a", blocks[1:4], 2.0)
+    assert download.complete(1, "a", blocks[1:3], 2.0)
+    assert download.next_window("a", 2.0) == 3
+    assert download.complete(3, "a", blocks[3:], 3.0)
+    assert download.take_ready() == blocks[1:]
+    assert download.is_done()
+
+
+def test_a_stalled_window_is_requested_again_from_a_faster_peer():
+    blocks = _chain(6)
+    download = BlockDownload(
+        0,
+        _headers(blocks),
+        Block.calculate_hash(blocks[-1]),
+        window_size=2,
+        stall_timeout=2.0,
+    )
+    download.next_window("slow", 0.0)
+    download.next_window("fast", 0.0)
+    download.complete(2, "fast", blocks[2:4], 0.1)
+    download.next_window("fast", 0.1)
+    download.complete(4, "fast", blocks[4:6], 0.2)
+
+    assert download.next_window("fast", 1.0) is None
+    assert download.next_window("fast", 3.0) == 0
+    assert download.next_window("other", 3.0) is None
+    assert download.complete(0, "fast", blocks[0:2], 3.1)
+    assert download.complete(0, "slow", blocks[0:2], 3.2)
+    assert download.take_ready() == blocks
+    assert download.throughput["fast"].blocks_per_second > 0
+    assert download.throughput["slow"].blocks_per_second is None
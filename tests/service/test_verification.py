@@ -0,0 +1,111 @@
+import asyncio
+import msgpack
+
+from concurrent.futures.process import BrokenProcessPool
+from merkle import record_leaf
+from tests.helpers import signed_record
+from verification import SignatureVerifier, verify_batch, verify_record
+
+
+def test_verifies_the_signature_against_the_address_of_the_payload():
+    payload, signature = signed_record("a")
+    other_payload, other_signature = signed_record("b")
+    assert verify_record(payload, signature)
+    assert not verify_record(payload, other_signature)
+    assert not verify_record(other_payload, signature)
+    assert not verify_record(b"not msgpack", signature)
+    assert not verify_record(msgpack.packb({"address": "0OIl"}), signature)
+    assert verify_batch([(payload, signature), (payload, other_signature)]) == [
+        True,
+        False,
+    ]
+
+
+def test_concurrent_records_are_verified_in_micro_batches():
+    records = [signed_record(str(i)) for i in range(10)]
+    records[3] = (records[3][0], records[4][1])
+
+    async def run():
+        verifier = SignatureVerifier(max_batch=4, workers=2)
+
+        try:
+            single = await asyncio.gather(
+                *[verifier.verify(payload, signature) for payload, signature in records]
+            )
+            return single, await verifier.verify_many(records)
+        finally:
+            verifier.close()
+
+    single, many = asyncio.run(run())
+    expected = [i != 3 for i in range(10)]
+    assert single == expected
+    assert many == expected
+
+
+def test_verified_records_are_not_verified_again():
+    records = [signed_record(str(i)) for i in range(3)]
+
+    async def run():
+        verifier = SignatureVerifier(workers=1, cache_capacity=2)
+
+        try:
+            first = await verifier.verify_many(records)
+            # Without worker processes, only cached records can be verified.
+            verifier.close()
+            cached = await verifier.verify_many(records[1:])
+            return first, cached, verifier
+        finally:
+            verifier.close()
+
+    first, cached, verifier = asyncio.run(run())
+    assert first == [True, True, True]
+    assert cached == [True, True]
+    assert verifier._executor is None
+    assert record_leaf(*records[0]) not in verifier.verified
+
+
+def test_a_broken_pool_fails_its_batch_and_is_replaced():
+    payload, signature = signed_record("a")
+
+    async def run():
+        verifier = SignatureVerifier(workers=1)
+
+        try:
+            assert await verifier.verify_many([(payload, signature)]) == [True]
+            broken = verifier._executor
+
+            for process in broken._processes.values():
+                process.kill()
+
+            for verify in [
+                verifier.verify(payload, b"forged"),
+                verifier.verify_many([(payload, b"forged")]),
+            ]:
+                try:
+                    await asyncio.wait_for(verify, 5)
+                except BrokenProcessPool:
+                    pass
+
+                assert verifier._executor is not broken
+
+            return await asyncio.wait_for(verifier.verify(payload, b"forged"), 5)
+        finally:
+            verifier.close()
+
+    assert asyncio.run(run()) is False
+
+
+def test_a_cached_record_vouches_for_no_other_split_of_its_bytes():
+    payload, signature = signed_record("a")
+    moved = payload + signature[:10], signature[10:]
+
+    async def run():
+        verifier = SignatureVerifier(workers=1)
+
+        try:
+            assert await verifier.verify(payload, signature)
+            return await verifier.verify(*moved), await verifier.verify_many([moved])
+        finally:
+            verifier.close()
+
+    assert asyncio.run(run()) == (False, [False])